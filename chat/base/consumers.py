@@ -1,4 +1,4 @@
-import json
+import orjson
 from typing import Dict, List, Literal, TypedDict
 from django.db import models
 from django.db.models import Count, Q, Subquery, OuterRef
@@ -6,6 +6,7 @@ from channels.generic.websocket import WebsocketConsumer
 from asgiref.sync import async_to_sync
 from .models import User, Message, Room
 from .serializers import UserSerializer, MessageSerializer, RoomSerializer
+from shared.renderers import dumps
 
 
 # Event Types
@@ -53,7 +54,7 @@ class ChatUserConsumer(WebsocketConsumer):
         self.leave_friendship_groups(user)
 
     def receive(self, text_data):
-        data = json.loads(text_data)
+        data = orjson.loads(text_data)
 
         # Get event type and data
         event_type:EventTypes|None = data.get("type", None)
@@ -170,7 +171,7 @@ class ChatUserConsumer(WebsocketConsumer):
         user = self.scope["user"]
         message = event["message"]
         if str(user.id) != str(message["data"]["friend"]["id"]):
-            self.send(text_data=json.dumps(message))
+            self.send(text_data=dumps(message).decode())
             
     def friend_offline(self, event):
         """
@@ -179,7 +180,7 @@ class ChatUserConsumer(WebsocketConsumer):
         user = self.scope["user"]
         message = event["message"]
         if str(user.id) != str(message["data"]["friend"]["id"]):
-            self.send(text_data=json.dumps(message))
+            self.send(text_data=dumps(message).decode())
 
     def chat_message(self, event):
         """
@@ -188,7 +189,7 @@ class ChatUserConsumer(WebsocketConsumer):
         data = event["message"]
         user = self.scope["user"]
         if str(user.id) != str(data["data"]["user"]["id"]):
-            self.send(text_data=json.dumps(data))
+            self.send(text_data=dumps(data).decode())
 
     def chat_message_send(self, event_data:ChatMessageType):
         """
@@ -262,7 +263,7 @@ class ChatUserConsumer(WebsocketConsumer):
         message = event["message"]
 
         if str(user.id) != str(message["data"]["user"]):
-            self.send(text_data=json.dumps(message))
+            self.send(text_data=dumps(message).decode())
 
     def friend_typing_stop(self, event):
         """
@@ -272,7 +273,7 @@ class ChatUserConsumer(WebsocketConsumer):
         message = event["message"]
 
         if str(user.id) != str(message["data"]["user"]):
-            self.send(text_data=json.dumps(message))
+            self.send(text_data=dumps(message).decode())
 
     def read_chat(self, event):
         """
@@ -302,4 +303,4 @@ class ChatUserConsumer(WebsocketConsumer):
         message = event["message"]
 
         if str(user.id) != str(message["data"]["user"]):
-            self.send(text_data=json.dumps(message))
+            self.send(text_data=dumps(message).decode())
@@ -1,5 +1,3 @@
-from jwt import InvalidSignatureError, ExpiredSignatureError, DecodeError
-from jwt import decode as jwt_decode
 from urllib.parse import parse_qs
 from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth.models import AnonymousUser
@@ -12,8 +10,21 @@ from rest_framework.exceptions import AuthenticationFailed
 from django.conf import settings
 import requests
 from .models import User
+from shared import tokens
+from shared.http_client import Upstream
+from shared.user_cache import user_cache
 
 
+users_service = Upstream("users", settings.USERS_SERVICE)
+
+
+def load_user(user_id):
+    return User.objects.filter(id=user_id).first()
+
+
+def verify_token(token):
+    return tokens.verify_token(token, users_service)
+
 
 class AuthMiddleware:
     """Middleware to authenticate user for channels"""
@@ -29,20 +40,18 @@ class AuthMiddleware:
             # Decode the query string and get token parameter from it.
             token = parse_qs(scope["query_string"].decode("utf8")).get('token', None)[0]
             
-            # Decode the token to get the user id from it.
-            data = jwt_decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            
-            # Get the user from database based on user id and add it to the scope.
-            scope['user'] = await self.get_user(data['user_id'])
-        except (TypeError, KeyError, InvalidSignatureError, ExpiredSignatureError, DecodeError):
+            # Verify the token and get the user from database based on user id and add it to the scope.
+            scope['user'] = await self.get_user(token)
+        except (TypeError, KeyError, AuthenticationFailed):
             # Set the user to Anonymous if token is not valid or expired.
             scope['user'] = AnonymousUser()
         
         return await self.app(scope, receive, send)
 
     @database_sync_to_async
-    def get_user(self, user_id):
-        user = User.objects.filter(id=user_id).first()
+    def get_user(self, token):
+        data = verify_token(token)
+        user = user_cache.get(str(data['user_id']), load_user)
         if not user:
             return AnonymousUser()
         user.is_authenticated = True
@@ -54,7 +63,6 @@ def JWTAuthMiddlewareStack(app):
     return AuthMiddleware(AuthMiddlewareStack(app))
 
 
-
 class UserAuthentication(BaseAuthentication):
     def authenticate(self, request):
         token = request.headers.get("Authorization")
@@ -62,10 +70,33 @@ class UserAuthentication(BaseAuthentication):
         if not token:
             return AnonymousUser(), token
 
-        auth_service_url = settings.USERS_SERVICE + "/api/users/me/"
+        if settings.AUTH_MODE == "remote":
+            return self.authenticate_remote(token)
+
+        if settings.AUTH_MODE == "gateway":
+            return self.authenticate_gateway(request, token)
+
+        payload = verify_token(token.split("JWT")[-1].strip())
+        return (
+            self.get_user(payload["user_id"]),
+            token.split("JWT")[-1],
+        )
+
+    def authenticate_gateway(self, request, token):
+        """
+        The gateway already validated the token and forwards its user id.
+        """
+        user_id = request.headers.get("X-User-Id")
+        if not user_id:
+            raise AuthenticationFailed("Invalid token")
+        return (
+            self.get_user(user_id),
+            token.split("JWT")[-1],
+        )
 
+    def authenticate_remote(self, token):
         try:
-            response = requests.get(auth_service_url, headers={"Authorization": token})
+            response = users_service.get("/api/users/me/", headers={"Authorization": token})
             if response.status_code == 200:
                 user_data = response.json()
                 return (
@@ -78,7 +109,7 @@ class UserAuthentication(BaseAuthentication):
             raise AuthenticationFailed("Auth service unavailable")
 
     def get_user(self, user_id):
-        user = User.objects.filter(id=user_id).first()
+        user = user_cache.get(str(user_id), load_user)
         if not user:
             return AnonymousUser()
         user.is_authenticated = True
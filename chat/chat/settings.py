@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -8,6 +9,11 @@ load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Code shared by the services lives in shared/ next to the service folders when running
+# from a checkout, images copy it to /app/shared.
+if (BASE_DIR.parent / "shared").is_dir():
+    sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.1/howto/deployment/checklist/
@@ -43,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'shared.replicas.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
@@ -92,6 +99,22 @@ DATABASES = {
     }
 }
 
+# Reads of safe requests go to the replica when one is configured, see shared/replicas.py.
+replica_host = os.getenv("POSTGRES_REPLICA_HOST")
+if replica_host:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", db_port),
+        "ATOMIC_REQUESTS": False,
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["shared.replicas.PrimaryReplicaRouter"]
+
+# Clients read from the primary for this long after they wrote, so they see their own writes.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -143,11 +166,40 @@ CHANNEL_LAYERS = {
     },
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://redis-chat:6379/1",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+    }
+}
+
 USERS_SERVICE = os.getenv("USERS_SERVICE")
 
+# "local" verifies access tokens in-process, "gateway" trusts the X-User-Id header set by
+# the nginx auth_request, "remote" asks the users service on every request.
+AUTH_MODE = os.getenv("AUTH_MODE", "local")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# HS* tokens are signed with the users service SECRET_KEY, RS* tokens are checked
+# against the public key published by the users service.
+JWT_VERIFYING_KEY = os.getenv("JWT_VERIFYING_KEY") or (
+    os.getenv("SECRET_KEY") if JWT_ALGORITHM.startswith("HS") else None
+)
+
 REST_FRAMEWORK = {
     "COERCE_DECIMAL_TO_STRING": False,
     "DEFAULT_AUTHENTICATION_CLASSES": ("base.middleware.UserAuthentication",),
+    "DEFAULT_RENDERER_CLASSES": (
+        "shared.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "shared.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
 }
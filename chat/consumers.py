@@ -21,6 +21,8 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "chat.settings")
 django.setup()
 
 from base.models import User, Room
+from shared.tokens import revoke_token, revoke_user_tokens
+from shared.user_cache import user_cache
 
 logger = logging.getLogger(__name__)
 
@@ -114,6 +116,7 @@ class ConsumeHandler:
                 full_name=data["full_name"],
             )
             user.save()
+            user_cache.invalidate(data["id"])
             info(f"QUEUE - {CURRENT_QUEUE}: User created")
         except Exception as e:
             error(f"QUEUE - {CURRENT_QUEUE}: Failed to save user [{data['id']}]: {e}")
@@ -124,6 +127,7 @@ class ConsumeHandler:
             user = User.objects.get(id=data["id"])
             user.full_name = data["full_name"]
             user.save()
+            user_cache.invalidate(data["id"])
             info(f"QUEUE - {CURRENT_QUEUE}: User updated")
         except Exception as e:
             error(f"QUEUE - {CURRENT_QUEUE}: Failed to update user [{data['id']}]: {e}")
@@ -133,10 +137,27 @@ class ConsumeHandler:
         try:
             user = User.objects.get(id=data["id"])
             user.delete()
+            user_cache.invalidate(data["id"])
             info(f"QUEUE - {CURRENT_QUEUE}: User deleted")
         except Exception as e:
             error(f"QUEUE - {CURRENT_QUEUE}: Failed to delete user [{data['id']}]: {e}")
 
+    def token_revoked(self, data):
+        # Reject a single revoked access token
+        try:
+            revoke_token(data["jti"], data["exp"])
+            info(f"QUEUE - {CURRENT_QUEUE}: Token revoked")
+        except Exception as e:
+            error(f"QUEUE - {CURRENT_QUEUE}: Failed to revoke token [{data['id']}]: {e}")
+
+    def user_tokens_revoked(self, data):
+        # Reject every token issued before the revocation time
+        try:
+            revoke_user_tokens(data["id"], data["revoked_before"], data["expires_at"])
+            info(f"QUEUE - {CURRENT_QUEUE}: User tokens revoked")
+        except Exception as e:
+            error(f"QUEUE - {CURRENT_QUEUE}: Failed to revoke user tokens [{data['id']}]: {e}")
+
     def friend_created(self, data):
         # Create a friend room
         try:
@@ -150,6 +171,7 @@ class ConsumeHandler:
                         full_name=usr["full_name"],
                     )
                     user.save()
+                    user_cache.invalidate(usr["id"])
                 room.users.add(user)
             info(f"QUEUE - {CURRENT_QUEUE}: Friend Room created")
         except Exception as e:
@@ -16,6 +16,8 @@ os.environ.setdefault("DJANGO_SETTINGS_MODULE", "friendship.settings")
 django.setup()
 
 from friends.models import User
+from shared.tokens import revoke_token, revoke_user_tokens
+from shared.user_cache import user_cache
 
 logger = logging.getLogger(__name__)
 
@@ -101,6 +103,7 @@ class ConsumeHandler:
                 full_name=data["full_name"],
             )
             user.save()
+            user_cache.invalidate(data["id"])
             info(f"QUEUE - {CURRENT_QUEUE}: User created")
         except Exception as e:
             error(f"QUEUE - {CURRENT_QUEUE}: Failed to save user [{data['id']}]: {e}")
@@ -110,6 +113,7 @@ class ConsumeHandler:
             user = User.nodes.get(user_id=data["id"])
             user.full_name = data["full_name"]
             user.save()
+            user_cache.invalidate(data["id"])
             info(f"QUEUE - {CURRENT_QUEUE}: User updated")
         except Exception as e:
             error(f"QUEUE - {CURRENT_QUEUE}: Failed to update user [{data['id']}]: {e}")
@@ -118,10 +122,25 @@ class ConsumeHandler:
         try:
             user = User.nodes.get(user_id=data["id"])
             user.delete()
+            user_cache.invalidate(data["id"])
             info(f"QUEUE - {CURRENT_QUEUE}: User deleted")
         except Exception as e:
             error(f"QUEUE - {CURRENT_QUEUE}: Failed to delete user [{data['id']}]: {e}")
 
+    def token_revoked(self, data):
+        try:
+            revoke_token(data["jti"], data["exp"])
+            info(f"QUEUE - {CURRENT_QUEUE}: Token revoked")
+        except Exception as e:
+            error(f"QUEUE - {CURRENT_QUEUE}: Failed to revoke token [{data['id']}]: {e}")
+
+    def user_tokens_revoked(self, data):
+        try:
+            revoke_user_tokens(data["id"], data["revoked_before"], data["expires_at"])
+            info(f"QUEUE - {CURRENT_QUEUE}: User tokens revoked")
+        except Exception as e:
+            error(f"QUEUE - {CURRENT_QUEUE}: Failed to revoke user tokens [{data['id']}]: {e}")
+
 
 def callback(chnl, method, properties, body):
     data = json.loads(body)
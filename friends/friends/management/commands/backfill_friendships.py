@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from neomodel import db
+
+from friendship.producers import publish
+
+
+class Command(BaseCommand):
+    help = "Publish every friendship in batches so other services can load their local copy."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--to", default="posts", help="Comma separated queues to publish to.")
+
+    def handle(self, *args, **options):
+        # Each friendship is one FRIENDS_WITH relationship pointing from the requester to the
+        # accepter. Match it undirected and keep the ordering with the smaller id first, so every
+        # pair is emitted once whichever side requested it, and page by that key.
+        query = """
+        MATCH (user:User)-[:FRIENDS_WITH]-(friend:User)
+        WHERE user.user_id < friend.user_id
+        AND (user.user_id > $last_user_id OR (user.user_id = $last_user_id AND friend.user_id > $last_friend_id))
+        RETURN user.user_id, friend.user_id
+        ORDER BY user.user_id, friend.user_id
+        LIMIT $limit
+        """
+        to = options["to"].split(",")
+        last = ["", ""]
+        published = 0
+
+        while True:
+            results, _ = db.cypher_query(
+                query,
+                {"last_user_id": last[0], "last_friend_id": last[1], "limit": options["batch_size"]},
+            )
+            if not results:
+                break
+
+            friendships = [[user_id, friend_id] for user_id, friend_id in results]
+            publish("friendships.backfill", {"friendships": friendships}, to)
+            published += len(friendships)
+            last = friendships[-1]
+            self.stdout.write(f"Published {published}", ending="\r")
+
+        self.stdout.write(f"Published {published} friendships to {', '.join(to)}")
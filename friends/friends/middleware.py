@@ -1,4 +1,3 @@
-import uuid
 from rest_framework.authentication import BaseAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 from django.contrib.auth.models import AnonymousUser
@@ -6,6 +5,30 @@ from django.conf import settings
 import requests
 
 from .models import User
+from shared import tokens
+from shared.http_client import Upstream
+from shared.user_cache import user_cache
+
+
+users_service = Upstream("users", settings.USERS_SERVICE)
+
+
+def load_user(user_id):
+    """
+    Plain dict of the user node, neomodel nodes are rebuilt from it on every request.
+    """
+    user = User.nodes.get_or_none(user_id=user_id)
+    if not user:
+        return None
+    return {
+        "user_id": user.user_id,
+        "full_name": user.full_name,
+        "element_id": user.element_id,
+    }
+
+
+def verify_token(token):
+    return tokens.verify_token(token, users_service)
 
 
 class UserAuthentication(BaseAuthentication):
@@ -15,10 +38,33 @@ class UserAuthentication(BaseAuthentication):
         if not token:
             return AnonymousUser(), token
 
-        auth_service_url = settings.USERS_SERVICE + "/api/users/me/"
+        if settings.AUTH_MODE == "remote":
+            return self.authenticate_remote(token)
+
+        if settings.AUTH_MODE == "gateway":
+            return self.authenticate_gateway(request, token)
+
+        payload = verify_token(token.split("JWT")[-1].strip())
+        return (
+            self.get_user(payload["user_id"]),
+            token.split("JWT")[-1],
+        )
+
+    def authenticate_gateway(self, request, token):
+        """
+        The gateway already validated the token and forwards its user id.
+        """
+        user_id = request.headers.get("X-User-Id")
+        if not user_id:
+            raise AuthenticationFailed("Invalid token")
+        return (
+            self.get_user(user_id),
+            token.split("JWT")[-1],
+        )
 
+    def authenticate_remote(self, token):
         try:
-            response = requests.get(auth_service_url, headers={"Authorization": token})
+            response = users_service.get("/api/users/me/", headers={"Authorization": token})
             if response.status_code == 200:
                 user_data = response.json()
 
@@ -36,8 +82,10 @@ class UserAuthentication(BaseAuthentication):
         Retrieve or create a Neo4j user instance based on the user data from the external service.
         """
         user_id = str(user_id).replace("-", "")
-        user = User.nodes.get_or_none(user_id=user_id)
-        if not user:
+        data = user_cache.get(user_id, load_user)
+        if not data:
             return AnonymousUser()
+        user = User(user_id=data["user_id"], full_name=data["full_name"])
+        user.element_id_property = data["element_id"]
         user.is_authenticated = True
         return user
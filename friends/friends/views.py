@@ -342,7 +342,7 @@ class FriendRequestActionView(ModelViewSet):
                     },
                 ]
             }
-            publish("friend.created", data, ["chat"])
+            publish("friend.created", data, ["chat", "posts"])
 
         elif action == "reject":
             if (
@@ -447,4 +447,37 @@ class FriendSuggestionsView(APIView):
         else:
             cache.set(cache_key, result, HR_1*24)
 
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class FriendRemoveView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Remove friend",
+        operation_description="Remove a user from the friends of the authenticated user",
+        responses={
+            204: "No Content",
+            401: "Unauthorized",
+            404: "Friend not found",
+        },
+    )
+    def delete(self, request, pk):
+        user = request.user
+        friend = User.nodes.get_or_none(user_id=str(pk).replace("-", ""))
+
+        if not friend or not user.is_friends_with(friend):
+            raise NotFound("Friend not found")
+
+        user.remove_friend(friend)
+        cache.delete_many([f"friend_list_{user.user_id}", f"friend_list_{friend.user_id}"])
+
+        data = {
+            "friends": [
+                {"id": user.user_id, "full_name": user.full_name},
+                {"id": friend.user_id, "full_name": friend.full_name},
+            ]
+        }
+        publish("friend.removed", data, ["posts"])
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
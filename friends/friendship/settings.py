@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -7,6 +8,11 @@ load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Code shared by the services lives in shared/ next to the service folders when running
+# from a checkout, images copy it to /app/shared.
+if (BASE_DIR.parent / "shared").is_dir():
+    sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -121,6 +127,15 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "COERCE_DECIMAL_TO_STRING": False,
     "DEFAULT_AUTHENTICATION_CLASSES": ("friends.middleware.UserAuthentication",),
+    "DEFAULT_RENDERER_CLASSES": (
+        "shared.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "shared.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
 }
@@ -136,6 +151,16 @@ NEOMODEL_MAX_POOL_SIZE = 50
 
 USERS_SERVICE = os.getenv("USERS_SERVICE")
 
+# "local" verifies access tokens in-process, "gateway" trusts the X-User-Id header set by
+# the nginx auth_request, "remote" asks the users service on every request.
+AUTH_MODE = os.getenv("AUTH_MODE", "local")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# HS* tokens are signed with the users service SECRET_KEY, RS* tokens are checked
+# against the public key published by the users service.
+JWT_VERIFYING_KEY = os.getenv("JWT_VERIFYING_KEY") or (
+    os.getenv("SECRET_KEY") if JWT_ALGORITHM.startswith("HS") else None
+)
+
 
 CACHES = {
     "default": {
@@ -47,4 +47,8 @@ urlpatterns = [
         "api/friends/users/friends/requests/sent/",
         views.SentFriendRequestView.as_view(),
     ),
+    path(
+        "api/friends/users/friends/<str:pk>/",
+        views.FriendRemoveView.as_view(),
+    ),
 ]
@@ -15,7 +15,11 @@ load_dotenv()
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "postwrite.settings")
 django.setup()
 
-from posts.models import User
+from django.db import transaction
+from posts.models import Comment, Friendship, Post, User
+from posts import projections, snapshots, timeline
+from shared.tokens import revoke_token, revoke_user_tokens
+from shared.user_cache import user_cache
 
 logger = logging.getLogger(__name__)
 
@@ -41,6 +45,19 @@ def error(msg):
 
 CURRENT_QUEUE = os.getenv("CURRENT_QUEUE")
 
+
+def user_comments(user_id):
+    return list(Comment.objects.filter(user_id=user_id).values_list("id", "post_id"))
+
+
+def refresh_snapshots(comments):
+    """
+    Comment snapshots hold the commenter's name, rebuild the ones holding these comments.
+    """
+    post_ids = {post_id for _, post_id in comments}
+    snapshots.refresh(post_ids, comment_ids=[comment_id for comment_id, _ in comments])
+
+
 rabbitmq_user = os.getenv("RABBITMQ_DEFAULT_USER")
 rabbitmq_pass = os.getenv("RABBITMQ_DEFAULT_PASS")
 rabbitmq_host = os.getenv("RABBITMQ_HOST")
@@ -99,6 +116,7 @@ class ConsumeHandler:
                 full_name=data["full_name"],
             )
             user.save()
+            user_cache.invalidate(data["id"])
             info(f"QUEUE - {CURRENT_QUEUE}: User created")
         except Exception as e:
             error(f"QUEUE - {CURRENT_QUEUE}: Failed to save user [{data['id']}]: {e}")
@@ -107,7 +125,14 @@ class ConsumeHandler:
         try:
             user = User.objects.get(id=data["id"])
             user.full_name = data["full_name"]
-            user.save()
+            comments = user_comments(user.id)
+            with transaction.atomic():
+                user.save()
+                # Documents of the user's posts and comments carry the author's name.
+                projections.post_changed(*Post.objects.filter(user=user).values_list("id", flat=True))
+                projections.comment_changed(*[comment_id for comment_id, _ in comments])
+            user_cache.invalidate(data["id"])
+            refresh_snapshots(comments)
             info(f"QUEUE - {CURRENT_QUEUE}: User updated")
         except Exception as e:
             error(f"QUEUE - {CURRENT_QUEUE}: Failed to update user [{data['id']}]: {e}")
@@ -115,11 +140,58 @@ class ConsumeHandler:
     def user_deleted(self, data):
         try:
             user = User.objects.get(id=data["id"])
+            comments = user_comments(user.id)
             user.delete()
+            user_cache.invalidate(data["id"])
+            refresh_snapshots(comments)
             info(f"QUEUE - {CURRENT_QUEUE}: User deleted")
         except Exception as e:
             error(f"QUEUE - {CURRENT_QUEUE}: Failed to delete user [{data['id']}]: {e}")
 
+    def token_revoked(self, data):
+        try:
+            revoke_token(data["jti"], data["exp"])
+            info(f"QUEUE - {CURRENT_QUEUE}: Token revoked")
+        except Exception as e:
+            error(f"QUEUE - {CURRENT_QUEUE}: Failed to revoke token [{data['id']}]: {e}")
+
+    def user_tokens_revoked(self, data):
+        try:
+            revoke_user_tokens(data["id"], data["revoked_before"], data["expires_at"])
+            info(f"QUEUE - {CURRENT_QUEUE}: User tokens revoked")
+        except Exception as e:
+            error(f"QUEUE - {CURRENT_QUEUE}: Failed to revoke user tokens [{data['id']}]: {e}")
+
+    def friend_created(self, data):
+        try:
+            first, second = [friend["id"] for friend in data["friends"]]
+            Friendship.add([(first, second)])
+            timeline.invalidate(first)
+            timeline.invalidate(second)
+            info(f"QUEUE - {CURRENT_QUEUE}: Friend created")
+        except Exception as e:
+            error(f"QUEUE - {CURRENT_QUEUE}: Failed to create friend: {e}")
+
+    def friend_removed(self, data):
+        try:
+            first, second = [friend["id"] for friend in data["friends"]]
+            Friendship.remove(first, second)
+            timeline.invalidate(first)
+            timeline.invalidate(second)
+            info(f"QUEUE - {CURRENT_QUEUE}: Friend removed")
+        except Exception as e:
+            error(f"QUEUE - {CURRENT_QUEUE}: Failed to remove friend: {e}")
+
+    def friendships_backfill(self, data):
+        try:
+            Friendship.add(data["friendships"])
+            for pair in data["friendships"]:
+                for user_id in pair:
+                    timeline.invalidate(user_id)
+            info(f"QUEUE - {CURRENT_QUEUE}: {len(data['friendships'])} friendships loaded")
+        except Exception as e:
+            error(f"QUEUE - {CURRENT_QUEUE}: Failed to load friendships: {e}")
+
 
 def callback(chnl, method, properties, body):
     data = json.loads(body)
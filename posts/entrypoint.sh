@@ -9,15 +9,36 @@ echo "Waiting for Redis Server to start..."
 echo "Waiting for Postgres Post-Write Database to start..."
 ./wait-for-it.sh posts-write-db:5432 --strict -t 30
 
+echo "Waiting for Postgres Post-Read Database to start..."
+./wait-for-it.sh posts-read-db:5432 --strict -t 30
+
 echo "Making Migrations..."
 python manage.py makemigrations
 
+echo "Removing Duplicate Likes..."
+python manage.py dedupe_likes
+
 echo "Migrating the Database..."
 python manage.py migrate
 
+echo "Migrating the Read Database..."
+python manage.py migrate --database read
+
 echo "Starting the server..."
 python manage.py runserver 0.0.0.0:8000 &
 
+echo "Starting Read Model Projector..."
+python projector.py &
+
+echo "Starting Discovery Pool Refresher..."
+python manage.py refresh_discovery_pool --every 300 &
+
+echo "Starting Like Count Flusher..."
+python manage.py flush_like_counts --every 2 &
+
+echo "Starting Like Count Reconciler..."
+python manage.py reconcile_like_counts --every 3600 &
+
 echo "Starting RabbitMQ Consumer..."
 python consumers.py
 
@@ -0,0 +1,123 @@
+import logging
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+
+from . import projections, snapshots
+
+
+logger = logging.getLogger(__name__)
+
+POST = "post"
+COMMENT = "comment"
+# A flush holding the lock for longer than this is assumed to be dead.
+LOCK_TIMEOUT = 60
+
+
+def deltas_key(kind):
+    return f"like_deltas_{kind}"
+
+
+def flushing_key(kind):
+    return f"like_deltas_{kind}_flushing"
+
+
+def lock_key(kind):
+    return f"like_deltas_{kind}_lock"
+
+
+def lock(kind, timeout=LOCK_TIMEOUT):
+    """
+    Held by a flush and by reconcile, so reconcile never sees a batch that is half applied.
+    The lock expires after `timeout` seconds in case its holder died.
+    """
+    return get_redis_connection("default").lock(lock_key(kind), timeout=timeout)
+
+
+def add(kind, object_id, delta):
+    """
+    Record a committed like count change without touching the row. Returns the pending delta.
+    """
+    return get_redis_connection("default").hincrby(deltas_key(kind), str(object_id), delta)
+
+
+def pending(kind, object_ids):
+    """
+    Deltas queued for the next flush. A batch taken by a running flush is no longer pending,
+    counts briefly miss it until its UPDATE commits but never count it twice.
+    """
+    object_ids = [str(object_id) for object_id in object_ids]
+    if not object_ids:
+        return {}
+
+    queued = get_redis_connection("default").hmget(deltas_key(kind), object_ids)
+    return {object_id: int(delta or 0) for object_id, delta in zip(object_ids, queued)}
+
+
+def get_model(kind):
+    from .models import Comment, Post
+
+    return Post if kind == POST else Comment
+
+
+def flush(kind):
+    """
+    Apply accumulated deltas with one UPDATE. The hash is renamed first in one atomic step,
+    so the batch stops being pending before the UPDATE adds it to the rows and likes arriving
+    during the flush go to a fresh hash. A batch left over by a crashed flush is applied
+    before a new one is taken. If a crash happens after the commit, the batch is applied
+    twice and reconcile corrects it.
+    """
+    with lock(kind):
+        return flush_batch(kind)
+
+
+def flush_batch(kind):
+    redis = get_redis_connection("default")
+    source = flushing_key(kind)
+
+    if not redis.exists(source):
+        try:
+            redis.rename(deltas_key(kind), source)
+        except ResponseError:
+            # Nothing was liked since the last flush.
+            return 0
+
+    deltas = {
+        object_id.decode(): int(delta)
+        for object_id, delta in redis.hgetall(source).items()
+        if int(delta)
+    }
+
+    if deltas:
+        model = get_model(kind)
+        with transaction.atomic():
+            model.objects.filter(id__in=deltas.keys()).update(
+                like_count=F("like_count")
+                + Case(
+                    *[When(id=object_id, then=Value(delta)) for object_id, delta in deltas.items()],
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            )
+            if kind == POST:
+                projections.post_changed(*deltas.keys())
+            else:
+                projections.comment_changed(*deltas.keys())
+        if kind == COMMENT:
+            snapshots.refresh(affected_posts(kind, deltas.keys()), comment_ids=deltas.keys())
+
+    redis.delete(source)
+    return len(deltas)
+
+
+def affected_posts(kind, object_ids):
+    from .models import Comment
+
+    if kind == POST:
+        return list(object_ids)
+    return [
+        str(post_id)
+        for post_id in Comment.objects.filter(id__in=object_ids).values_list("post_id", flat=True).distinct()
+    ]
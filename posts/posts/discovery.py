@@ -0,0 +1,97 @@
+import heapq
+import logging
+import math
+from datetime import timedelta
+from django.db.models import Count, Q
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from .timeline import FEED_WINDOW
+
+
+logger = logging.getLogger(__name__)
+
+POOL_KEY = "discovery_pool"
+POOL_SIZE = 1000
+# Only the newest posts are scored, so a refresh costs the same however old the table gets.
+CANDIDATES = 20000
+COMMENT_ACTIVITY_WINDOW = timedelta(days=7)
+COMMENT_WEIGHT = 2
+# Engagement is divided by (age in hours + 2) ^ GRAVITY, new posts need less of it to rank.
+GRAVITY = 1.5
+
+
+def score(like_count, comment_count, created_at, now):
+    age_hours = max((now - created_at).total_seconds(), 0) / 3600
+    return (like_count + COMMENT_WEIGHT * comment_count + 1) / (age_hours + 2) ** GRAVITY
+
+
+def refresh():
+    """
+    Rank recent posts by time decayed engagement and replace the pool in one step.
+    """
+    from .models import Post
+
+    now = timezone.now()
+    candidates = (
+        Post.objects.filter(created_at__gte=now - FEED_WINDOW)
+        .annotate(
+            recent_comments=Count(
+                "comment", filter=Q(comment__created_at__gte=now - COMMENT_ACTIVITY_WINDOW)
+            )
+        )
+        .order_by("-created_at")
+        .values_list("id", "like_count", "created_at", "recent_comments")[:CANDIDATES]
+    )
+    top = heapq.nlargest(
+        POOL_SIZE,
+        (
+            (score(like_count, recent_comments, created_at, now), str(post_id))
+            for post_id, like_count, created_at, recent_comments in candidates.iterator()
+        ),
+    )
+
+    redis = get_redis_connection("default")
+    pipeline = redis.pipeline()
+    if top:
+        staging_key = f"{POOL_KEY}_staging"
+        pipeline.delete(staging_key)
+        pipeline.zadd(staging_key, {post_id: post_score for post_score, post_id in top})
+        pipeline.rename(staging_key, POOL_KEY)
+    else:
+        pipeline.delete(POOL_KEY)
+    pipeline.execute()
+
+    logger.info(f"Discovery pool refreshed with {len(top)} posts")
+    return len(top)
+
+
+def permutation(seed, size):
+    """
+    i -> (step * i + start) % size visits every rank exactly once when step and size are
+    coprime, so a page of a shuffled pool never needs the rest of the pool.
+    """
+    start = seed % size
+    step = (seed // size) % size | 1
+    while math.gcd(step, size) != 1:
+        step += 2
+    return lambda index: (step * index + start) % size
+
+
+def read(seed, offset, limit):
+    """
+    Returns (post_ids, pool_size) for a page of the pool shuffled by `seed`.
+    """
+    redis = get_redis_connection("default")
+    size = redis.zcard(POOL_KEY)
+    if not size:
+        size = refresh()
+    if not size:
+        return [], 0
+
+    rank = permutation(seed, size)
+    pipeline = redis.pipeline(transaction=False)
+    for index in range(offset, min(offset + limit, size)):
+        position = rank(index)
+        pipeline.zrevrange(POOL_KEY, position, position)
+    return [result[0].decode() for result in pipeline.execute() if result], size
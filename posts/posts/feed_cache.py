@@ -0,0 +1,73 @@
+import uuid
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+
+# Page ids are dropped when a pushed friend post bumps the reader's version. Posts of high
+# degree authors are pulled at read time and show up once the page expires.
+PAGE_TTL = 60
+# Fragments are dropped when the post, its likes or its comments change. The TTL only bounds
+# staleness of author names.
+FRAGMENT_TTL = 60 * 10
+# A version key outlives every page cached under it, see page_key.
+VERSION_TTL = PAGE_TTL * 2
+
+
+def version_key(user_id):
+    return f"feed_version_{uuid.UUID(str(user_id))}"
+
+
+def fragment_key(post_id):
+    return f"post_fragment_{post_id}"
+
+
+def page_key(user_id, cursor):
+    """
+    Reading a version keeps its key alive for longer than any page cached under it. A version
+    can then only reset to a number it had before once all those pages expired, so a reset
+    never serves a page that predates a bump.
+    """
+    pipeline = get_redis_connection("default").pipeline(transaction=False)
+    pipeline.get(version_key(user_id))
+    pipeline.expire(version_key(user_id), VERSION_TTL)
+    version, _ = pipeline.execute()
+    return f"feed_page_{uuid.UUID(str(user_id))}_{int(version or 0)}_{cursor}"
+
+
+def get_page(key):
+    return cache.get(key)
+
+
+def set_page(key, page):
+    cache.set(key, page, PAGE_TTL)
+
+
+def bump_versions(redis, user_ids):
+    """
+    Queue version bumps on a Redis client or pipeline.
+    """
+    for user_id in user_ids:
+        key = version_key(user_id)
+        redis.incr(key)
+        redis.expire(key, VERSION_TTL)
+
+
+def get_fragments(post_ids, build):
+    """
+    Viewer independent post data by id. `build(post_ids)` serializes the missing ones.
+    """
+    keys = {post_id: fragment_key(post_id) for post_id in post_ids}
+    cached = cache.get_many(keys.values())
+    fragments = {post_id: cached[key] for post_id, key in keys.items() if key in cached}
+
+    missing = [post_id for post_id in post_ids if post_id not in fragments]
+    if missing:
+        built = build(missing)
+        cache.set_many({fragment_key(post_id): data for post_id, data in built.items()}, FRAGMENT_TTL)
+        fragments.update(built)
+
+    return fragments
+
+
+def invalidate_posts(*post_ids):
+    cache.delete_many([fragment_key(post_id) for post_id in post_ids])
@@ -0,0 +1,91 @@
+import uuid
+from django_redis import get_redis_connection
+from redis.exceptions import WatchError
+
+
+DAY = 60 * 60 * 24
+
+POST = "post"
+COMMENT = "comment"
+
+# Sets of readers who stop reading are dropped and rebuilt from the like rows on the next read.
+LIKED_TTL = DAY * 7
+
+
+def liked_key(kind, user_id):
+    return f"liked_{kind}s_{uuid.UUID(str(user_id))}"
+
+
+def liked_built_key(kind, user_id):
+    return f"liked_{kind}s_built_{uuid.UUID(str(user_id))}"
+
+
+def liked_version_key(kind, user_id):
+    return f"liked_{kind}s_version_{uuid.UUID(str(user_id))}"
+
+
+def get_model(kind):
+    from .models import CommentLike, PostLike
+
+    return PostLike if kind == POST else CommentLike
+
+
+def record(kind, user_id, object_id, is_liked):
+    """
+    Apply a like toggle to the user's set. Bumping the version aborts a rebuild that read
+    the like rows before this toggle was committed.
+    """
+    key = liked_key(kind, user_id)
+    version = liked_version_key(kind, user_id)
+    pipeline = get_redis_connection("default").pipeline(transaction=False)
+    if is_liked:
+        pipeline.sadd(key, str(object_id))
+    else:
+        pipeline.srem(key, str(object_id))
+    pipeline.incr(version)
+    pipeline.expire(version, LIKED_TTL)
+    pipeline.execute()
+
+
+def rebuild(redis, kind, user_id):
+    """
+    Fill the set from the database. Returns the liked ids, cached or not.
+    """
+    key = liked_key(kind, user_id)
+    with redis.pipeline() as pipeline:
+        pipeline.watch(liked_version_key(kind, user_id))
+        liked = {
+            str(object_id)
+            for object_id in get_model(kind).objects.filter(user_id=user_id).values_list(f"{kind}_id", flat=True)
+        }
+        pipeline.multi()
+        pipeline.delete(key)
+        if liked:
+            pipeline.sadd(key, *liked)
+            pipeline.expire(key, LIKED_TTL)
+        pipeline.set(liked_built_key(kind, user_id), 1, ex=LIKED_TTL)
+        try:
+            pipeline.execute()
+        except WatchError:
+            # A toggle landed while reading, the next read rebuilds.
+            pass
+    return liked
+
+
+def check(kind, user_id, object_ids):
+    """
+    The subset of `object_ids` the user liked, in one round trip.
+    """
+    object_ids = [str(object_id) for object_id in object_ids]
+    if not object_ids:
+        return set()
+
+    redis = get_redis_connection("default")
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.exists(liked_built_key(kind, user_id))
+    pipeline.smismember(liked_key(kind, user_id), object_ids)
+    built, members = pipeline.execute()
+
+    if not built:
+        return rebuild(redis, kind, user_id).intersection(object_ids)
+    return {object_id for object_id, member in zip(object_ids, members) if member}
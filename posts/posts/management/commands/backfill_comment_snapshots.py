@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from posts import snapshots
+from posts.models import Comment
+
+
+class Command(BaseCommand):
+    help = "Build the latest comments snapshot and comment count of every post that has comments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        post_ids = Comment.objects.values_list("post_id", flat=True).distinct().order_by("post_id")
+        last = None
+        refreshed = 0
+
+        while True:
+            batch = list((post_ids.filter(post_id__gt=last) if last else post_ids)[: options["batch_size"]])
+            if not batch:
+                break
+
+            snapshots.refresh(batch)
+            refreshed += len(batch)
+            last = batch[-1]
+            self.stdout.write(f"Refreshed {refreshed}", ending="\r")
+
+        self.stdout.write(f"Refreshed {refreshed} posts")
@@ -0,0 +1,79 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.models import Comment, Post, User
+from posts.pagination import CommentPagination
+from .benchmark_feed import BENCH_NAME_PREFIX
+
+
+class Command(BaseCommand):
+    help = "Compare offset and keyset comment pages of one post at increasing depth, in both orders."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--comments", type=int, default=100000, help="Comments on the benchmark post.")
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        post = self.seed(options["comments"])
+        comments = Comment.objects.select_related("user").filter(post_id=post.id)
+        total = comments.count()
+        page_size = options["page_size"]
+        self.stdout.write(f"Comments: {total}")
+
+        for order, ordering in CommentPagination.orderings.items():
+            for depth in [0.01, 0.5, 0.99]:
+                offset = int(total * depth)
+
+                # What the thread did before: a post lookup, COUNT(*) and an OFFSET.
+                offset_ms = self.measure(options["repeat"], lambda: (
+                    Post.objects.filter(id=post.id).first(),
+                    comments.count(),
+                    list(comments.order_by(*ordering)[offset: offset + page_size]),
+                ))
+
+                anchor = comments.order_by(*ordering)[offset: offset + 1].first()
+                pagination = CommentPagination()
+                pagination.ordering = ordering
+                position = pagination.get_position(anchor)
+                keyset_ms = self.measure(options["repeat"], lambda: list(
+                    comments.filter(pagination.after(position)).order_by(*ordering)[:page_size]
+                ))
+
+                self.stdout.write(
+                    f"{order} page at {int(depth * 100)}%: offset {offset_ms:.2f} ms | keyset {keyset_ms:.2f} ms"
+                )
+
+    def seed(self, count):
+        author = User.objects.filter(full_name=f"{BENCH_NAME_PREFIX} commenter").first()
+        if not author:
+            author = User.objects.create(id=uuid.uuid4(), full_name=f"{BENCH_NAME_PREFIX} commenter")
+        post = Post.objects.filter(user=author).first() or Post.objects.create(user=author, content="benchmark")
+
+        missing = count - Comment.objects.filter(post=post).count()
+        if missing > 0:
+            created = Comment.objects.bulk_create(
+                [Comment(user=author, post=post, content="benchmark") for _ in range(missing)], batch_size=5000
+            )
+            now = timezone.now()
+            for comment in created:
+                comment.created_at = now - timedelta(seconds=random.randint(0, 60 * 60 * 24 * 30))
+            Comment.objects.bulk_update(created, ["created_at"], batch_size=5000)
+            self.stdout.write(f"Seeded {missing} comments")
+        return post
+
+    def measure(self, repeat, query):
+        """
+        Median latency in milliseconds.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2]
@@ -0,0 +1,112 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from posts import timeline
+from posts.models import Post, PostLike, User
+
+
+BENCH_NAME_PREFIX = "Feed Benchmark"
+
+
+class Command(BaseCommand):
+    help = "Compare feed page latency of the read-time query and the timeline as friend count grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--friends", default="10,100,1000,5000", help="Friend counts to measure.")
+        parser.add_argument("--posts-per-friend", type=int, default=20)
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--pulled", type=int, default=20, help="High degree friends merged at read time.")
+        parser.add_argument("--cleanup", action="store_true", help="Delete seeded users and exit.")
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            deleted, _ = User.objects.filter(full_name__startswith=BENCH_NAME_PREFIX).delete()
+            self.stdout.write(f"Deleted {deleted} rows")
+            return
+
+        friend_counts = [int(count) for count in options["friends"].split(",")]
+        reader = User.objects.create(id=uuid.uuid4(), full_name=f"{BENCH_NAME_PREFIX} reader")
+        friends = self.seed(max(friend_counts), options["posts_per_friend"])
+        page_size = options["page_size"]
+
+        for count in friend_counts:
+            friend_ids = [friend.id for friend in friends[:count]]
+
+            read_time = self.measure(options["repeat"], lambda: list(
+                Post.objects.select_related("user")
+                .annotate(is_liked=Exists(PostLike.objects.filter(post=OuterRef("pk"), user=reader)))
+                .filter(user__id__in=friend_ids, created_at__gte=timezone.now() - timeline.FEED_WINDOW)
+                .order_by("-created_at")[:page_size]
+            ))
+
+            timeline.rebuild(reader.id, friend_ids)
+
+            def read_timeline():
+                post_ids = [post_id for post_id, _ in timeline.read(reader.id, None, page_size)]
+                list(
+                    Post.objects.select_related("user")
+                    .annotate(is_liked=Exists(PostLike.objects.filter(post=OuterRef("pk"), user=reader)))
+                    .filter(id__in=post_ids)
+                )
+
+            fan_out = self.measure(options["repeat"], read_timeline)
+
+            self.stdout.write(
+                f"{count} friends: read-time p50 {read_time[0]:.2f} ms p99 {read_time[1]:.2f} ms | "
+                f"timeline p50 {fan_out[0]:.2f} ms p99 {fan_out[1]:.2f} ms"
+            )
+
+        redis = get_redis_connection("default")
+        pulled = [str(friend.id) for friend in friends[:options["pulled"]]]
+        if pulled:
+            redis.sadd(timeline.HIGH_DEGREE_AUTHORS_KEY, *pulled)
+            timeline.rebuild(reader.id, [friend.id for friend in friends[:max(friend_counts)]])
+            merged = self.measure(options["repeat"], read_timeline)
+            self.stdout.write(
+                f"{max(friend_counts)} friends, {len(pulled)} pulled: "
+                f"timeline p50 {merged[0]:.2f} ms p99 {merged[1]:.2f} ms"
+            )
+            redis.srem(timeline.HIGH_DEGREE_AUTHORS_KEY, *pulled)
+
+        timeline.invalidate(reader.id)
+        reader.delete()
+
+    def seed(self, count, posts_per_friend):
+        friends = list(User.objects.filter(full_name__startswith=f"{BENCH_NAME_PREFIX} friend")[:count])
+        missing = count - len(friends)
+        if missing > 0:
+            friends += User.objects.bulk_create([
+                User(id=uuid.uuid4(), full_name=f"{BENCH_NAME_PREFIX} friend {index}")
+                for index in range(len(friends), count)
+            ])
+            now = timezone.now()
+            posts = [
+                Post(user=friend, content="benchmark")
+                for friend in friends[-missing:]
+                for _ in range(posts_per_friend)
+            ]
+            created = Post.objects.bulk_create(posts, batch_size=5000)
+            for post in created:
+                post.created_at = now - timedelta(minutes=random.randint(0, 60 * 24 * 30))
+            Post.objects.bulk_update(created, ["created_at"], batch_size=5000)
+            self.stdout.write(f"Seeded {missing} friends with {len(created)} posts")
+        return friends
+
+    def measure(self, repeat, query):
+        """
+        (p50, p99) latency in milliseconds.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2], timings[int(len(timings) * 0.99)]
@@ -0,0 +1,60 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import counters
+from posts.models import Post, PostLike, User
+from .benchmark_feed import BENCH_NAME_PREFIX
+
+
+class Command(BaseCommand):
+    help = "Like one post from many users concurrently and check the final counts are exact."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=500)
+        parser.add_argument("--threads", type=int, default=32)
+
+    def handle(self, *args, **options):
+        users = User.objects.bulk_create([
+            User(id=uuid.uuid4(), full_name=f"{BENCH_NAME_PREFIX} liker {index}")
+            for index in range(options["users"])
+        ])
+        post = Post.objects.create(user=users[0], content="benchmark")
+
+        try:
+            # Every user likes, then every other user toggles back and a few double tap.
+            self.storm(post, users, options["threads"], "like")
+            self.storm(post, users[::2], options["threads"], "unlike")
+            self.storm(post, users[1:20:2] * 2, options["threads"], "double tap")
+
+            counters.flush(counters.POST)
+            post.refresh_from_db()
+            actual = PostLike.objects.filter(post=post).count()
+            self.stdout.write(
+                f"like_count {post.like_count} | like rows {actual} | "
+                f"{'exact' if post.like_count == actual else 'MISMATCH'}"
+            )
+        finally:
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+    def storm(self, post, users, threads, name):
+        def toggle(user):
+            close_old_connections()
+            try:
+                started = time.perf_counter()
+                PostLike.like_or_unlike_post(user, post.id)
+                return (time.perf_counter() - started) * 1000
+            finally:
+                close_old_connections()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            timings = sorted(executor.map(toggle, users))
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{name}: {len(users)} toggles in {elapsed:.2f}s ({len(users) / elapsed:.0f}/s) | "
+            f"p50 {timings[len(timings) // 2]:.2f} ms | p99 {timings[int(len(timings) * 0.99)]:.2f} ms"
+        )
@@ -0,0 +1,76 @@
+import random
+import time
+import uuid
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.models import Post, User
+from posts.pagination import PostPagination
+from .benchmark_feed import BENCH_NAME_PREFIX
+
+
+class Command(BaseCommand):
+    help = "Compare offset and keyset pages of a user's posts at increasing depth."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=100000, help="Posts of the benchmark author.")
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        author = self.seed(options["posts"])
+        posts = Post.objects.filter(user=author)
+        total = posts.count()
+        page_size = options["page_size"]
+        ordering = PostPagination.ordering
+        self.stdout.write(f"Posts: {total}")
+
+        for depth in [0.01, 0.1, 0.5, 0.99]:
+            offset = int(total * depth)
+
+            # What PageNumberPagination does: COUNT(*) and an OFFSET.
+            offset_ms = self.measure(options["repeat"], lambda: (
+                posts.count(),
+                list(posts.order_by(*ordering)[offset: offset + page_size]),
+            ))
+
+            anchor = posts.order_by(*ordering)[offset: offset + 1].first()
+            pagination = PostPagination()
+            position = pagination.get_position(anchor)
+            keyset_ms = self.measure(options["repeat"], lambda: list(
+                posts.filter(pagination.after(position)).order_by(*ordering)[:page_size]
+            ))
+
+            self.stdout.write(
+                f"page at {int(depth * 100)}%: offset {offset_ms:.2f} ms | keyset {keyset_ms:.2f} ms"
+            )
+
+    def seed(self, count):
+        author = User.objects.filter(full_name=f"{BENCH_NAME_PREFIX} author").first()
+        if not author:
+            author = User.objects.create(id=uuid.uuid4(), full_name=f"{BENCH_NAME_PREFIX} author")
+
+        missing = count - Post.objects.filter(user=author).count()
+        if missing > 0:
+            created = Post.objects.bulk_create(
+                [Post(user=author, content="benchmark") for _ in range(missing)], batch_size=5000
+            )
+            now = timezone.now()
+            for post in created:
+                post.created_at = now - timedelta(seconds=random.randint(0, 60 * 60 * 24 * 365))
+            Post.objects.bulk_update(created, ["created_at"], batch_size=5000)
+            self.stdout.write(f"Seeded {missing} posts")
+        return author
+
+    def measure(self, repeat, query):
+        """
+        Median latency in milliseconds.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2]
@@ -0,0 +1,83 @@
+import io
+import time
+import uuid
+from decimal import Decimal
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from shared.renderers import ORJSONParser, ORJSONRenderer
+from posts.models import PostDocument
+from posts.serializers import FeedPostDocumentSerializer, UserSerializer, compiled_post
+
+
+class Command(BaseCommand):
+    help = "Compare the throughput of DRF's JSON renderer and parser with the orjson ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=50, help="Posts on the feed page.")
+        parser.add_argument("--users", type=int, default=5000, help="Users in the unpaginated list.")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        payloads = {
+            "feed page": self.feed_page(options["posts"]),
+            "user list": UserSerializer(
+                [{"id": uuid.uuid4(), "full_name": f"User {i}\u2028"} for i in range(options["users"])], many=True
+            ).data,
+            # Values views return without a serializer, left to the encoder.
+            "raw rows": [
+                {"id": uuid.uuid4(), "at": timezone.now(), "score": Decimal("1.25"), 7: None}
+                for _ in range(options["users"])
+            ],
+        }
+
+        for name, data in payloads.items():
+            rendered = JSONRenderer().render(data)
+            if ORJSONRenderer().render(data) != rendered:
+                raise CommandError(f"ORJSONRenderer doesn't render the {name} like JSONRenderer")
+
+            self.stdout.write(f"{name} ({len(rendered) / 1024:.0f} KiB):")
+            for label, renderer in [("json", JSONRenderer()), ("orjson", ORJSONRenderer())]:
+                seconds = self.measure(options["repeat"], lambda: renderer.render(data))
+                self.stdout.write(f"  render {label}: {len(rendered) / seconds / 1024 ** 2:.0f} MiB/s")
+            for label, parser in [("json", JSONParser()), ("orjson", ORJSONParser())]:
+                seconds = self.measure(options["repeat"], lambda: parser.parse(io.BytesIO(rendered)))
+                self.stdout.write(f"  parse {label}: {len(rendered) / seconds / 1024 ** 2:.0f} MiB/s")
+
+    def feed_page(self, count):
+        """
+        A feed page as FeedViewSet renders it, from documents with a full comment snapshot.
+        """
+        now = timezone.now()
+        user = {"id": uuid.uuid4(), "full_name": "Renderer Benchmark"}
+        comment = {
+            "id": str(uuid.uuid4()),
+            "user": UserSerializer(user).data,
+            "created_at": now.isoformat(),
+            "content": "benchmark " * 20,
+            "like_count": 3,
+        }
+        documents = []
+        for _ in range(count):
+            row = {"id": uuid.uuid4(), "created_at": now, "content": "benchmark " * 50, "like_count": 10, "comment_count": 3}
+            row.update({f"user__{field}": value for field, value in user.items()})
+            data = {**compiled_post.render(row), "comments": [comment] * 3}
+            documents.append(PostDocument(id=row["id"], data=data))
+
+        context = {"liked_posts": set(), "liked_comments": set()}
+        return FeedPostDocumentSerializer(documents, many=True, context=context).data
+
+    def measure(self, repeat, render):
+        """
+        Median duration in seconds.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        return timings[len(timings) // 2]
+
@@ -0,0 +1,114 @@
+import time
+import uuid
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from posts import snapshots
+from posts.models import Comment, Post, PostDocument, User
+from posts.serializers import (
+    CommentSerializer,
+    PostDocumentSerializer,
+    UserPostSerializer,
+    compiled_comment,
+    compiled_post,
+    render_post_documents,
+)
+from .benchmark_feed import BENCH_NAME_PREFIX
+
+
+class Command(BaseCommand):
+    help = "Compare the per-post render cost of DRF serializers, compiled serializers and post documents."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=1000, help="Posts rendered per run.")
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        author = self.seed(options["posts"])
+        context = {"liked_posts": set(), "liked_comments": set()}
+
+        posts = Post.objects.filter(user=author).order_by("id")[: options["posts"]]
+        instances = list(posts.select_related("user"))
+        rows = list(posts.values(*compiled_post.values, "latest_comments_snapshot"))
+        comments = Comment.objects.filter(post__in=[post.id for post in instances]).order_by("id")
+        comment_instances = list(comments.select_related("user"))
+        comment_rows = list(comments.values(*compiled_comment.values))
+
+        def documents():
+            return [
+                PostDocument(id=row["id"], data=data) for row, data in zip(rows, render_post_documents(rows))
+            ]
+
+        def drf_posts():
+            return UserPostSerializer(instances, many=True, context=context).data
+
+        def read_posts():
+            return PostDocumentSerializer(documents(), many=True, context=context).data
+
+        def drf_comments():
+            return CommentSerializer(comment_instances, many=True, context=context).data
+
+        def compiled_comments():
+            return [{**compiled_comment.render(row), "is_liked": False} for row in comment_rows]
+
+        self.check_identical("posts", drf_posts(), read_posts())
+        self.check_identical("comments", drf_comments(), compiled_comments())
+        self.check_identical(
+            "snapshot comments",
+            snapshots.serialize(comment_instances),
+            [compiled_comment.render(row) for row in comment_rows],
+        )
+        self.stdout.write(f"Posts: {len(instances)} | comments: {len(comment_instances)} | output identical")
+
+        per_post = len(instances)
+        for name, render in [
+            ("DRF UserPostSerializer", drf_posts),
+            ("compiled post document", lambda: render_post_documents(rows)),
+            ("compiled document + read serializer", read_posts),
+        ]:
+            self.stdout.write(f"{name}: {self.measure(options['repeat'], render) / per_post:.2f} us/post")
+
+        per_comment = len(comment_instances) or 1
+        for name, render in [
+            ("DRF CommentSerializer", drf_comments),
+            ("compiled comment", compiled_comments),
+        ]:
+            self.stdout.write(f"{name}: {self.measure(options['repeat'], render) / per_comment:.2f} us/comment")
+
+    def check_identical(self, name, expected, actual):
+        if JSONRenderer().render(expected) != JSONRenderer().render(actual):
+            raise CommandError(f"Compiled {name} don't render like the DRF serializer")
+
+    def seed(self, count):
+        author = User.objects.filter(full_name=f"{BENCH_NAME_PREFIX} renderer").first()
+        if not author:
+            author = User.objects.create(id=uuid.uuid4(), full_name=f"{BENCH_NAME_PREFIX} renderer")
+
+        missing = count - Post.objects.filter(user=author).count()
+        if missing > 0:
+            created = Post.objects.bulk_create(
+                [Post(user=author, content="benchmark") for _ in range(missing)], batch_size=5000
+            )
+            Comment.objects.bulk_create(
+                [
+                    Comment(user=author, post=post, content="benchmark")
+                    for post in created
+                    for _ in range(snapshots.SNAPSHOT_SIZE)
+                ],
+                batch_size=5000,
+            )
+            snapshots.refresh([post.id for post in created])
+            self.stdout.write(f"Seeded {missing} posts")
+        return author
+
+    def measure(self, repeat, render):
+        """
+        Median render time in microseconds.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            render()
+            timings.append((time.perf_counter() - started) * 1_000_000)
+        timings.sort()
+        return timings[len(timings) // 2]
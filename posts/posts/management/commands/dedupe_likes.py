@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count
+
+from posts.models import CommentLike, PostLike
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete duplicate post and comment likes, keeping the oldest. Runs before migrate, "
+        "the unique_post_like and unique_comment_like constraints can't be added while they exist. "
+        "reconcile_like_counts corrects the counts afterwards."
+    )
+
+    def handle(self, *args, **options):
+        tables = connection.introspection.table_names()
+        for model, field in [(PostLike, "post"), (CommentLike, "comment")]:
+            # Nothing to dedupe before the first migrate.
+            if model._meta.db_table in tables:
+                self.dedupe(model, field)
+
+    def dedupe(self, model, field):
+        groups = (
+            model.objects.values("user_id", f"{field}_id")
+            .annotate(likes=Count("id"))
+            .filter(likes__gt=1)
+        )
+        deleted = 0
+        for group in groups:
+            likes = model.objects.filter(user_id=group["user_id"], **{f"{field}_id": group[f"{field}_id"]})
+            keep = likes.order_by("created_at").values_list("id", flat=True).first()
+            deleted += likes.exclude(id=keep).delete()[0]
+        self.stdout.write(f"Deleted {deleted} duplicate {field} likes")
@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = "Write like count deltas accumulated in Redis to Post.like_count and Comment.like_count."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=float, default=0, help="Keep flushing every N seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            for kind in (counters.POST, counters.COMMENT):
+                try:
+                    flushed = counters.flush(kind)
+                    if flushed:
+                        self.stdout.write(f"Flushed like counts of {flushed} {kind}s")
+                except Exception as e:
+                    self.stderr.write(f"Failed to flush {kind} like counts: {e}")
+                    if not options["every"]:
+                        raise
+
+            if not options["every"]:
+                break
+            time.sleep(options["every"])
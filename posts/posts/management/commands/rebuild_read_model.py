@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import projections
+from posts.models import Comment, CommentDocument, Post, PostDocument
+from postwrite.routers import READ_DATABASE
+
+
+class Command(BaseCommand):
+    help = "Project every post and comment into the read database, e.g. to fill it the first time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--clear", action="store_true", help="Delete all documents first.")
+
+    def handle(self, *args, **options):
+        if options["clear"]:
+            PostDocument.objects.all().delete()
+            CommentDocument.objects.all().delete()
+
+        self.rebuild(Post, projections.project_posts, options["batch_size"])
+        self.rebuild(Comment, projections.project_comments, options["batch_size"])
+
+    def rebuild(self, model, project, batch_size):
+        ids = model.objects.order_by("id").values_list("id", flat=True)
+        last = None
+        projected = 0
+
+        while True:
+            batch = [str(object_id) for object_id in (ids.filter(id__gt=last) if last else ids)[:batch_size]]
+            if not batch:
+                break
+
+            with transaction.atomic(using=READ_DATABASE):
+                project(set(batch))
+            projected += len(batch)
+            last = batch[-1]
+            self.stdout.write(f"Projected {projected}", ending="\r")
+
+        self.stdout.write(f"Projected {projected} {model._meta.verbose_name_plural}")
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+
+from posts import discovery
+
+
+class Command(BaseCommand):
+    help = "Rebuild the discovery pool shown to users without friends."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--every", type=int, default=0, help="Keep refreshing every N seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            try:
+                size = discovery.refresh()
+                self.stdout.write(f"Discovery pool: {size} posts in {(time.perf_counter() - started) * 1000:.0f} ms")
+            except Exception as e:
+                self.stderr.write(f"Failed to refresh discovery pool: {e}")
+                if not options["every"]:
+                    raise
+
+            if not options["every"]:
+                break
+            time.sleep(options["every"])
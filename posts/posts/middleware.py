@@ -5,6 +5,20 @@ from django.conf import settings
 import requests
 
 from .models import User
+from shared import tokens
+from shared.http_client import Upstream
+from shared.user_cache import user_cache
+
+
+users_service = Upstream("users", settings.USERS_SERVICE)
+
+
+def load_user(user_id):
+    return User.objects.filter(id=user_id).first()
+
+
+def verify_token(token):
+    return tokens.verify_token(token, users_service)
 
 
 class UserAuthentication(BaseAuthentication):
@@ -14,10 +28,33 @@ class UserAuthentication(BaseAuthentication):
         if not token:
             return AnonymousUser(), token
 
-        auth_service_url = settings.USERS_SERVICE + "/api/users/me/"
+        if settings.AUTH_MODE == "remote":
+            return self.authenticate_remote(token)
+
+        if settings.AUTH_MODE == "gateway":
+            return self.authenticate_gateway(request, token)
+
+        payload = verify_token(token.split("JWT")[-1].strip())
+        return (
+            self.get_user(payload["user_id"]),
+            token.split("JWT")[-1],
+        )
+
+    def authenticate_gateway(self, request, token):
+        """
+        The gateway already validated the token and forwards its user id.
+        """
+        user_id = request.headers.get("X-User-Id")
+        if not user_id:
+            raise AuthenticationFailed("Invalid token")
+        return (
+            self.get_user(user_id),
+            token.split("JWT")[-1],
+        )
 
+    def authenticate_remote(self, token):
         try:
-            response = requests.get(auth_service_url, headers={"Authorization": token})
+            response = users_service.get("/api/users/me/", headers={"Authorization": token})
             if response.status_code == 200:
                 user_data = response.json()
                 return (
@@ -30,7 +67,7 @@ class UserAuthentication(BaseAuthentication):
             raise AuthenticationFailed("Auth service unavailable")
 
     def get_user(self, user_id):
-        user = User.objects.filter(id=user_id).first()
+        user = user_cache.get(str(user_id), load_user)
         if not user:
             return AnonymousUser()
         user.is_authenticated = True
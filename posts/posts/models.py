@@ -1,9 +1,11 @@
 import uuid
-from django.db import models
+from django.db import IntegrityError, models, transaction
 from django.db.models import F
-from rest_framework.exceptions import APIException
-from django.db.models.signals import post_save
+from rest_framework.exceptions import NotFound
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+
+from . import counters, liked, projections
     
 
 class User(models.Model):
@@ -14,6 +16,43 @@ class User(models.Model):
         return self.full_name
 
 
+class Friendship(models.Model):
+    """
+    Local copy of the friends graph, kept in sync by friend.created/friend.removed events.
+    Stored in both directions so a user's friends are one index range scan.
+    """
+
+    user_id = models.UUIDField()
+    friend_id = models.UUIDField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_id", "friend_id"], name="unique_friendship"),
+        ]
+
+    @classmethod
+    def add(cls, pairs):
+        cls.objects.bulk_create(
+            [
+                cls(user_id=user_id, friend_id=friend_id)
+                for first, second in pairs
+                for user_id, friend_id in ((first, second), (second, first))
+            ],
+            ignore_conflicts=True,
+            batch_size=5000,
+        )
+
+    @classmethod
+    def remove(cls, first, second):
+        cls.objects.filter(
+            models.Q(user_id=first, friend_id=second) | models.Q(user_id=second, friend_id=first)
+        ).delete()
+
+    @classmethod
+    def get_friend_ids(cls, user_id):
+        return list(cls.objects.filter(user_id=user_id).values_list("friend_id", flat=True))
+
+
 class Post(models.Model):
     id = models.UUIDField(
         primary_key=True, default=uuid.uuid4, editable=False, db_index=True
@@ -22,10 +61,31 @@ class Post(models.Model):
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     like_count = models.IntegerField(default=0)
+    comment_count = models.IntegerField(default=0)
+    # Newest comments as rendered with the post, kept by snapshots so lists need no comment query.
+    latest_comments_snapshot = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        indexes = [
+            # Profile pages: WHERE user_id = ? ORDER BY created_at DESC, id with a keyset cursor.
+            models.Index(fields=["user", "-created_at", "id"], name="post_user_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.user.full_name} - {self.created_at}"
 
+    @classmethod
+    def get_for_comments(cls, post_id, for_update=False):
+        """
+        The one lookup comment endpoints make for their post, with only what adding a
+        comment needs.
+        """
+        queryset = cls.objects.select_for_update() if for_update else cls.objects
+        post = queryset.filter(id=post_id).only("id", "latest_comments_snapshot").first()
+        if not post:
+            raise NotFound("Post not found")
+        return post
+
 
 class Comment(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -35,6 +95,12 @@ class Comment(models.Model):
     like_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Comment threads: WHERE post_id = ? ORDER BY created_at, id in either direction.
+            models.Index(fields=["post", "created_at", "id"], name="comment_post_created_idx"),
+        ]
+
     def __str__(self):
         return f"{self.id}"
 
@@ -45,26 +111,30 @@ class PostLike(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "post"], name="unique_post_like"),
+        ]
+
     @classmethod
     def like_or_unlike_post(cls, user:User, post_id:str):
-        post = Post.objects.filter(id=post_id).first()
-        if not post:
-            raise APIException("Post not found")
-        
-        post_like = cls.objects.filter(user=user, post=post).first()
-
-        if post_like:
-            post_like.delete()
-            post.like_count -= 1
-        else:
-            post_like = cls.objects.create(user=user, post=post)
-            post.like_count += 1
-
-        post.save()
-
-        new_post_like_count = post.like_count
-
-        return new_post_like_count, bool(post_like)
+        """
+        Toggle without locking the post. The unique constraint settles concurrent likes,
+        the count change is queued in Redis once the like commits and written by
+        flush_like_counts.
+        """
+        like_count = Post.objects.filter(id=post_id).values_list("like_count", flat=True).first()
+        if like_count is None:
+            raise NotFound("Post not found")
+
+        is_liked, delta = toggle(cls, user=user, post_id=post_id)
+        pending = counters.pending(counters.POST, [post_id])[str(post_id)]
+        transaction.on_commit(lambda: liked.record(liked.POST, user.id, post_id, is_liked))
+        # A rolled back like must not leave its delta behind.
+        if delta:
+            transaction.on_commit(lambda: counters.add(counters.POST, post_id, delta))
+
+        return like_count + pending + delta, is_liked
     
 
 
@@ -74,25 +144,97 @@ class CommentLike(models.Model):
     comment = models.ForeignKey(Comment, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "comment"], name="unique_comment_like"),
+        ]
+
     @classmethod
     def like_or_unlike_comment(cls, user:User, comment_id:str):
-        comment = Comment.objects.filter(id=comment_id).first()
-        if not comment:
-            raise APIException("Comment not found")
-        
-        comment_like = cls.objects.filter(user=user, comment=comment).first()
-
-        if comment_like:
-            comment_like.delete()
-            comment.like_count -= 1
-            comment_like = None
-        else:        
-            comment_like = cls.objects.create(user=user, comment=comment)
-            comment.like_count += 1
-
-        comment.save()
-
-        new_comment_like_count = comment.like_count
-
-        return new_comment_like_count, bool(comment_like)
-    
\ No newline at end of file
+        like_count = Comment.objects.filter(id=comment_id).values_list("like_count", flat=True).first()
+        if like_count is None:
+            raise NotFound("Comment not found")
+
+        is_liked, delta = toggle(cls, user=user, comment_id=comment_id)
+        pending = counters.pending(counters.COMMENT, [comment_id])[str(comment_id)]
+        transaction.on_commit(lambda: liked.record(liked.COMMENT, user.id, comment_id, is_liked))
+        # A rolled back like must not leave its delta behind.
+        if delta:
+            transaction.on_commit(lambda: counters.add(counters.COMMENT, comment_id, delta))
+
+        return like_count + pending + delta, is_liked
+
+
+def toggle(model, **fields):
+    """
+    Delete the like if it exists, create it otherwise. Returns (is_liked, count delta).
+    A concurrent request that already created the like leaves the count unchanged.
+    """
+    deleted, _ = model.objects.filter(**fields).delete()
+    if deleted:
+        return False, -1
+
+    try:
+        with transaction.atomic():
+            model.objects.create(**fields)
+    except IntegrityError:
+        return True, 0
+    return True, 1
+
+
+class ProjectionEvent(models.Model):
+    """
+    A post or comment changed and its document in the read database must be rebuilt by
+    projector.py. Written in the same transaction as the change.
+    """
+
+    action_type = models.CharField(max_length=100)
+    key = models.CharField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.action_type} - {self.key}"
+
+
+class PostDocument(models.Model):
+    """
+    Read side copy of a post as the API renders it, without the viewer dependent fields.
+    Lives in the read database and is only written by projector.py.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    user_id = models.UUIDField()
+    created_at = models.DateTimeField()
+    data = models.JSONField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_id", "-created_at", "id"], name="post_document_user_idx"),
+        ]
+
+
+class CommentDocument(models.Model):
+    """
+    Read side copy of a comment as the API renders it, see PostDocument.
+    """
+
+    id = models.UUIDField(primary_key=True, editable=False)
+    post_id = models.UUIDField()
+    created_at = models.DateTimeField()
+    data = models.JSONField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["post_id", "created_at", "id"], name="comment_document_post_idx"),
+        ]
+
+
+@receiver([post_save, post_delete], sender=Post)
+def post_changed(sender, instance, **kwargs):
+    projections.post_changed(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    # The post's snapshot and comment count are projected when snapshots change them.
+    projections.comment_changed(instance.id)
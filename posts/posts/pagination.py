@@ -0,0 +1,96 @@
+import random
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+
+from shared.pagination import CursorMixin, KeysetPagination
+
+
+class PostPagination(KeysetPagination):
+    ordering = ("-created_at", "id")
+
+
+class CommentPagination(KeysetPagination):
+    """
+    Oldest first by default, `?order=newest` pages from the other end of the same index.
+    """
+
+    orderings = {
+        "oldest": ("created_at", "id"),
+        "newest": ("-created_at", "-id"),
+    }
+    order_query_param = "order"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        order = request.query_params.get(self.order_query_param, "oldest")
+        if order not in self.orderings:
+            raise ValidationError({self.order_query_param: f"Must be one of: {', '.join(self.orderings)}"})
+        self.ordering = self.orderings[order]
+        return super().paginate_queryset(queryset, request, view)
+
+
+class TimelinePagination(CursorMixin, BasePagination):
+    """
+    Cursor pagination over a Redis timeline. The cursor holds the score and id of the
+    last post, only the ids of the requested page are read.
+    """
+
+    page_size = KeysetPagination.page_size
+
+    def paginate_ids(self, read, request):
+        """
+        `read(position, limit)` returns up to `limit` (id, score) pairs after `position`.
+        """
+        self.request = request
+        position = self.decode_cursor(request, 2)
+
+        if position is not None:
+            try:
+                position = [float(position[0]), str(position[1])]
+            except (TypeError, ValueError):
+                raise NotFound("Invalid cursor")
+
+        entries = read(position, self.page_size + 1)
+        self.has_next = len(entries) > self.page_size
+        entries = entries[: self.page_size]
+        self.next_position = [entries[-1][1], entries[-1][0]] if self.has_next else None
+        return [post_id for post_id, _ in entries]
+
+    def dump(self):
+        return {"next": self.next_position}
+
+    def load(self, request, state):
+        """
+        Restore a page resolved earlier, see feed_cache.
+        """
+        self.request = request
+        self.next_position = state["next"]
+        self.has_next = self.next_position is not None
+
+
+class DiscoveryPagination(CursorMixin, BasePagination):
+    """
+    Pages of the discovery pool in an order shuffled per reader. The cursor holds the
+    shuffle seed and the offset, so pages never repeat while scrolling.
+    """
+
+    page_size = KeysetPagination.page_size
+
+    def paginate_ids(self, read, request):
+        """
+        `read(seed, offset, limit)` returns (ids, pool_size).
+        """
+        self.request = request
+        position = self.decode_cursor(request, 2)
+
+        if position is None:
+            seed, offset = random.getrandbits(31), 0
+        else:
+            # Cursors only ever hold what this class wrote, non-negative integers.
+            if not all(type(value) is int and value >= 0 for value in position):
+                raise NotFound("Invalid cursor")
+            seed, offset = position
+
+        ids, size = read(seed, offset, self.page_size)
+        self.has_next = offset + self.page_size < size
+        self.next_position = [seed, offset + self.page_size] if self.has_next else None
+        return ids
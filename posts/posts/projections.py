@@ -0,0 +1,117 @@
+import logging
+from django.db import transaction
+
+from postwrite.routers import READ_DATABASE
+from shared.replicas import current_request
+from .feed_cache import invalidate_posts
+
+
+logger = logging.getLogger(__name__)
+
+
+POST_CHANGED = "post.changed"
+COMMENT_CHANGED = "comment.changed"
+
+
+def emit(action_type, keys):
+    """
+    Queue documents for projector.py. Call inside the transaction of the change, so the
+    event commits or rolls back with it. Changes made by a client request are also projected
+    as soon as they commit, so the client reads its own writes from the read database.
+    """
+    from .models import ProjectionEvent
+
+    events = [ProjectionEvent(action_type=action_type, key=str(key)) for key in keys]
+    ProjectionEvent.objects.bulk_create(events)
+
+    if current_request.get() is not None:
+        transaction.on_commit(lambda: project_now(events))
+
+
+def project_now(events):
+    """
+    Project the events of a committed change without waiting for projector.py. The events
+    stay queued and are projected again, which is harmless. A failure leaves the documents
+    to projector.py, the change itself is already committed.
+    """
+    try:
+        with transaction.atomic(using=READ_DATABASE):
+            project(events)
+    except Exception as e:
+        logger.error(f"Failed to project {len(events)} events: {e}")
+
+
+def post_changed(*post_ids):
+    emit(POST_CHANGED, post_ids)
+
+
+def comment_changed(*comment_ids):
+    emit(COMMENT_CHANGED, comment_ids)
+
+
+def project(events):
+    """
+    Bring the documents of a batch of events up to date. Events only name what changed,
+    the current rows are read once per key, so duplicate and out of order events are harmless.
+    """
+    post_ids = {event.key for event in events if event.action_type == POST_CHANGED}
+    comment_ids = {event.key for event in events if event.action_type == COMMENT_CHANGED}
+
+    project_posts(post_ids)
+    project_comments(comment_ids)
+    # Feed fragments are built from post documents, drop them once the documents are committed.
+    transaction.on_commit(lambda: invalidate_posts(*post_ids), using=READ_DATABASE)
+
+
+def project_posts(post_ids):
+    from .models import CommentDocument, Post, PostDocument
+    from .serializers import compiled_post, render_post_documents
+
+    if not post_ids:
+        return
+
+    posts = list(
+        Post.objects.filter(id__in=post_ids).values(*compiled_post.values, "user_id", "latest_comments_snapshot")
+    )
+    PostDocument.objects.bulk_create(
+        [
+            PostDocument(id=post["id"], user_id=post["user_id"], created_at=post["created_at"], data=data)
+            for post, data in zip(posts, render_post_documents(posts))
+        ],
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=["user_id", "created_at", "data"],
+    )
+
+    deleted = set(post_ids) - {str(post["id"]) for post in posts}
+    if deleted:
+        PostDocument.objects.filter(id__in=deleted).delete()
+        CommentDocument.objects.filter(post_id__in=deleted).delete()
+
+
+def project_comments(comment_ids):
+    from .models import Comment, CommentDocument
+    from .serializers import compiled_comment
+
+    if not comment_ids:
+        return
+
+    comments = list(Comment.objects.filter(id__in=comment_ids).values(*compiled_comment.values, "post_id"))
+    CommentDocument.objects.bulk_create(
+        [
+            CommentDocument(
+                id=comment["id"],
+                post_id=comment["post_id"],
+                created_at=comment["created_at"],
+                data=compiled_comment.render(comment),
+            )
+            for comment in comments
+        ],
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=["post_id", "created_at", "data"],
+    )
+
+    deleted = set(comment_ids) - {str(comment["id"]) for comment in comments}
+    if deleted:
+        CommentDocument.objects.filter(id__in=deleted).delete()
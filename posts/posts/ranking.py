@@ -0,0 +1,183 @@
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from django.conf import settings
+
+
+"""
+Orders feed pages by the interaction model trained by test9.py. Candidates are the posts of
+the page the pagination resolved, from the timeline or the discovery pool, so cursors stay
+valid. Their features are assembled in one batch and scored in one inference call. Pages
+keep their chronological order when there is no model or scoring exceeds the budget.
+"""
+
+
+logger = logging.getLogger(__name__)
+
+# Ranking runs on CPU, a GPU would only add transfer cost to batches this small.
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+
+MODEL_DIR = os.path.join(settings.BASE_DIR, "postwrite", "models")
+MODEL_FILE = "post_recommendation_model.keras"
+# uuid -> integer maps test9.py writes next to the model.
+ID_MAPS = {"user": "user_id_map.json", "post": "post_id_map.json", "comment": "comment_id_map.json"}
+# Columns of the model input, see features().
+FEATURE_COUNT = 16
+# The model file is checked for changes at most this often.
+RELOAD_INTERVAL = 10
+
+RANKING_WORKERS = 2
+
+executor = ThreadPoolExecutor(max_workers=RANKING_WORKERS, thread_name_prefix="ranking")
+# Held while a page is scored, including past its budget: a running inference can't be
+# cancelled, so a page is only handed to a worker that is free right now.
+_free_workers = threading.BoundedSemaphore(RANKING_WORKERS)
+
+
+class Ranker:
+    """
+    The model and id maps, reloaded in the background when the model file changes. Requests
+    keep using the loaded model while a new one loads.
+    """
+
+    def __init__(self, model_dir):
+        self.path = os.path.join(model_dir, MODEL_FILE)
+        self.model_dir = model_dir
+        self.lock = threading.Lock()
+        self.loaded = None
+        self.loaded_mtime = None
+        self.checked_at = 0
+        self.reloading = False
+
+    def get(self):
+        """
+        The loaded (model, id_maps), or None until a model was loaded.
+        """
+        now = time.monotonic()
+        if now - self.checked_at >= RELOAD_INTERVAL:
+            self.checked_at = now
+            self.check()
+        return self.loaded
+
+    def check(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            return
+
+        with self.lock:
+            if mtime == self.loaded_mtime or self.reloading:
+                return
+            self.reloading = True
+        threading.Thread(target=self.reload, args=(mtime,), daemon=True).start()
+
+    def reload(self, mtime):
+        try:
+            import keras
+            import numpy as np
+
+            model = keras.models.load_model(self.path, compile=False)
+            id_maps = self.load_id_maps()
+            # The first call builds the inference graph, keep it out of the request budget.
+            model.predict_on_batch(np.zeros((1, FEATURE_COUNT), dtype=np.float32))
+            self.loaded = (model, id_maps)
+            self.loaded_mtime = mtime
+            logger.info(f"Loaded ranking model {self.path}")
+        except Exception as e:
+            # A model still being written fails to load, it is retried on the next check.
+            logger.error(f"Failed to load ranking model {self.path}: {e}")
+        finally:
+            with self.lock:
+                self.reloading = False
+
+    def load_id_maps(self):
+        id_maps = {}
+        for name, file in ID_MAPS.items():
+            try:
+                with open(os.path.join(self.model_dir, file)) as f:
+                    id_maps[name] = json.load(f)
+            except OSError:
+                # Ids then all map to 0, ranking still runs but loses the id features.
+                logger.warning(f"Ranking id map {file} not found in {self.model_dir}")
+                id_maps[name] = {}
+        return id_maps
+
+
+ranker = Ranker(MODEL_DIR)
+
+
+def features(fragments, id_maps):
+    """
+    One row per post in the column order test9.py trains on. Rows describe the post and its
+    newest comment. Text isn't vectorized at serving time, and the viewer's own likes are
+    left out since they are what the model predicts, both are zero as for rows without them.
+    """
+    import numpy as np
+
+    users, posts, comments = id_maps["user"], id_maps["post"], id_maps["comment"]
+    newest = [fragment["comments"][0] if fragment["comments"] else None for fragment in fragments]
+
+    def timestamps(values):
+        # Serializers render UTC with a trailing Z, numpy parses naive ISO timestamps.
+        parsed = np.array([value[:-1] if value else "NaT" for value in values], dtype="datetime64[ns]")
+        return np.where(np.isnat(parsed), 0, parsed.astype(np.int64))
+
+    zeros = np.zeros(len(fragments))
+    columns = [
+        zeros,  # post_content
+        np.array([fragment["like_count"] for fragment in fragments], dtype=float),
+        timestamps([fragment["created_at"] for fragment in fragments]),
+        np.array([users.get(fragment["user"]["id"], 0) for fragment in fragments], dtype=float),
+        zeros,  # post_like_created_at
+        zeros,  # post_like_post_id
+        zeros,  # post_like_user_id
+        np.array([comments.get(comment["id"], 0) if comment else 0 for comment in newest], dtype=float),
+        zeros,  # comment_content
+        np.array([comment["like_count"] if comment else 0 for comment in newest], dtype=float),
+        timestamps([comment["created_at"] if comment else None for comment in newest]),
+        np.array([posts.get(fragment["id"], 0) if comment else 0 for fragment, comment in zip(fragments, newest)], dtype=float),
+        np.array([users.get(comment["user"]["id"], 0) if comment else 0 for comment in newest], dtype=float),
+        zeros,  # comment_like_created_at
+        zeros,  # comment_like_comment_id
+        zeros,  # comment_like_user_id
+    ]
+    return np.column_stack(columns).astype(np.float32)
+
+
+def score(model, fragments, id_maps):
+    return model.predict_on_batch(features(fragments, id_maps)).reshape(-1)
+
+
+def rank(post_ids, fragments):
+    """
+    `post_ids` ordered by predicted interaction, or unchanged without a model, when every
+    worker is busy or when scoring takes longer than FEED_RANKING_BUDGET_MS.
+    """
+    loaded = ranker.get()
+    if loaded is None or len(post_ids) < 2:
+        return post_ids
+
+    if not _free_workers.acquire(blocking=False):
+        logger.warning("All ranking workers are busy, serving the page chronologically")
+        return post_ids
+
+    model, id_maps = loaded
+    started = time.perf_counter()
+    future = executor.submit(score, model, [fragments[post_id] for post_id in post_ids], id_maps)
+    future.add_done_callback(lambda _: _free_workers.release())
+    try:
+        scores = future.result(timeout=settings.FEED_RANKING_BUDGET_MS / 1000)
+    except TimeoutError:
+        logger.warning(f"Ranking exceeded {settings.FEED_RANKING_BUDGET_MS} ms, serving the page chronologically")
+        return post_ids
+    except Exception as e:
+        logger.error(f"Failed to rank feed page: {e}")
+        return post_ids
+
+    logger.debug(f"Ranked {len(post_ids)} posts in {(time.perf_counter() - started) * 1000:.1f} ms")
+    # sorted() is stable, posts with equal scores keep their chronological order.
+    order = sorted(range(len(post_ids)), key=lambda index: -scores[index])
+    return [post_ids[index] for index in order]
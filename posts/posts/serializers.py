@@ -1,6 +1,28 @@
+from django.db import transaction
+from drf_yasg.utils import swagger_serializer_method
 from rest_framework import serializers
 
 from .models import Post, User, Comment, PostLike, CommentLike
+from . import liked, snapshots
+
+
+class LikedListSerializer(serializers.ListSerializer):
+    """
+    Looks up is_liked for every item of the list with one batched membership check
+    before serializing them.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, "all") else data)
+        self.child.hydrate_likes(items)
+        return super().to_representation(items)
+
+
+def ordered(data, serializer_class):
+    """
+    JSONB doesn't keep key order, put stored keys back in the order the serializer renders them.
+    """
+    return {field: data[field] for field in serializer_class.Meta.fields if field in data}
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -14,18 +36,30 @@ class CommentSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
     like_count = serializers.IntegerField(read_only=True)
-    is_liked = serializers.BooleanField(read_only=True)
+    is_liked = serializers.SerializerMethodField()
 
     class Meta:
         model = Comment
         fields = ["id", "user", "created_at", "content", "like_count", "is_liked"]
+        list_serializer_class = LikedListSerializer
+
+    def hydrate_likes(self, comments):
+        # Comments nested in a post list were looked up with their posts.
+        if "liked_comments" not in self.context:
+            user = self.context["request"].user
+            self.context["liked_comments"] = liked.check(liked.COMMENT, user.id, [comment.id for comment in comments])
+
+    def get_is_liked(self, comment) -> bool:
+        return str(comment.id) in self.context.get("liked_comments", ())
 
     def create(self, validated_data):
         user = self.context["request"].user
         post_id = self.context["post_id"]
 
-        post = Post.objects.filter(id=post_id).first()
-        comment = Comment.objects.create(user=user, post=post, **validated_data)
+        with transaction.atomic():
+            post = Post.get_for_comments(post_id, for_update=True)
+            comment = Comment.objects.create(user=user, post=post, **validated_data)
+            snapshots.push(post, comment)
         return comment
 
 
@@ -34,8 +68,9 @@ class PostSerializer(serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
     like_count = serializers.IntegerField(read_only=True)
-    comments = CommentSerializer(source="latest_comments", many=True, read_only=True)
-    is_liked = serializers.BooleanField(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
+    comments = serializers.SerializerMethodField()
+    is_liked = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -46,13 +81,38 @@ class PostSerializer(serializers.ModelSerializer):
             "content",
             "like_count",
             "is_liked",
+            "comment_count",
             "comments",
             "is_feed_post",
         ]
+        list_serializer_class = LikedListSerializer
+
+    def hydrate_likes(self, posts):
+        if "liked_posts" in self.context:
+            return
+        user = self.context["request"].user
+        comment_ids = [comment["id"] for post in posts for comment in self.latest_comments(post)]
+        self.context["liked_posts"] = liked.check(liked.POST, user.id, [post.id for post in posts])
+        self.context["liked_comments"] = liked.check(liked.COMMENT, user.id, comment_ids)
+
+    def get_is_liked(self, post) -> bool:
+        return str(post.id) in self.context.get("liked_posts", ())
+
+    def latest_comments(self, post):
+        return post.latest_comments_snapshot[: self.context.get("comments_count", snapshots.SNAPSHOT_SIZE)]
+
+    @swagger_serializer_method(serializer_or_field=CommentSerializer(many=True))
+    def get_comments(self, post):
+        liked_comments = self.context.get("liked_comments", ())
+        return [
+            {**ordered(comment, CommentSerializer), "is_liked": comment["id"] in liked_comments}
+            for comment in self.latest_comments(post)
+        ]
 
     def create(self, validated_data):
         user = self.context["request"].user
-        post = Post.objects.create(user=user, **validated_data)
+        with transaction.atomic():
+            post = Post.objects.create(user=user, **validated_data)
         return post
 
 
@@ -60,4 +120,127 @@ class UserPostSerializer(PostSerializer):
     is_feed_post = serializers.BooleanField(read_only=True, default=False)
 
 class FeedPostSerializer(PostSerializer):
-    is_feed_post = serializers.BooleanField(read_only=True, default=True)
\ No newline at end of file
+    is_feed_post = serializers.BooleanField(read_only=True, default=True)
+
+
+class CompiledSerializer:
+    """
+    A read only ModelSerializer with its fields resolved once. Renders rows of .values() or
+    model instances straight into dicts, skipping DRF's per object field walk, with the same
+    output as the serializer. Only model fields and nested serializers are supported.
+    """
+
+    def __init__(self, serializer_class, exclude=(), prefix=""):
+        self.values = []
+        self.accessors = []
+
+        for name, field in serializer_class().fields.items():
+            if name in exclude:
+                continue
+            if field.source == "*":
+                raise ValueError(f"{serializer_class.__name__}.{name} can't be compiled")
+
+            key = prefix + field.source.replace(".", "__")
+            if isinstance(field, serializers.BaseSerializer):
+                nested = CompiledSerializer(type(field), prefix=f"{key}__")
+                self.values += nested.values
+                self.accessors.append((name, key, field.source, None, nested))
+            else:
+                self.values.append(key)
+                self.accessors.append((name, key, field.source, field.to_representation, None))
+
+    def render(self, row):
+        data = {}
+        for name, key, _, to_representation, nested in self.accessors:
+            if nested is not None:
+                data[name] = nested.render(row)
+            else:
+                value = row[key]
+                data[name] = None if value is None else to_representation(value)
+        return data
+
+    def render_object(self, instance):
+        data = {}
+        for name, _, attribute, to_representation, nested in self.accessors:
+            value = getattr(instance, attribute)
+            if value is None:
+                data[name] = None
+            elif nested is not None:
+                data[name] = nested.render_object(value)
+            else:
+                data[name] = to_representation(value)
+        return data
+
+
+# Comments as stored in snapshots and comment documents, without the viewer dependent is_liked.
+compiled_comment = CompiledSerializer(CommentSerializer, exclude=("is_liked",))
+# Posts as stored in post documents, the comments come from the snapshot.
+compiled_post = CompiledSerializer(UserPostSerializer, exclude=("is_liked", "comments", "is_feed_post"))
+
+
+def render_post_documents(rows):
+    """
+    What PostDocument stores for each post: the post as everyone sees it, with the whole
+    comment snapshot. Viewer dependent fields are added when reading. Rows come from
+    .values(*compiled_post.values, "latest_comments_snapshot").
+    """
+    return [
+        {**compiled_post.render(row), "comments": row["latest_comments_snapshot"]}
+        for row in rows
+    ]
+
+
+class CommentDocumentSerializer(serializers.BaseSerializer):
+    """
+    Renders a CommentDocument exactly like CommentSerializer renders the comment.
+    """
+
+    class Meta:
+        list_serializer_class = LikedListSerializer
+
+    def hydrate_likes(self, documents):
+        user = self.context["request"].user
+        self.context["liked_comments"] = liked.check(liked.COMMENT, user.id, [document.id for document in documents])
+
+    def to_representation(self, document):
+        is_liked = str(document.id) in self.context.get("liked_comments", ())
+        return {**ordered(document.data, CommentSerializer), "is_liked": is_liked}
+
+
+class PostDocumentSerializer(serializers.BaseSerializer):
+    """
+    Renders a PostDocument exactly like UserPostSerializer or FeedPostSerializer render the post.
+    """
+
+    is_feed_post = False
+
+    class Meta:
+        list_serializer_class = LikedListSerializer
+
+    def hydrate_likes(self, documents):
+        if "liked_posts" in self.context:
+            return
+        user = self.context["request"].user
+        comment_ids = [comment["id"] for document in documents for comment in self.latest_comments(document)]
+        self.context["liked_posts"] = liked.check(liked.POST, user.id, [document.id for document in documents])
+        self.context["liked_comments"] = liked.check(liked.COMMENT, user.id, comment_ids)
+
+    def latest_comments(self, document):
+        return document.data["comments"][: self.context.get("comments_count", snapshots.SNAPSHOT_SIZE)]
+
+    def to_representation(self, document):
+        liked_comments = self.context.get("liked_comments", ())
+        data = {
+            **document.data,
+            "is_liked": str(document.id) in self.context.get("liked_posts", ()),
+            "comments": [
+                {**ordered(comment, CommentSerializer), "is_liked": comment["id"] in liked_comments}
+                for comment in self.latest_comments(document)
+            ],
+            "is_feed_post": self.is_feed_post,
+        }
+        return ordered(data, PostSerializer)
+
+
+class FeedPostDocumentSerializer(PostDocumentSerializer):
+    is_feed_post = True
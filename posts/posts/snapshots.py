@@ -0,0 +1,72 @@
+from django.db import transaction
+from django.db.models import F
+
+from . import projections
+
+
+# Newest comments stored on each post, enough for the longest list rendered with a post.
+SNAPSHOT_SIZE = 3
+
+
+def serialize(comments):
+    """
+    Comment instances as CommentSerializer renders them, without the viewer dependent is_liked.
+    """
+    from .serializers import compiled_comment
+
+    return [compiled_comment.render_object(comment) for comment in comments]
+
+
+def serialize_rows(comments):
+    """
+    Like serialize, for a Comment queryset. Only the rendered columns are fetched.
+    """
+    from .serializers import compiled_comment
+
+    return [compiled_comment.render(row) for row in comments.values(*compiled_comment.values)]
+
+
+def push(post, comment):
+    """
+    Put a new comment in front of the snapshot. The caller holds the post row lock, so
+    concurrent comments on the same post don't overwrite each other's snapshot.
+    """
+    from .models import Post
+
+    snapshot = serialize([comment]) + post.latest_comments_snapshot
+    Post.objects.filter(id=post.id).update(
+        latest_comments_snapshot=snapshot[:SNAPSHOT_SIZE],
+        comment_count=F("comment_count") + 1,
+    )
+    projections.post_changed(post.id)
+
+
+def refresh(post_ids, comment_ids=None):
+    """
+    Rebuild snapshots and counts from the comment rows, e.g. after comment like counts were
+    flushed or a commenter was renamed. With `comment_ids`, only posts whose snapshot holds
+    one of them are rebuilt. Returns the ids of the rebuilt posts.
+    """
+    from .models import Comment, Post
+
+    post_ids = list(post_ids)
+    if comment_ids is not None:
+        comment_ids = {str(comment_id) for comment_id in comment_ids}
+        post_ids = [
+            post_id
+            for post_id, snapshot in Post.objects.filter(id__in=post_ids).values_list("id", "latest_comments_snapshot")
+            if any(comment["id"] in comment_ids for comment in snapshot)
+        ]
+
+    for post_id in post_ids:
+        with transaction.atomic():
+            if not list(Post.objects.select_for_update().filter(id=post_id).values_list("id", flat=True)):
+                continue
+            comments = Comment.objects.filter(post_id=post_id).order_by("-created_at", "-id")
+            Post.objects.filter(id=post_id).update(
+                latest_comments_snapshot=serialize_rows(comments[:SNAPSHOT_SIZE]),
+                comment_count=comments.count(),
+            )
+            projections.post_changed(post_id)
+
+    return [str(post_id) for post_id in post_ids]
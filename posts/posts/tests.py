@@ -1,3 +1,1137 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import threading
+import time
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+import jwt
+from django.conf import settings
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from django_redis import get_redis_connection
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework import serializers
+from rest_framework.exceptions import AuthenticationFailed, NotFound, ParseError, ValidationError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
 
-# Create your tests here.
+import projector
+from shared import replicas, tokens
+from shared.http_client import CircuitBreaker, CircuitOpenError, Upstream
+from shared.renderers import ORJSONParser, ORJSONRenderer
+from shared.user_cache import UserCache
+from . import counters, discovery, feed_cache, projections, ranking, snapshots, timeline
+from .management.commands.reconcile_like_counts import Command as ReconcileCommand
+from .middleware import UserAuthentication
+from .models import (
+    Comment,
+    CommentDocument,
+    CommentLike,
+    Friendship,
+    Post,
+    PostDocument,
+    PostLike,
+    ProjectionEvent,
+    User,
+    toggle,
+)
+from .pagination import CommentPagination, DiscoveryPagination, PostPagination, TimelinePagination
+from .serializers import (
+    CommentSerializer,
+    CompiledSerializer,
+    UserPostSerializer,
+    compiled_comment,
+    compiled_post,
+)
+from .views import PostViewSet, UserPostsViewSet
+
+
+# Tests get a Redis database of their own and flush it, the service's data is left alone.
+TEST_CACHES = {
+    "default": {
+        **settings.CACHES["default"],
+        "LOCATION": settings.CACHES["default"]["LOCATION"].rsplit("/", 1)[0] + "/15",
+    }
+}
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RedisTestCase(TestCase):
+    def setUp(self):
+        self.redis = get_redis_connection("default")
+        self.redis.flushdb()
+        self.addCleanup(self.redis.flushdb)
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 100.0
+        patcher = mock.patch("shared.http_client.time.monotonic", lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.breaker = CircuitBreaker(failure_threshold=3, reset_timeout=10)
+
+    def open_breaker(self):
+        for _ in range(3):
+            self.breaker.record_failure()
+
+    def test_opens_after_consecutive_failures(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.assertFalse(self.breaker.allow())
+
+    def test_success_resets_the_failure_count(self):
+        self.breaker.record_failure()
+        self.breaker.record_failure()
+        self.breaker.record_success()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_half_open_lets_one_trial_through(self):
+        self.open_breaker()
+        self.now += 10
+        self.assertEqual(self.breaker.state, "half-open")
+        self.assertTrue(self.breaker.allow())
+        self.assertFalse(self.breaker.allow())
+
+    def test_trial_success_closes(self):
+        self.open_breaker()
+        self.now += 10
+        self.breaker.allow()
+        self.breaker.record_success()
+        self.assertEqual(self.breaker.state, "closed")
+        self.assertTrue(self.breaker.allow())
+
+    def test_trial_failure_reopens(self):
+        self.open_breaker()
+        self.now += 10
+        self.breaker.allow()
+        self.breaker.record_failure()
+        self.assertEqual(self.breaker.state, "open")
+        self.now += 9
+        self.assertFalse(self.breaker.allow())
+        self.now += 1
+        self.assertTrue(self.breaker.allow())
+
+    def test_end_trial_only_releases_the_owning_thread(self):
+        self.open_breaker()
+        self.now += 10
+        self.breaker.allow()
+
+        other = threading.Thread(target=self.breaker.end_trial)
+        other.start()
+        other.join()
+        self.assertFalse(self.breaker.allow())
+
+        self.breaker.end_trial()
+        self.assertTrue(self.breaker.allow())
+
+    def test_request_releases_a_trial_that_raised(self):
+        upstream = Upstream("users", "http://users")
+        upstream.breaker = self.breaker
+        self.open_breaker()
+        self.now += 10
+
+        with mock.patch.object(upstream.session, "request", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                upstream.get("/")
+        self.assertEqual(self.breaker.state, "half-open")
+
+        response = mock.Mock(status_code=200)
+        with mock.patch.object(upstream.session, "request", return_value=response):
+            self.assertIs(upstream.get("/"), response)
+        self.assertEqual(self.breaker.state, "closed")
+
+    def test_request_fails_fast_while_open(self):
+        upstream = Upstream("users", "http://users")
+        upstream.breaker = self.breaker
+        self.open_breaker()
+
+        with mock.patch.object(upstream.session, "request") as request:
+            with self.assertRaises(CircuitOpenError):
+                upstream.get("/")
+        request.assert_not_called()
+
+
+class FeedCacheTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user_id = uuid.uuid4()
+
+    def test_bump_moves_pages_to_a_new_key(self):
+        key = feed_cache.page_key(self.user_id, "first")
+        feed_cache.set_page(key, {"ids": ["a"]})
+        self.assertEqual(feed_cache.get_page(feed_cache.page_key(self.user_id, "first")), {"ids": ["a"]})
+
+        feed_cache.bump_versions(self.redis, [self.user_id])
+        bumped = feed_cache.page_key(self.user_id, "first")
+        self.assertNotEqual(bumped, key)
+        self.assertIsNone(feed_cache.get_page(bumped))
+
+    def test_bump_only_affects_its_users(self):
+        other = uuid.uuid4()
+        key = feed_cache.page_key(other, "first")
+        feed_cache.bump_versions(self.redis, [self.user_id])
+        self.assertEqual(feed_cache.page_key(other, "first"), key)
+
+    def test_version_outlives_the_pages_cached_under_it(self):
+        self.assertGreater(feed_cache.VERSION_TTL, feed_cache.PAGE_TTL)
+        version_key = feed_cache.version_key(self.user_id)
+
+        feed_cache.bump_versions(self.redis, [self.user_id])
+        self.assertEqual(self.redis.ttl(version_key), feed_cache.VERSION_TTL)
+
+        # Every read pushes the expiry back, a page is never older than its version.
+        self.redis.expire(version_key, 1)
+        feed_cache.page_key(self.user_id, "first")
+        self.assertEqual(self.redis.ttl(version_key), feed_cache.VERSION_TTL)
+
+    def test_user_ids_are_canonicalised(self):
+        self.assertEqual(
+            feed_cache.page_key(str(self.user_id).upper(), "first"),
+            feed_cache.page_key(self.user_id, "first"),
+        )
+
+
+def post_id(number):
+    return str(uuid.UUID(int=number))
+
+
+class TimelineReadTests(RedisTestCase):
+    """
+    Timelines are built in Redis directly, read() then never needs the database.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user_id = uuid.uuid4()
+        self.author_id = str(uuid.uuid4())
+        self.now = int(timezone.now().timestamp())
+
+        self.redis.set(timeline.timeline_built_key(self.user_id), 1)
+        self.redis.sadd(timeline.timeline_friends_key(self.user_id), self.author_id, str(uuid.uuid4()))
+        self.redis.sadd(timeline.HIGH_DEGREE_AUTHORS_KEY, self.author_id)
+        self.redis.set(timeline.author_index_built_key(self.author_id), 1)
+
+    def push(self, posts, pulled=()):
+        self.redis.zadd(timeline.timeline_key(self.user_id), {post_id(number): score for number, score in posts})
+        if pulled:
+            self.redis.zadd(
+                timeline.author_index_key(self.author_id), {post_id(number): score for number, score in pulled}
+            )
+
+    def read_all(self, limit):
+        entries = []
+        before = None
+        while True:
+            page = timeline.read(self.user_id, before, limit)
+            entries.extend(page)
+            if len(page) < limit:
+                return entries
+            before = [page[-1][1], page[-1][0]]
+
+    def test_merges_sources_newest_first_and_equal_scores_by_id(self):
+        now = self.now
+        self.push([(1, now), (3, now), (5, now - 1)], pulled=[(2, now), (4, now), (6, now + 1)])
+
+        self.assertEqual(
+            timeline.read(self.user_id, None, 10),
+            [
+                (post_id(6), now + 1),
+                (post_id(4), now),
+                (post_id(3), now),
+                (post_id(2), now),
+                (post_id(1), now),
+                (post_id(5), now - 1),
+            ],
+        )
+
+    def test_pages_split_inside_equal_scores_without_gaps(self):
+        now = self.now
+        self.push(
+            [(number, now) for number in range(1, 8, 2)] + [(20, now - 5)],
+            pulled=[(number, now) for number in range(2, 9, 2)] + [(21, now - 5)],
+        )
+
+        expected = timeline.read(self.user_id, None, 100)
+        for limit in (1, 2, 3):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.read_all(limit), expected)
+        self.assertEqual(len(expected), 10)
+
+    def test_post_in_both_sources_is_read_once(self):
+        self.push([(1, self.now), (2, self.now - 1)], pulled=[(1, self.now)])
+        self.assertEqual(
+            timeline.read(self.user_id, None, 10),
+            [(post_id(1), self.now), (post_id(2), self.now - 1)],
+        )
+
+    def test_posts_outside_the_window_are_skipped(self):
+        expired = self.now - timeline.FEED_WINDOW.total_seconds() - 60
+        self.push([(1, self.now), (2, expired)], pulled=[(3, expired)])
+        self.assertEqual(timeline.read(self.user_id, None, 10), [(post_id(1), self.now)])
+
+
+class LikeCountTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create(id=uuid.uuid4(), full_name="Author")
+        self.readers = [User.objects.create(id=uuid.uuid4(), full_name=f"Reader {i}") for i in range(3)]
+        self.post = Post.objects.create(user=self.author, content="post")
+        self.comment = Comment.objects.create(user=self.author, post=self.post, content="comment")
+
+    def like_post(self, user):
+        with self.captureOnCommitCallbacks(execute=True):
+            return PostLike.like_or_unlike_post(user, self.post.id)
+
+    def like_count(self):
+        self.post.refresh_from_db(fields=["like_count"])
+        return self.post.like_count
+
+    def pending(self, kind=counters.POST, object_id=None):
+        object_id = object_id or self.post.id
+        return counters.pending(kind, [object_id])[str(object_id)]
+
+    def reconcile(self):
+        ReconcileCommand(stdout=io.StringIO()).reconcile(counters.POST, Post, "postlike")
+
+    def test_toggle_likes_then_unlikes(self):
+        fields = {"user": self.readers[0], "post_id": self.post.id}
+        self.assertEqual(toggle(PostLike, **fields), (True, 1))
+        self.assertEqual(toggle(PostLike, **fields), (False, -1))
+        self.assertFalse(PostLike.objects.filter(**fields).exists())
+
+    def test_toggle_losing_a_race_leaves_the_count(self):
+        PostLike.objects.create(user=self.readers[0], post=self.post)
+        # The concurrent like committed after this request found nothing to delete.
+        with mock.patch.object(PostLike.objects, "filter") as filter:
+            filter.return_value.delete.return_value = (0, {})
+            self.assertEqual(toggle(PostLike, user=self.readers[0], post_id=self.post.id), (True, 0))
+        self.assertEqual(PostLike.objects.count(), 1)
+
+    def test_likes_are_queued_until_flushed(self):
+        self.assertEqual(self.like_post(self.readers[0]), (1, True))
+        self.assertEqual(self.like_post(self.readers[1]), (2, True))
+        self.assertEqual(self.like_post(self.readers[0]), (1, False))
+        self.assertEqual(self.like_count(), 0)
+        self.assertEqual(self.pending(), 1)
+
+        self.assertEqual(counters.flush(counters.POST), 1)
+        self.assertEqual(self.like_count(), 1)
+        self.assertEqual(self.pending(), 0)
+        self.assertEqual(self.like_post(self.readers[2]), (2, True))
+
+    def test_rolled_back_like_queues_no_delta(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    PostLike.like_or_unlike_post(self.readers[0], self.post.id)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        self.assertFalse(PostLike.objects.exists())
+        self.assertEqual(self.pending(), 0)
+
+    def test_comment_likes_are_flushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(CommentLike.like_or_unlike_comment(self.readers[0], self.comment.id), (1, True))
+
+        self.assertEqual(counters.flush(counters.COMMENT), 1)
+        self.comment.refresh_from_db(fields=["like_count"])
+        self.assertEqual(self.comment.like_count, 1)
+        self.assertEqual(self.pending(counters.COMMENT, self.comment.id), 0)
+
+    def test_flush_applies_a_leftover_batch_first(self):
+        # A flush that died after taking its batch, and a like queued since.
+        self.redis.hset(counters.flushing_key(counters.POST), str(self.post.id), 2)
+        counters.add(counters.POST, self.post.id, 1)
+
+        counters.flush(counters.POST)
+        self.assertEqual(self.like_count(), 2)
+        self.assertEqual(self.pending(), 1)
+
+        counters.flush(counters.POST)
+        self.assertEqual(self.like_count(), 3)
+        self.assertFalse(self.redis.exists(counters.flushing_key(counters.POST)))
+
+    def test_flush_without_likes(self):
+        self.assertEqual(counters.flush(counters.POST), 0)
+
+    def test_flush_does_not_hide_redis_outages(self):
+        self.redis.hset(counters.deltas_key(counters.POST), str(self.post.id), 1)
+        with mock.patch("redis.client.Redis.rename", side_effect=RedisConnectionError):
+            with self.assertRaises(RedisConnectionError):
+                counters.flush(counters.POST)
+        self.assertEqual(self.like_count(), 0)
+
+    def test_missing_post_or_comment_is_not_found(self):
+        with self.assertRaises(NotFound):
+            PostLike.like_or_unlike_post(self.readers[0], uuid.uuid4())
+        with self.assertRaises(NotFound):
+            CommentLike.like_or_unlike_comment(self.readers[0], uuid.uuid4())
+
+    def test_reconcile_accounts_for_pending_deltas(self):
+        for reader in self.readers:
+            self.like_post(reader)
+        Post.objects.filter(id=self.post.id).update(like_count=7)
+
+        self.reconcile()
+        self.assertEqual(self.like_count(), 0)
+        self.assertEqual(self.like_count() + self.pending(), 3)
+
+        counters.flush(counters.POST)
+        self.reconcile()
+        self.assertEqual(self.like_count(), 3)
+
+
+def cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+class CommentPaginationTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        author = User.objects.create(id=uuid.uuid4(), full_name="Author")
+        self.post = Post.objects.create(user=author, content="post")
+        Comment.objects.bulk_create([Comment(user=author, post=self.post, content=str(i)) for i in range(7)])
+        # Comments created in the same instant are told apart by id.
+        first = Comment.objects.order_by("id").first()
+        Comment.objects.exclude(id=first.id).update(created_at=first.created_at)
+
+    def paginate(self, **params):
+        paginator = CommentPagination()
+        paginator.page_size = 3
+        request = Request(self.factory.get("/comments/", params))
+        return paginator.paginate_queryset(Comment.objects.filter(post=self.post), request), paginator
+
+    def read_all(self, **params):
+        seen = []
+        while True:
+            page, paginator = self.paginate(**params)
+            seen.extend(comment.id for comment in page)
+            link = paginator.get_next_link()
+            if link is None:
+                return seen
+            params["cursor"] = parse_qs(urlparse(link).query)["cursor"][0]
+
+    def test_oldest_first_by_default(self):
+        expected = list(Comment.objects.order_by("created_at", "id").values_list("id", flat=True))
+        self.assertEqual(self.read_all(), expected)
+
+    def test_newest_pages_from_the_other_end(self):
+        expected = list(Comment.objects.order_by("-created_at", "-id").values_list("id", flat=True))
+        self.assertEqual(self.read_all(order="newest"), expected)
+
+    def test_unknown_order_is_rejected(self):
+        with self.assertRaises(ValidationError):
+            self.paginate(order="random")
+
+    def test_malformed_cursors_are_not_found(self):
+        comment = Comment.objects.first()
+        created_at = comment.created_at.isoformat()
+        for value in [
+            "not base64!",
+            cursor({"created_at": created_at}),
+            cursor([created_at]),
+            cursor([created_at, 7]),
+            cursor(["yesterday", str(comment.id)]),
+            cursor([created_at, "not-a-uuid"]),
+        ]:
+            with self.subTest(cursor=value), self.assertRaises(NotFound):
+                self.paginate(cursor=value)
+
+
+class TokenAuthenticationTests(RedisTestCase):
+    """
+    Tokens are signed like the users service signs them and revoked with the data it
+    broadcasts in token.revoked and user.tokens.revoked.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.factory = APIRequestFactory()
+        self.user = User.objects.create(id=uuid.uuid4(), full_name="Reader")
+
+    def token(self, **claims):
+        now = int(time.time())
+        payload = {
+            "token_type": "access",
+            "user_id": str(self.user.id),
+            "jti": uuid.uuid4().hex,
+            "iat": now,
+            "exp": now + 300,
+            **claims,
+        }
+        return payload, jwt.encode(payload, settings.JWT_VERIFYING_KEY, algorithm=settings.JWT_ALGORITHM)
+
+    def authenticate(self, token):
+        request = Request(self.factory.get("/posts/", HTTP_AUTHORIZATION=f"JWT {token}"))
+        return UserAuthentication().authenticate(request)
+
+    def test_valid_token_authenticates_its_user(self):
+        _, token = self.token()
+        user, _ = self.authenticate(token)
+        self.assertEqual(user.id, self.user.id)
+        self.assertTrue(user.is_authenticated)
+
+    def test_invalid_tokens_are_rejected(self):
+        now = int(time.time())
+        for name, token in [
+            ("expired", self.token(iat=now - 600, exp=now - 300)[1]),
+            ("refresh", self.token(token_type="refresh")[1]),
+            ("signature", self.token()[1][:-2] + "xx"),
+            ("garbage", "not-a-token"),
+        ]:
+            with self.subTest(name), self.assertRaises(AuthenticationFailed):
+                self.authenticate(token)
+
+    def test_revoked_token_is_rejected(self):
+        payload, token = self.token()
+        other = self.token()[1]
+
+        tokens.revoke_token(payload["jti"], payload["exp"])
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+        self.assertEqual(self.authenticate(other)[0].id, self.user.id)
+
+    def test_tokens_issued_before_a_user_revocation_are_rejected(self):
+        now = int(time.time())
+        _, old = self.token(iat=now - 10)
+        _, new = self.token(iat=now)
+
+        # The id is sent as the users service writes it, str() of the UUID.
+        tokens.revoke_user_tokens(str(self.user.id), now - 5, now + 300)
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(old)
+        self.assertEqual(self.authenticate(new)[0].id, self.user.id)
+        self.assertTrue(self.redis.exists(f":1:tokens_revoked_before_{self.user.id}"))
+
+
+class UserCacheTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.cache = UserCache()
+        self.user_id = uuid.uuid4()
+        self.loader = mock.Mock(return_value={"id": str(self.user_id)})
+
+    def test_loads_once_per_process_and_across_processes(self):
+        self.assertEqual(self.cache.get(self.user_id, self.loader), {"id": str(self.user_id)})
+        self.cache.get(self.user_id, self.loader)
+        # Another worker finds the user in Redis.
+        UserCache().get(self.user_id, self.loader)
+        self.loader.assert_called_once()
+
+    def test_id_spellings_share_an_entry(self):
+        self.cache.get(str(self.user_id), self.loader)
+        UserCache().get(self.user_id.hex, self.loader)
+        self.loader.assert_called_once()
+
+    def test_unknown_users_are_cached(self):
+        self.loader.return_value = None
+        self.assertIsNone(self.cache.get(self.user_id, self.loader))
+        self.assertIsNone(UserCache().get(self.user_id, self.loader))
+        self.loader.assert_called_once()
+
+    def test_invalidate_reloads(self):
+        self.cache.get(self.user_id, self.loader)
+        self.cache.invalidate(self.user_id)
+        self.cache.get(self.user_id, self.loader)
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_callers_get_copies(self):
+        self.cache.get(self.user_id, self.loader)["is_authenticated"] = True
+        self.assertNotIn("is_authenticated", self.cache.get(self.user_id, self.loader))
+
+
+class TimelineTestCase(RedisTestCase):
+    databases = {"default", "read"}
+
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create(id=uuid.uuid4(), full_name="Author")
+        self.friends = [uuid.uuid4() for _ in range(3)]
+        Friendship.add([(self.author.id, friend_id) for friend_id in self.friends])
+
+    def post(self, **fields):
+        post = Post.objects.create(user=self.author, content="post", **fields)
+        PostDocument.objects.create(id=post.id, user_id=self.author.id, created_at=post.created_at, data={})
+        return post
+
+    def ids(self, user_id, limit=10):
+        return [post_id for post_id, _ in timeline.read(user_id, None, limit)]
+
+
+class TimelineWriteTests(TimelineTestCase):
+    def test_fan_out_reaches_every_friend(self):
+        for friend_id in self.friends:
+            self.assertEqual(self.ids(friend_id), [])
+        versions = [feed_cache.page_key(friend_id, "first") for friend_id in self.friends]
+
+        post = self.post()
+        timeline.run_fan_out(post)
+
+        for friend_id, version in zip(self.friends, versions):
+            self.assertEqual(self.ids(friend_id), [str(post.id)])
+            self.assertNotEqual(feed_cache.page_key(friend_id, "first"), version)
+        self.assertFalse(timeline.is_high_degree(self.author.id))
+
+    def test_unbuilt_timeline_is_rebuilt_from_documents(self):
+        posts = [self.post() for _ in range(3)]
+        expected = [str(post.id) for post in sorted(posts, key=lambda post: (post.created_at, post.id), reverse=True)]
+        self.assertEqual(self.ids(self.friends[0]), expected)
+
+    def test_timelines_keep_the_newest_posts(self):
+        key = timeline.timeline_key(self.friends[0])
+        now = timezone.now().timestamp()
+        for number in range(5):
+            timeline.push(self.redis, key, post_id(number), now + number, size=3)
+        timeline.push(self.redis, key, post_id(9), now - timeline.FEED_WINDOW.total_seconds() - 60, size=3)
+
+        self.assertEqual(self.redis.zrevrange(key, 0, -1), [post_id(4).encode(), post_id(3).encode(), post_id(2).encode()])
+
+    def test_invalidate_rebuilds_on_the_next_read(self):
+        self.ids(self.friends[0])
+        post = self.post()
+        self.assertEqual(self.ids(self.friends[0]), [])
+
+        timeline.invalidate(self.friends[0])
+        self.assertEqual(self.ids(self.friends[0]), [str(post.id)])
+
+
+class HighDegreeAuthorTests(TimelineTestCase):
+    def setUp(self):
+        super().setUp()
+        patcher = mock.patch.object(timeline, "FAN_OUT_THRESHOLD", 2)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_posts_go_to_the_author_index(self):
+        post = self.post()
+        timeline.run_fan_out(post)
+
+        self.assertTrue(timeline.is_high_degree(self.author.id))
+        self.assertFalse(self.redis.exists(timeline.timeline_key(self.friends[0])))
+        # Readers pull the post from the author's index.
+        for friend_id in self.friends:
+            self.assertEqual(self.ids(friend_id), [str(post.id)])
+
+    def test_author_stays_high_degree(self):
+        timeline.run_fan_out(self.post())
+        Friendship.remove(self.author.id, self.friends[0])
+
+        post = self.post()
+        timeline.run_fan_out(post)
+        self.assertEqual(self.ids(self.friends[1])[0], str(post.id))
+        self.assertFalse(self.redis.exists(timeline.timeline_key(self.friends[1])))
+
+    def test_pulled_and_pushed_posts_are_merged(self):
+        other = User.objects.create(id=uuid.uuid4(), full_name="Other")
+        Friendship.add([(other.id, self.friends[0])])
+        pushed = Post.objects.create(user=other, content="pushed")
+        PostDocument.objects.create(id=pushed.id, user_id=other.id, created_at=pushed.created_at, data={})
+
+        pulled = self.post()
+        timeline.run_fan_out(pulled)
+        timeline.run_fan_out(pushed)
+
+        self.assertEqual(self.ids(self.friends[0]), [str(pulled.id), str(pushed.id)])
+
+    def test_unbuilt_author_index_is_rebuilt_from_documents(self):
+        timeline.run_fan_out(self.post())
+        # Indexes expire like timelines, the next read rebuilds it.
+        unindexed = self.post()
+        self.redis.delete(timeline.author_index_built_key(self.author.id))
+
+        self.assertEqual(self.ids(self.friends[0])[0], str(unindexed.id))
+
+
+class FriendshipReplicaTests(TestCase):
+    def setUp(self):
+        self.first, self.second, self.third = (uuid.uuid4() for _ in range(3))
+
+    def test_friendships_are_stored_in_both_directions(self):
+        Friendship.add([(self.first, self.second), (self.first, self.third)])
+        self.assertCountEqual(Friendship.get_friend_ids(self.first), [self.second, self.third])
+        self.assertEqual(Friendship.get_friend_ids(self.second), [self.first])
+
+    def test_replayed_events_are_ignored(self):
+        Friendship.add([(self.first, self.second)])
+        Friendship.add([(self.second, self.first), (self.first, self.second)])
+        self.assertEqual(Friendship.objects.count(), 2)
+
+    def test_remove_drops_both_directions(self):
+        Friendship.add([(self.first, self.second), (self.first, self.third)])
+        Friendship.remove(self.second, self.first)
+        self.assertEqual(Friendship.get_friend_ids(self.first), [self.third])
+        self.assertEqual(Friendship.get_friend_ids(self.second), [])
+
+
+class PostPaginationTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        self.author = User.objects.create(id=uuid.uuid4(), full_name="Author")
+        Post.objects.bulk_create([Post(user=self.author, content=str(i)) for i in range(7)])
+        # Posts created in the same instant are told apart by id.
+        first = Post.objects.order_by("id").first()
+        Post.objects.exclude(id=first.id).update(created_at=first.created_at)
+
+    def request(self, cursor=None):
+        return Request(self.factory.get("/posts/", {"cursor": cursor} if cursor else {}))
+
+    def test_pages_follow_the_ordering_without_gaps(self):
+        seen = []
+        next_cursor = None
+        while True:
+            paginator = PostPagination()
+            paginator.page_size = 3
+            seen.extend(post.id for post in paginator.paginate_queryset(Post.objects.all(), self.request(next_cursor)))
+            link = paginator.get_next_link()
+            if link is None:
+                break
+            next_cursor = parse_qs(urlparse(link).query)["cursor"][0]
+
+        self.assertEqual(seen, list(Post.objects.order_by("-created_at", "id").values_list("id", flat=True)))
+
+    def test_malformed_cursors_are_not_found(self):
+        post = Post.objects.first()
+        for value in [
+            "not base64!",
+            cursor([post.created_at.isoformat()]),
+            cursor(["yesterday", str(post.id)]),
+            cursor([post.created_at.isoformat(), None]),
+        ]:
+            with self.subTest(cursor=value), self.assertRaises(NotFound):
+                PostPagination().paginate_queryset(Post.objects.all(), self.request(value))
+
+    def test_timeline_cursor_holds_score_and_id(self):
+        entries = [(post_id(number), 100.0 - number) for number in range(5)]
+
+        def read(position, limit):
+            start = 0 if position is None else [entry[0] for entry in entries].index(position[1]) + 1
+            return entries[start : start + limit]
+
+        paginator = TimelinePagination()
+        paginator.page_size = 2
+        self.assertEqual(paginator.paginate_ids(read, self.request()), [post_id(0), post_id(1)])
+        self.assertEqual(paginator.next_position, [99.0, post_id(1)])
+
+        next_cursor = parse_qs(urlparse(paginator.get_next_link()).query)["cursor"][0]
+        self.assertEqual(paginator.paginate_ids(read, self.request(next_cursor)), [post_id(2), post_id(3)])
+
+        with self.assertRaises(NotFound):
+            paginator.paginate_ids(read, self.request(cursor(["soon", post_id(1)])))
+
+
+class DiscoveryReadTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.factory = APIRequestFactory()
+        self.pool = [post_id(number) for number in range(23)]
+        self.redis.zadd(discovery.POOL_KEY, {post: len(self.pool) - rank for rank, post in enumerate(self.pool)})
+
+    def request(self, cursor=None):
+        return Request(self.factory.get("/feed/", {"cursor": cursor} if cursor else {}))
+
+    def test_permutation_visits_every_rank_once(self):
+        for size in (1, 2, 10, 23, 1000):
+            for seed in (0, 1, 7, 2**31 - 1):
+                rank = discovery.permutation(seed, size)
+                self.assertEqual(sorted(rank(index) for index in range(size)), list(range(size)))
+
+    def test_pages_cover_the_pool_without_repeats(self):
+        seen = []
+        next_cursor = None
+        while True:
+            paginator = DiscoveryPagination()
+            paginator.page_size = 5
+            seen.extend(paginator.paginate_ids(discovery.read, self.request(next_cursor)))
+            link = paginator.get_next_link()
+            if link is None:
+                break
+            next_cursor = parse_qs(urlparse(link).query)["cursor"][0]
+
+        self.assertCountEqual(seen, self.pool)
+
+    def test_seeds_shuffle_differently(self):
+        first, _ = discovery.read(1, 0, 23)
+        second, _ = discovery.read(2, 0, 23)
+        self.assertCountEqual(first, second)
+        self.assertNotEqual(first, second)
+
+    def test_malformed_cursors_are_not_found(self):
+        for value in [cursor([1]), cursor([1, -5]), cursor([-1, 0]), cursor([1, "5"]), cursor([1, 2.5]), cursor([1, True])]:
+            with self.subTest(cursor=value), self.assertRaises(NotFound):
+                DiscoveryPagination().paginate_ids(discovery.read, self.request(value))
+
+    def test_offset_past_the_pool_is_an_empty_page(self):
+        paginator = DiscoveryPagination()
+        self.assertEqual(paginator.paginate_ids(discovery.read, self.request(cursor([1, 10**12]))), [])
+        self.assertIsNone(paginator.get_next_link())
+
+
+
+class DiscoveryRefreshTests(RedisTestCase):
+    def setUp(self):
+        super().setUp()
+        self.author = User.objects.create(id=uuid.uuid4(), full_name="Author")
+        self.now = timezone.now()
+
+    def post(self, hours_ago, like_count=0, comments=0):
+        post = Post.objects.create(user=self.author, content="post")
+        Post.objects.filter(id=post.id).update(
+            created_at=self.now - timedelta(hours=hours_ago), like_count=like_count
+        )
+        for _ in range(comments):
+            Comment.objects.create(user=self.author, post=post, content="comment")
+        return str(post.id)
+
+    def pool(self):
+        return [post.decode() for post in self.redis.zrevrange(discovery.POOL_KEY, 0, -1)]
+
+    def test_pool_is_ranked_by_decayed_engagement(self):
+        quiet = self.post(hours_ago=1)
+        liked = self.post(hours_ago=1, like_count=10)
+        discussed = self.post(hours_ago=1, comments=10)
+        stale = self.post(hours_ago=100, like_count=10)
+        expired = self.post(hours_ago=24 * 7 * 50, like_count=1000)
+
+        self.assertEqual(discovery.refresh(), 4)
+        self.assertEqual(self.pool(), [discussed, liked, quiet, stale])
+        self.assertNotIn(expired, self.pool())
+
+    def test_old_comments_dont_count(self):
+        fresh = self.post(hours_ago=1)
+        revived = self.post(hours_ago=1, comments=3)
+        Comment.objects.update(created_at=self.now - discovery.COMMENT_ACTIVITY_WINDOW - timedelta(hours=1))
+        fresh_liked = self.post(hours_ago=1, like_count=1)
+
+        discovery.refresh()
+        self.assertEqual(self.pool()[0], fresh_liked)
+        self.assertCountEqual(self.pool()[1:], [fresh, revived])
+
+    def test_read_fills_an_empty_pool(self):
+        posts = [self.post(hours_ago=hours) for hours in range(1, 4)]
+        page, size = discovery.read(seed=1, offset=0, limit=10)
+        self.assertEqual(size, 3)
+        self.assertCountEqual(page, posts)
+
+
+class SnapshotTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(id=uuid.uuid4(), full_name="Author")
+        self.post = Post.objects.create(user=self.author, content="post")
+
+    def comment(self, post=None):
+        post = Post.objects.get(id=(post or self.post).id)
+        comment = Comment.objects.create(user=self.author, post=post, content="comment")
+        snapshots.push(post, comment)
+        return comment
+
+    def snapshot(self, post=None):
+        post = Post.objects.get(id=(post or self.post).id)
+        return [comment["id"] for comment in post.latest_comments_snapshot], post.comment_count
+
+    def test_push_keeps_the_newest_comments(self):
+        comments = [self.comment() for _ in range(5)]
+        self.assertEqual(
+            self.snapshot(),
+            ([str(comment.id) for comment in comments[:-4:-1]], 5),
+        )
+
+    def test_refresh_rebuilds_from_the_comment_rows(self):
+        comments = [self.comment() for _ in range(4)]
+        Comment.objects.filter(id=comments[-1].id).delete()
+        Comment.objects.filter(id=comments[0].id).update(like_count=7)
+
+        self.assertEqual(snapshots.refresh([self.post.id]), [str(self.post.id)])
+        self.assertEqual(self.snapshot(), ([str(comment.id) for comment in comments[-2::-1]], 3))
+        self.assertEqual(Post.objects.get(id=self.post.id).latest_comments_snapshot[-1]["like_count"], 7)
+
+    def test_refresh_skips_posts_without_the_changed_comments(self):
+        other = Post.objects.create(user=self.author, content="other")
+        comment = self.comment()
+        self.comment(other)
+
+        rebuilt = snapshots.refresh([self.post.id, other.id], comment_ids=[comment.id])
+        self.assertEqual(rebuilt, [str(self.post.id)])
+
+
+class ProjectorTests(TestCase):
+    databases = {"default", "read"}
+
+    def setUp(self):
+        self.author = User.objects.create(id=uuid.uuid4(), full_name="Author")
+        self.post = Post.objects.create(user=self.author, content="post")
+        self.comment = Comment.objects.create(user=self.author, post=self.post, content="comment")
+        snapshots.push(self.post, self.comment)
+
+    def rendered(self, serializer):
+        return json.loads(JSONRenderer().render(serializer.data))
+
+    def expected_post(self):
+        # Documents leave out what depends on the viewer.
+        data = self.rendered(UserPostSerializer(Post.objects.get(id=self.post.id)))
+        del data["is_liked"], data["is_feed_post"]
+        for comment in data["comments"]:
+            del comment["is_liked"]
+        return data
+
+    def test_documents_match_the_serializers(self):
+        self.assertTrue(projector.project_batch())
+        self.assertFalse(ProjectionEvent.objects.exists())
+
+        self.assertEqual(PostDocument.objects.get(id=self.post.id).data, self.expected_post())
+        comment = self.rendered(CommentSerializer(self.comment))
+        del comment["is_liked"]
+        self.assertEqual(CommentDocument.objects.get(id=self.comment.id).data, comment)
+
+    def test_documents_follow_changes_and_deletes(self):
+        projector.project_batch()
+        Post.objects.filter(id=self.post.id).update(content="edited")
+        projections.post_changed(self.post.id, self.post.id)
+        projector.project_batch()
+        self.assertEqual(PostDocument.objects.get(id=self.post.id).data["content"], "edited")
+
+        Post.objects.filter(id=self.post.id).delete()
+        projections.post_changed(self.post.id)
+        projector.project_batch()
+        self.assertFalse(PostDocument.objects.exists())
+        self.assertFalse(CommentDocument.objects.exists())
+
+
+class ReplicaPinningTests(RedisTestCase):
+    databases = {"default", "read"}
+
+    def setUp(self):
+        super().setUp()
+        self.factory = APIRequestFactory()
+        self.router = replicas.PrimaryReplicaRouter()
+        self.router.replicas = ["replica"]
+        self.user = User.objects.create(id=uuid.uuid4(), full_name="User")
+        self.user.is_authenticated = True
+
+    def route(self, request):
+        token = replicas.current_request.set(request)
+        try:
+            return self.router.db_for_read(Post)
+        finally:
+            replicas.current_request.reset(token)
+
+    def through_middleware(self, request, view):
+        return replicas.ReplicaPinningMiddleware(view)(request)
+
+    def write(self, request):
+        self.router.db_for_write(Post)
+        return HttpResponse()
+
+    def test_safe_reads_go_to_a_replica(self):
+        self.assertEqual(self.route(self.factory.get("/posts/")), "replica")
+        self.assertEqual(self.route(self.factory.post("/posts/")), replicas.PRIMARY)
+        self.assertEqual(self.router.db_for_read(Post), replicas.PRIMARY)
+
+    def test_writers_are_pinned_by_cookie_and_user(self):
+        request = self.factory.post("/posts/")
+        request.user = self.user
+        response = self.through_middleware(request, self.write)
+        self.assertIn(replicas.PIN_COOKIE, response.cookies)
+
+        by_cookie = self.factory.get("/posts/")
+        by_cookie.COOKIES[replicas.PIN_COOKIE] = "1"
+        self.assertEqual(self.route(by_cookie), replicas.PRIMARY)
+
+        by_user = self.factory.get("/posts/")
+        by_user.user = self.user
+        self.assertEqual(self.route(by_user), replicas.PRIMARY)
+
+        other = self.factory.get("/posts/")
+        other.user = User(id=uuid.uuid4())
+        self.assertEqual(self.route(other), "replica")
+
+    def test_own_post_is_read_back_before_the_projector_runs(self):
+        request = self.factory.post("/posts/", {"content": "hello"}, format="json")
+        force_authenticate(request, user=self.user)
+        with mock.patch.object(timeline, "schedule_fan_out"), self.captureOnCommitCallbacks(execute=True):
+            response = self.through_middleware(request, PostViewSet.as_view({"post": "create"}))
+        post_id = response.data["id"]
+
+        request = self.factory.get(f"/posts/user/{self.user.id}/")
+        force_authenticate(request, user=self.user)
+        response = UserPostsViewSet.as_view({"get": "list"})(request, pk=str(self.user.id))
+        self.assertEqual([post["id"] for post in response.data["results"]], [post_id])
+        # The projector still gets the events.
+        self.assertTrue(ProjectionEvent.objects.filter(key=post_id).exists())
+
+    def test_changes_outside_requests_wait_for_the_projector(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            post = Post.objects.create(user=self.user, content="post")
+        self.assertFalse(PostDocument.objects.filter(id=post.id).exists())
+
+
+class CompiledSerializerTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create(id=uuid.uuid4(), full_name="Author")
+        self.post = Post.objects.create(user=self.author, content="post", like_count=3)
+        self.comment = Comment.objects.create(user=self.author, post=self.post, content="comment", like_count=2)
+
+    def assertRendersLike(self, compiled, serializer_class, instance, exclude):
+        expected = dict(serializer_class(instance).data)
+        for name in exclude:
+            del expected[name]
+
+        row = instance._meta.model.objects.filter(id=instance.id).values(*compiled.values).get()
+        self.assertEqual(compiled.render(row), expected)
+        self.assertEqual(compiled.render_object(instance), expected)
+
+    def test_comments_render_like_the_serializer(self):
+        self.assertRendersLike(compiled_comment, CommentSerializer, self.comment, ["is_liked"])
+
+    def test_posts_render_like_the_serializer(self):
+        self.assertRendersLike(
+            compiled_post, UserPostSerializer, self.post, ["is_liked", "comments", "is_feed_post"]
+        )
+
+    def test_method_fields_cant_be_compiled(self):
+        class WholeObjectSerializer(CommentSerializer):
+            everything = serializers.DictField(source="*", read_only=True)
+
+            class Meta(CommentSerializer.Meta):
+                fields = CommentSerializer.Meta.fields + ["everything"]
+
+        with self.assertRaises(ValueError):
+            CompiledSerializer(WholeObjectSerializer)
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_output_matches_the_json_renderer(self):
+        data = {
+            "id": uuid.uuid4(),
+            "created_at": timezone.now(),
+            "date": timezone.now().date(),
+            "amount": Decimal("12.50"),
+            "text": "line\u2028paragraph\u2029 caf\u00e9 \U0001f600 \"quoted\" \\",
+            "numbers": [0, -1, 2**53, 1.5, True, None],
+            "nested": {"list": [], "dict": {}, 7: "non string key"},
+        }
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_indented_output_is_left_to_the_json_renderer(self):
+        data = {"a": [1, 2]}
+        context = {"indent": 4}
+        self.assertEqual(
+            ORJSONRenderer().render(data, renderer_context=context),
+            JSONRenderer().render(data, renderer_context=context),
+        )
+
+    def test_none_renders_empty(self):
+        self.assertEqual(ORJSONRenderer().render(None), b"")
+
+    def test_parser_reads_what_the_renderer_wrote(self):
+        data = {"text": "caf\u00e9\u2028", "numbers": [1, 1.5, None]}
+        stream = io.BytesIO(ORJSONRenderer().render(data))
+        self.assertEqual(ORJSONParser().parse(stream), data)
+
+    def test_invalid_json_is_a_parse_error(self):
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(io.BytesIO(b'{"a": '))
+
+
+class RankingTests(SimpleTestCase):
+    def setUp(self):
+        self.post_ids = ["a", "b", "c"]
+        self.fragments = {post_id: {"id": post_id} for post_id in self.post_ids}
+        for patcher in [
+            mock.patch.object(ranking.ranker, "get", lambda: (mock.Mock(), {})),
+            mock.patch.object(ranking, "_free_workers", threading.BoundedSemaphore(ranking.RANKING_WORKERS)),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def rank(self):
+        return ranking.rank(list(self.post_ids), self.fragments)
+
+    def free_workers(self):
+        free = 0
+        while ranking._free_workers.acquire(blocking=False):
+            free += 1
+        for _ in range(free):
+            ranking._free_workers.release()
+        return free
+
+    def test_pages_are_ordered_by_score(self):
+        with mock.patch.object(ranking, "score", return_value=[0.1, 0.9, 0.5]):
+            self.assertEqual(self.rank(), ["b", "c", "a"])
+
+    def test_pages_stay_chronological_without_a_model(self):
+        with mock.patch.object(ranking.ranker, "get", return_value=None):
+            self.assertEqual(self.rank(), self.post_ids)
+
+    @override_settings(FEED_RANKING_BUDGET_MS=10)
+    def test_slow_scoring_falls_back_and_keeps_the_worker(self):
+        done = threading.Event()
+        self.addCleanup(done.set)
+
+        def slow_score(*args):
+            done.wait(5)
+            return [0.1, 0.9, 0.5]
+
+        with mock.patch.object(ranking, "score", slow_score):
+            self.assertEqual(self.rank(), self.post_ids)
+            # The scoring keeps running past the budget, its worker isn't handed out again.
+            self.assertEqual(self.free_workers(), ranking.RANKING_WORKERS - 1)
+            done.set()
+
+        for _ in range(100):
+            if self.free_workers() == ranking.RANKING_WORKERS:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.free_workers(), ranking.RANKING_WORKERS)
+
+    def test_busy_workers_skip_ranking(self):
+        for _ in range(ranking.RANKING_WORKERS):
+            ranking._free_workers.acquire()
+        with mock.patch.object(ranking, "score") as score:
+            self.assertEqual(self.rank(), self.post_ids)
+        score.assert_not_called()
+
+
+class DedupeLikesTests(TransactionTestCase):
+    """
+    Databases migrated before the unique like constraints may hold duplicate likes.
+    """
+
+    def setUp(self):
+        constraint = next(c for c in PostLike._meta.constraints if c.name == "unique_post_like")
+        # SQLite rebuilds the table from the model's constraints instead of dropping one.
+        with mock.patch.object(PostLike._meta, "constraints", []), connection.schema_editor() as editor:
+            editor.remove_constraint(PostLike, constraint)
+
+        def restore():
+            with connection.schema_editor() as editor:
+                editor.add_constraint(PostLike, constraint)
+
+        self.addCleanup(restore)
+        self.addCleanup(PostLike.objects.all().delete)
+
+    def test_keeps_the_oldest_like(self):
+        author = User.objects.create(id=uuid.uuid4(), full_name="Author")
+        reader = User.objects.create(id=uuid.uuid4(), full_name="Reader")
+        post = Post.objects.create(user=author, content="post")
+        likes = [PostLike.objects.create(user=reader, post=post) for _ in range(3)]
+        other = PostLike.objects.create(user=author, post=post)
+
+        call_command("dedupe_likes", stdout=io.StringIO())
+        self.assertCountEqual(PostLike.objects.values_list("id", flat=True), [likes[0].id, other.id])
@@ -0,0 +1,244 @@
+import heapq
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.db import close_old_connections
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from . import feed_cache
+
+
+logger = logging.getLogger(__name__)
+
+DAY = 60 * 60 * 24
+
+# Posts older than this never show up in a feed.
+FEED_WINDOW = timedelta(weeks=48)
+# Newest post ids kept per timeline.
+TIMELINE_SIZE = 800
+# Timelines of users who stop reading their feed are dropped and rebuilt on the next read.
+TIMELINE_TTL = DAY * 7
+
+# Authors with more friends than this are not fanned out, readers pull their posts at read time.
+FAN_OUT_THRESHOLD = 1000
+# Newest post ids kept per pulled author.
+AUTHOR_INDEX_SIZE = 200
+HIGH_DEGREE_AUTHORS_KEY = "high_degree_authors"
+
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="timeline")
+
+
+def timeline_key(user_id):
+    return f"timeline_{uuid.UUID(str(user_id))}"
+
+
+def timeline_built_key(user_id):
+    return f"timeline_built_{uuid.UUID(str(user_id))}"
+
+
+def timeline_friends_key(user_id):
+    return f"timeline_friends_{uuid.UUID(str(user_id))}"
+
+
+def author_index_key(author_id):
+    return f"author_posts_{uuid.UUID(str(author_id))}"
+
+
+def author_index_built_key(author_id):
+    return f"author_posts_built_{uuid.UUID(str(author_id))}"
+
+
+def get_friend_ids(user_id):
+    from .models import Friendship
+
+    return Friendship.get_friend_ids(user_id)
+
+
+def window_start():
+    return (timezone.now() - FEED_WINDOW).timestamp()
+
+
+def push(redis, key, post_id, score, size=TIMELINE_SIZE):
+    redis.zadd(key, {str(post_id): score})
+    redis.zremrangebyrank(key, 0, -(size + 1))
+    redis.zremrangebyscore(key, "-inf", f"({window_start()}")
+    redis.expire(key, TIMELINE_TTL)
+
+
+def fan_out(post, friend_ids):
+    """
+    Push a new post into the timeline of every friend of its author, in one round trip.
+    """
+    redis = get_redis_connection("default")
+    score = post.created_at.timestamp()
+    pipeline = redis.pipeline(transaction=False)
+    for friend_id in friend_ids:
+        push(pipeline, timeline_key(friend_id), post.id, score)
+    feed_cache.bump_versions(pipeline, friend_ids)
+    pipeline.execute()
+
+
+def publish_to_author_index(post):
+    """
+    Posts of high degree authors only go to the author's own index. Authors stay high degree
+    once marked, so their older posts are never missing from both the index and timelines.
+    """
+    redis = get_redis_connection("default")
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.sadd(HIGH_DEGREE_AUTHORS_KEY, str(uuid.UUID(str(post.user_id))))
+    push(pipeline, author_index_key(post.user_id), post.id, post.created_at.timestamp(), AUTHOR_INDEX_SIZE)
+    pipeline.execute()
+
+
+def schedule_fan_out(post):
+    """
+    Fan out after the response is sent, posting doesn't wait for every friend's timeline.
+    """
+    executor.submit(run_fan_out, post)
+
+
+def run_fan_out(post):
+    close_old_connections()
+    started = time.perf_counter()
+    try:
+        friend_ids = get_friend_ids(post.user_id)
+        if len(friend_ids) > FAN_OUT_THRESHOLD or is_high_degree(post.user_id):
+            publish_to_author_index(post)
+            logger.info(f"Indexed post [{post.id}] of high degree author [{post.user_id}]")
+            return
+        fan_out(post, friend_ids)
+        logger.info(
+            f"Fanned out post [{post.id}] to {len(friend_ids)} timelines in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+    except Exception as e:
+        logger.error(f"Failed to fan out post [{post.id}]: {e}")
+    finally:
+        close_old_connections()
+
+
+def is_high_degree(author_id):
+    return bool(get_redis_connection("default").sismember(HIGH_DEGREE_AUTHORS_KEY, str(uuid.UUID(str(author_id)))))
+
+
+def recent_posts(author_ids, limit):
+    from .models import PostDocument
+
+    return (
+        PostDocument.objects.filter(
+            user_id__in=author_ids,
+            created_at__gte=timezone.now() - FEED_WINDOW,
+        )
+        .order_by("-created_at")
+        .values_list("id", "created_at")[:limit]
+    )
+
+
+def rebuild(user_id, friend_ids):
+    """
+    Fill a timeline from the database. Used for users whose timeline expired or never existed.
+    Posts of high degree friends are left out, they are pulled from the author indexes on read.
+    """
+    redis = get_redis_connection("default")
+    friend_ids = {str(uuid.UUID(str(friend_id))) for friend_id in friend_ids}
+    high_degree = {author_id.decode() for author_id in redis.smembers(HIGH_DEGREE_AUTHORS_KEY)}
+    pushed = friend_ids - high_degree
+
+    key = timeline_key(user_id)
+    friends_key = timeline_friends_key(user_id)
+    pipeline = redis.pipeline()
+    pipeline.delete(key, friends_key)
+    entries = {str(post_id): created_at.timestamp() for post_id, created_at in recent_posts(pushed, TIMELINE_SIZE)}
+    if entries:
+        pipeline.zadd(key, entries)
+        pipeline.expire(key, TIMELINE_TTL)
+    if friend_ids:
+        pipeline.sadd(friends_key, *friend_ids)
+        pipeline.expire(friends_key, TIMELINE_TTL)
+    pipeline.set(timeline_built_key(user_id), 1, ex=TIMELINE_TTL)
+    pipeline.execute()
+
+
+def rebuild_author_index(redis, author_id):
+    key = author_index_key(author_id)
+    pipeline = redis.pipeline()
+    pipeline.delete(key)
+    entries = {str(post_id): created_at.timestamp() for post_id, created_at in recent_posts([author_id], AUTHOR_INDEX_SIZE)}
+    if entries:
+        pipeline.zadd(key, entries)
+        pipeline.expire(key, TIMELINE_TTL)
+    pipeline.set(author_index_built_key(author_id), 1, ex=TIMELINE_TTL)
+    pipeline.execute()
+
+
+def invalidate(user_id):
+    """
+    Rebuild the timeline on the next read, e.g. after the user's friend list changed.
+    """
+    pipeline = get_redis_connection("default").pipeline(transaction=False)
+    pipeline.delete(timeline_built_key(user_id))
+    feed_cache.bump_versions(pipeline, [user_id])
+    pipeline.execute()
+
+
+def read(user_id, before, limit):
+    """
+    Up to `limit` (post_id, score) pairs of the user's timeline, newest first, strictly after
+    the `before` position [score, post_id]. Redis orders equal scores by id descending, the
+    merge uses the same order. Pushed posts and the indexes of high degree friends are k-way
+    merged by creation time.
+    """
+    redis = get_redis_connection("default")
+    pipeline = redis.pipeline(transaction=False)
+    pipeline.exists(timeline_built_key(user_id))
+    pipeline.sinter(timeline_friends_key(user_id), HIGH_DEGREE_AUTHORS_KEY)
+    built, pulled = pipeline.execute()
+
+    if not built:
+        rebuild(user_id, get_friend_ids(user_id))
+        pulled = redis.sinter(timeline_friends_key(user_id), HIGH_DEGREE_AUTHORS_KEY)
+
+    pulled = sorted(author_id.decode() for author_id in pulled)
+    pipeline = redis.pipeline(transaction=False)
+    for author_id in pulled:
+        pipeline.exists(author_index_built_key(author_id))
+    for author_id, indexed in zip(pulled, pipeline.execute()):
+        if not indexed:
+            rebuild_author_index(redis, author_id)
+
+    window = window_start()
+    keys = [timeline_key(user_id)] + [author_index_key(author_id) for author_id in pulled]
+    pipeline = redis.pipeline(transaction=False)
+    for source in keys:
+        if before is None:
+            pipeline.zrevrangebyscore(source, "+inf", window, start=0, num=limit, withscores=True)
+        else:
+            # Posts sharing the cursor's score, then the first `limit` older ones.
+            pipeline.zrevrangebyscore(source, before[0], before[0], withscores=True)
+            pipeline.zrevrangebyscore(source, f"({before[0]}", window, start=0, num=limit, withscores=True)
+    results = pipeline.execute()
+
+    if before is None:
+        sources = results
+    else:
+        before_id = before[1].encode()
+        sources = [
+            [entry for entry in ties if entry[0] < before_id] + older
+            for ties, older in zip(results[0::2], results[1::2])
+        ]
+
+    merged = heapq.merge(*sources, key=lambda entry: (entry[1], entry[0]), reverse=True)
+    entries = []
+    seen = set()
+    for post_id, score in merged:
+        if post_id in seen:
+            continue
+        seen.add(post_id)
+        entries.append((post_id.decode(), score))
+        if len(entries) == limit:
+            break
+
+    return entries
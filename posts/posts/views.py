@@ -1,43 +1,41 @@
-import requests
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.exceptions import APIException
 from rest_framework.response import Response
-from rest_framework.exceptions import NotFound
 from rest_framework import status
 from rest_framework import serializers
-from django.utils import timezone
-from django.db.models import Prefetch, Exists, OuterRef, Sum, Value, FloatField, F
+from django.db import transaction
+from django.db.models import Sum, FloatField, F
 from django.db.models.functions import Coalesce
 from drf_yasg.utils import swagger_auto_schema
-from datetime import timedelta
-from django.utils.decorators import method_decorator
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_headers
 
 from .serializers import (
     FeedPostSerializer,
     UserPostSerializer,
     CommentSerializer,
+    CommentDocumentSerializer,
+    FeedPostDocumentSerializer,
+    PostDocumentSerializer,
 )
-from .models import Post, Comment, CommentLike, PostLike, User
+from .models import Post, CommentDocument, CommentLike, PostDocument, PostLike, User, Friendship
+from .pagination import CommentPagination, DiscoveryPagination, PostPagination, TimelinePagination
+from . import discovery, feed_cache, liked, ranking, timeline
 
 
 class CommentsViewSet(ModelViewSet):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = CommentPagination
 
     def get_queryset(self):
         post_id = self.kwargs.get("pk")
-        post = Post.objects.filter(id=post_id).first()
-        if not post:
-            raise NotFound("Post not found")
-        return (
-            Comment.objects.select_related("user")
-            .filter(post=post)
-            .order_by("created_at")
-        )
+        return CommentDocument.objects.filter(post_id=post_id)
+
+    def get_serializer_class(self):
+        # Comments are read from the read database, written through the model.
+        if self.action == "list":
+            return CommentDocumentSerializer
+        return CommentSerializer
 
     def get_serializer_context(self):
         context = super(CommentsViewSet, self).get_serializer_context()
@@ -69,7 +67,12 @@ class CommentsViewSet(ModelViewSet):
         },
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.get_queryset())
+        if not page:
+            # Only an empty page needs the post lookup, to tell a missing post from one without comments.
+            Post.get_for_comments(self.kwargs.get("pk"))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
 
 
 class PostViewSet(ModelViewSet):
@@ -96,47 +99,30 @@ class PostViewSet(ModelViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    def perform_create(self, serializer):
+        post = serializer.save()
+        transaction.on_commit(lambda: timeline.schedule_fan_out(post))
+
 
 class UserPostsViewSet(ModelViewSet):
-    serializer_class = UserPostSerializer
+    serializer_class = PostDocumentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PostPagination
 
     def get_queryset(self):
         user_id = self.kwargs.get("pk")
-        user = self.request.user
-        comments_count_with_post = 1        
-    
-        queryset = (
-            Post.objects.select_related("user")
-            .annotate(
-                is_liked=Exists(
-                    PostLike.objects.filter(post=OuterRef("pk"), user=user)
-                ),
-            )
-            .prefetch_related(
-                Prefetch(
-                    "comment_set",
-                    queryset=Comment.objects.select_related("user")
-                    .annotate(
-                        is_liked=Exists(
-                            CommentLike.objects.filter(
-                                comment=OuterRef("pk"), user=user
-                            )
-                        )
-                    )
-                    .order_by("-created_at")[:comments_count_with_post],
-                    to_attr="latest_comments",
-                ),
-            )
-            .filter(user__id=user_id)
-            .order_by("-created_at")
-        )
+
+        # Documents carry the author and the comment snapshot, is_liked is looked up for the
+        # whole page by the serializer.
+        queryset = PostDocument.objects.filter(user_id=user_id)
 
         return queryset
 
     def get_serializer_context(self):
+        comments_count_with_post = 1
+
         context = super(UserPostsViewSet, self).get_serializer_context()
-        context.update({"request": self.request})
+        context.update({"request": self.request, "comments_count": comments_count_with_post})
         return context
     
     @swagger_auto_schema(
@@ -154,88 +140,20 @@ class UserPostsViewSet(ModelViewSet):
 
 
 class FeedViewSet(ModelViewSet):
-    serializer_class = FeedPostSerializer
+    """
+    Reads the caller's timeline, filled by PostViewSet on write. Page ids and viewer independent
+    post fragments built from post documents are cached, is_liked is layered on per viewer.
+    Users without friends get the discovery pool instead. Each page is ordered by the ranking
+    model when one is loaded.
+    """
+
+    serializer_class = FeedPostDocumentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TimelinePagination
 
     def get_queryset(self):
-        user:User = self.request.user
-        token = self.request.headers.get("Authorization")
-        
-        two_weeks_ago = timezone.now() - timedelta(weeks=48)
-        comments_count_with_post = 3
-
-        try:
-            response = requests.get(
-                f"http://friends:8000/api/friends/users/{str(user.id)}/friends/?pagination=false",
-                headers={"Authorization": token},
-            )
-        except Exception as e:
-            print(e)
-            raise APIException("Something went wrong please try again later.")
-
-        if response.status_code != 200:
-            raise APIException("Something went wrong please try again later.")
-
-        try:
-            user_ids = [friend["id"] for friend in response.json()]
-        except Exception as e:
-            queryset = (
-                Post.objects.select_related("user")
-                .annotate(
-                    is_liked=Exists(
-                        PostLike.objects.filter(post=OuterRef("pk"), user=user)
-                    ),
-                )
-                .prefetch_related(
-                    Prefetch(
-                        "comment_set",
-                        queryset=Comment.objects.select_related("user")
-                        .annotate(
-                            is_liked=Exists(
-                                CommentLike.objects.filter(
-                                    comment=OuterRef("pk"), user=user
-                                )
-                            )
-                        )
-                        .order_by("-created_at")[:comments_count_with_post],
-                        to_attr="latest_comments",
-                    ),
-                )
-                .filter(created_at__gte=two_weeks_ago)
-                .order_by("?") 
-            )
-            return queryset
-
-        queryset = (
-            Post.objects.select_related("user")
-            .annotate(
-                is_liked=Exists(
-                    PostLike.objects.filter(post=OuterRef("pk"), user=user)
-                ),
-            )
-            .prefetch_related(
-                Prefetch(
-                    "comment_set",
-                    queryset=Comment.objects.select_related("user")
-                    .annotate(
-                        is_liked=Exists(
-                            CommentLike.objects.filter(
-                                comment=OuterRef("pk"), user=user
-                            )
-                        )
-                    )
-                    .order_by("-created_at")[:comments_count_with_post],
-                    to_attr="latest_comments",
-                ),
-            )
-            .filter(user__id__in=user_ids, created_at__gte=two_weeks_ago)
-            .order_by("-created_at")
-        )
-
-        return queryset
+        return PostDocument.objects.all()
 
-    @method_decorator(cache_page(60 * 5))
-    @method_decorator(vary_on_headers("Authorization"))
     @swagger_auto_schema(
         operation_description="List feed posts",
         responses={
@@ -246,11 +164,61 @@ class FeedViewSet(ModelViewSet):
         },
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        user:User = request.user
+
+        if Friendship.objects.filter(user_id=user.id).exists():
+            paginator = self.paginator
+            key = feed_cache.page_key(user.id, request.query_params.get(paginator.cursor_query_param, ""))
+            page = feed_cache.get_page(key)
+
+            if page is None:
+                post_ids = paginator.paginate_ids(
+                    lambda before, limit: timeline.read(user.id, before, limit),
+                    request,
+                )
+                feed_cache.set_page(key, {"ids": post_ids, "pagination": paginator.dump()})
+            else:
+                post_ids = page["ids"]
+                paginator.load(request, page["pagination"])
+        else:
+            paginator = DiscoveryPagination()
+            post_ids = paginator.paginate_ids(discovery.read, request)
+
+        fragments = feed_cache.get_fragments(post_ids, self.build_fragments)
+        post_ids = ranking.rank([post_id for post_id in post_ids if post_id in fragments], fragments)
+        comment_ids = [
+            comment["id"] for post_id in post_ids for comment in fragments[post_id]["comments"]
+        ]
+
+        liked_posts = liked.check(liked.POST, user.id, post_ids)
+        liked_comments = liked.check(liked.COMMENT, user.id, comment_ids)
+
+        data = [
+            {
+                **fragments[post_id],
+                "is_liked": post_id in liked_posts,
+                "comments": [
+                    {**comment, "is_liked": comment["id"] in liked_comments}
+                    for comment in fragments[post_id]["comments"]
+                ],
+            }
+            for post_id in post_ids
+        ]
+
+        return paginator.get_paginated_response(data)
+
+    def build_fragments(self, post_ids):
+        posts = list(self.get_queryset().filter(id__in=post_ids))
+        # is_liked depends on the viewer, it's layered on by list() and not cached.
+        context = {**self.get_serializer_context(), "liked_posts": set(), "liked_comments": set()}
+        serializer = self.get_serializer(posts, many=True, context=context)
+        return {str(post.id): dict(data) for post, data in zip(posts, serializer.data)}
 
     def get_serializer_context(self):
+        comments_count_with_post = 3
+
         context = super(FeedViewSet, self).get_serializer_context()
-        context.update({"request": self.request})
+        context.update({"request": self.request, "comments_count": comments_count_with_post})
         return context
 
 
@@ -0,0 +1,26 @@
+READ_DATABASE = "read"
+
+
+class ReadModelRouter:
+    """
+    Documents built by projector.py live in the read database, everything else in the
+    write database. Replica pinning doesn't apply to documents, the changes of a request
+    are projected when it commits instead, see projections.emit.
+    """
+
+    read_models = {"postdocument", "commentdocument"}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.model_name in self.read_models:
+            return READ_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return self.db_for_read(model, **hints)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if model_name in self.read_models:
+            return db == READ_DATABASE
+        if db == READ_DATABASE:
+            return False
+        return None
@@ -1,7 +1,9 @@
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from django.core.exceptions import ImproperlyConfigured
 from celery import schedules
 
 load_dotenv()
@@ -9,6 +11,11 @@ load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Code shared by the services lives in shared/ next to the service folders when running
+# from a checkout, images copy it to /app/shared.
+if (BASE_DIR.parent / "shared").is_dir():
+    sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -44,6 +51,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "shared.replicas.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -92,9 +100,44 @@ DATABASES = {
         "PASSWORD": db_user_pass,
         "HOST": db_host,
         "PORT": db_port,
-    }
+    },
+    # Denormalized post and comment documents, written by projector.py only.
+    "read": {
+        "ENGINE": "django.db.backends.postgresql",
+        "NAME": os.getenv("POSTGRES_READ_DB", db_name),
+        "USER": os.getenv("POSTGRES_READ_USER", db_user),
+        "PASSWORD": os.getenv("POSTGRES_READ_PASSWORD", db_user_pass),
+        "HOST": os.getenv("POSTGRES_READ_HOST", db_host),
+        "PORT": os.getenv("POSTGRES_READ_PORT", db_port),
+    },
 }
 
+# Both aliases would share one django_migrations table, so whichever migrates second skips
+# its tables. The read database has to be a database of its own.
+read_database = DATABASES["read"]
+if (read_database["HOST"], read_database["PORT"], read_database["NAME"]) == (db_host, db_port, db_name):
+    raise ImproperlyConfigured("POSTGRES_READ_HOST or POSTGRES_READ_DB must point to a separate read database")
+
+# Reads of safe requests go to the replica when one is configured, see shared/replicas.py.
+replica_host = os.getenv("POSTGRES_REPLICA_HOST")
+if replica_host:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", db_port),
+        "ATOMIC_REQUESTS": False,
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["postwrite.routers.ReadModelRouter", "shared.replicas.PrimaryReplicaRouter"]
+
+# Clients read from the primary for this long after they wrote, so they see their own writes.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+
+# Feed pages are ordered by the model in postwrite/models within this budget, or served
+# chronologically, see posts/ranking.py.
+FEED_RANKING_BUDGET_MS = int(os.getenv("FEED_RANKING_BUDGET_MS", 50))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -144,10 +187,29 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 USERS_SERVICE = os.getenv("USERS_SERVICE")
 
+# "local" verifies access tokens in-process, "gateway" trusts the X-User-Id header set by
+# the nginx auth_request, "remote" asks the users service on every request.
+AUTH_MODE = os.getenv("AUTH_MODE", "local")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# HS* tokens are signed with the users service SECRET_KEY, RS* tokens are checked
+# against the public key published by the users service.
+JWT_VERIFYING_KEY = os.getenv("JWT_VERIFYING_KEY") or (
+    os.getenv("SECRET_KEY") if JWT_ALGORITHM.startswith("HS") else None
+)
+
 
 REST_FRAMEWORK = {
     "COERCE_DECIMAL_TO_STRING": False,
     "DEFAULT_AUTHENTICATION_CLASSES": ("posts.middleware.UserAuthentication",),
+    "DEFAULT_RENDERER_CLASSES": (
+        "shared.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "shared.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
 }
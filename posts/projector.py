@@ -0,0 +1,81 @@
+import os
+from dotenv import load_dotenv
+from time import sleep
+from django.utils import timezone
+import django
+import logging
+
+
+"""
+Keeps the read database in step with the write database. Projection events are read in
+batches, the documents they name are rebuilt from the current rows and the events are
+removed only after the documents were written.
+"""
+
+
+load_dotenv()
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "postwrite.settings")
+django.setup()
+
+from django.db import transaction
+from posts import projections
+from posts.models import ProjectionEvent
+from postwrite.routers import READ_DATABASE
+
+logger = logging.getLogger(__name__)
+
+
+def info(msg):
+    timestamp = timezone.now()
+    details = f"[{timestamp.day:02d}/{timestamp.month:02d}/{timestamp.year} {timestamp.hour:02d}:{timestamp.minute:02d}:{timestamp.second:02d}] {msg}"
+    logger.info(details)
+    print(details)
+
+
+def error(msg):
+    timestamp = timezone.now()
+    details = f"[{timestamp.day:02d}/{timestamp.month:02d}/{timestamp.year} {timestamp.hour:02d}:{timestamp.minute:02d}:{timestamp.second:02d}] {msg}"
+    logger.error(details)
+
+
+BATCH_SIZE = int(os.getenv("PROJECTION_BATCH_SIZE", 500))
+POLL_INTERVAL = float(os.getenv("PROJECTION_POLL_INTERVAL", 0.2))
+
+
+def project_batch():
+    """
+    Project one batch. Rows stay locked until the documents are written, a failure rolls
+    the transaction back and the batch is retried.
+    """
+    with transaction.atomic():
+        events = list(
+            ProjectionEvent.objects.select_for_update(skip_locked=True).order_by("id")[:BATCH_SIZE]
+        )
+        if not events:
+            return 0
+
+        with transaction.atomic(using=READ_DATABASE):
+            projections.project(events)
+
+        ProjectionEvent.objects.filter(id__in=[event.id for event in events]).delete()
+
+    info(f"Projected {len(events)} events")
+    return len(events)
+
+
+def run():
+    print("[PROJECTOR] Started projecting...")
+    while True:
+        try:
+            projected = project_batch()
+        except Exception as e:
+            error(f"Failed to project batch: {e}")
+            projected = 0
+
+        if projected < BATCH_SIZE:
+            sleep(POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,212 @@
+import bisect
+import logging
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in milliseconds.
+LATENCY_BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised without touching the network while an upstream is failing.
+    Subclasses RequestException so existing error handling keeps working.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fails fast for `reset_timeout`
+    seconds. After that a single trial request is let through, its result closes or re-opens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=10):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.trial_owner = None
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_running:
+                self.trial_running = True
+                self.trial_owner = threading.get_ident()
+                return True
+            return False
+
+    def end_trial(self):
+        """
+        Let another trial through if this thread's trial ended without a recorded result,
+        e.g. on an exception that isn't a RequestException.
+        """
+        with self.lock:
+            if self.trial_owner == threading.get_ident():
+                self.trial_running = False
+                self.trial_owner = None
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+            self.trial_owner = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.trial_running = False
+            self.trial_owner = None
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class RetryBudget:
+    """
+    Every request deposits `ratio` tokens and every retry withdraws one, so retries stay
+    a small fraction of traffic instead of multiplying load on a struggling upstream.
+    """
+
+    def __init__(self, ratio=0.1, min_tokens=10, max_tokens=100):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = min_tokens
+        self.lock = threading.Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class LatencyHistogram:
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0
+        self.sum_ms = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, elapsed_ms):
+        with self.lock:
+            self.counts[bisect.bisect_left(LATENCY_BUCKETS, elapsed_ms)] += 1
+            self.total += 1
+            self.sum_ms += elapsed_ms
+
+    def snapshot(self):
+        labels = [f"le_{bucket}ms" for bucket in LATENCY_BUCKETS] + ["le_inf"]
+        return {
+            "count": self.total,
+            "avg_ms": round(self.sum_ms / self.total, 2) if self.total else 0.0,
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class Upstream:
+    """
+    Keep-alive client for one upstream service with timeouts, a retry budget,
+    a circuit breaker and a latency histogram.
+    """
+
+    RETRY_STATUSES = (502, 503, 504)
+
+    def __init__(
+        self,
+        name,
+        base_url,
+        connect_timeout=1.0,
+        read_timeout=3.0,
+        retries=2,
+        pool_size=20,
+        report_every=1000,
+    ):
+        self.name = name
+        self.base_url = (base_url or "").rstrip("/")
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.report_every = report_every
+        self.breaker = CircuitBreaker()
+        self.budget = RetryBudget()
+        self.latency = LatencyHistogram()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def request(self, method, path, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.base_url + path
+        self.budget.deposit()
+
+        attempt = 0
+        while True:
+            if not self.breaker.allow():
+                raise CircuitOpenError(f"Circuit open for upstream {self.name}")
+
+            started = time.perf_counter()
+            try:
+                try:
+                    response = self.session.request(method, url, **kwargs)
+                except requests.exceptions.RequestException:
+                    self.observe(started)
+                    self.breaker.record_failure()
+                    if self.can_retry(method, attempt):
+                        attempt += 1
+                        continue
+                    raise
+
+                self.observe(started)
+                if response.status_code in self.RETRY_STATUSES:
+                    self.breaker.record_failure()
+                    if self.can_retry(method, attempt):
+                        attempt += 1
+                        continue
+                else:
+                    self.breaker.record_success()
+                return response
+            finally:
+                # A trial must never outlive its call, or the breaker rejects every call after it.
+                self.breaker.end_trial()
+
+    def can_retry(self, method, attempt):
+        return method == "GET" and attempt < self.retries and self.budget.withdraw()
+
+    def observe(self, started):
+        self.latency.observe((time.perf_counter() - started) * 1000)
+        if self.latency.total % self.report_every == 0:
+            logger.info(f"Upstream {self.name}: {self.stats()}")
+
+    def stats(self):
+        return {
+            "circuit": self.breaker.state,
+            "retry_tokens": round(self.budget.tokens, 2),
+            "latency": self.latency.snapshot(),
+        }
+
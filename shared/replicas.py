@@ -0,0 +1,151 @@
+import logging
+import random
+import threading
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import LazyObject
+
+
+"""
+Sends reads of safe requests to a replica. Everything else stays on the primary: writes,
+reads of unsafe requests, reads without a request (consumers, commands, background jobs)
+and reads of clients that wrote within the last REPLICA_PIN_SECONDS, so they see their
+own writes despite replication lag.
+"""
+
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = "default"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+PIN_COOKIE = "db_pinned"
+
+current_request = ContextVar("current_request", default=None)
+
+
+def get_replicas():
+    return [alias for alias in settings.DATABASES if alias.startswith("replica")]
+
+
+def pin_key(user_id):
+    return f"replica_pin_{user_id}"
+
+
+def get_user_id(request):
+    """
+    The id of a user authenticated by DRF. A lazy session user is left alone, evaluating it
+    would query the database from inside the router.
+    """
+    user = request.__dict__.get("user")
+    if user is None or isinstance(user, LazyObject):
+        return None
+    return getattr(user, "pk", None)
+
+
+def is_pinned(request):
+    if request.__dict__.get("_replica_pinned"):
+        return True
+
+    if request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES:
+        request._replica_pinned = True
+        return True
+
+    # The user is known only once DRF authenticated the request, look the pin up once then.
+    if "_replica_user_checked" not in request.__dict__:
+        user_id = get_user_id(request)
+        if user_id is not None:
+            request._replica_user_checked = True
+            if cache.get(pin_key(user_id)):
+                request._replica_pinned = True
+                return True
+
+    return False
+
+
+class SplitStats:
+    """
+    Per-process count of where queries were routed, logged every `report_every` decisions.
+    """
+
+    def __init__(self, report_every=10000):
+        self.report_every = report_every
+        self.lock = threading.Lock()
+        self.counters = {"replica_reads": 0, "pinned_reads": 0, "primary_reads": 0, "writes": 0}
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+            total = sum(self.counters.values())
+
+        if total % self.report_every == 0:
+            logger.info(f"Database split: {self.stats()}")
+
+    def stats(self):
+        total = sum(self.counters.values())
+        reads = total - self.counters["writes"]
+        return {
+            **self.counters,
+            "replica_read_ratio": round(self.counters["replica_reads"] / reads, 4) if reads else 0.0,
+            "read_write_ratio": round(reads / self.counters["writes"], 2) if self.counters["writes"] else None,
+        }
+
+
+split_stats = SplitStats()
+
+
+class PrimaryReplicaRouter:
+    def __init__(self):
+        self.replicas = get_replicas()
+
+    def db_for_read(self, model, **hints):
+        request = current_request.get()
+        if not self.replicas or request is None:
+            split_stats.count("primary_reads")
+            return PRIMARY
+        if is_pinned(request):
+            split_stats.count("pinned_reads")
+            return PRIMARY
+        split_stats.count("replica_reads")
+        return random.choice(self.replicas)
+
+    def db_for_write(self, model, **hints):
+        request = current_request.get()
+        if request is not None:
+            request._replica_pinned = True
+            request._db_written = True
+        split_stats.count("writes")
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == PRIMARY
+
+
+class ReplicaPinningMiddleware:
+    """
+    Makes the request visible to the router and pins clients to the primary after they
+    wrote, by cookie and, for authenticated users, by a shared key.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = current_request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_request.reset(token)
+
+        if request.__dict__.get("_db_written"):
+            pin_seconds = settings.REPLICA_PIN_SECONDS
+            response.set_cookie(PIN_COOKIE, "1", max_age=pin_seconds, httponly=True, samesite="Lax")
+            user_id = get_user_id(request)
+            if user_id is not None:
+                cache.set(pin_key(user_id), 1, pin_seconds)
+
+        return response
@@ -0,0 +1,103 @@
+import time
+import jwt
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import AuthenticationFailed
+
+
+"""
+Access token checks shared by the users service, which issues and revokes tokens, and the
+services that verify them locally. Revocations are broadcast by the users service and
+written to each service's cache under the same keys, see userauth/authentication.py.
+"""
+
+
+HR_1 = 60 * 60
+VERIFYING_KEY_CACHE_KEY = "jwt_verifying_key"
+
+_verifying_key = None
+
+
+def revoked_token_key(jti):
+    return f"revoked_token_{jti}"
+
+
+def tokens_revoked_before_key(user_id):
+    return f"tokens_revoked_before_{user_id}"
+
+
+def revoke_token(jti, exp):
+    """
+    Reject a single access token until it would have expired anyway.
+    """
+    timeout = int(exp - time.time())
+    if timeout > 0:
+        cache.set(revoked_token_key(jti), True, timeout)
+
+
+def revoke_user_tokens(user_id, revoked_before, expires_at):
+    """
+    Reject every token of the user issued before `revoked_before`.
+    """
+    timeout = int(expires_at - time.time())
+    if timeout > 0:
+        cache.set(tokens_revoked_before_key(user_id), revoked_before, timeout)
+
+
+def is_token_revoked(payload):
+    keys = [
+        revoked_token_key(payload["jti"]),
+        tokens_revoked_before_key(payload["user_id"]),
+    ]
+    revoked = cache.get_many(keys)
+
+    if revoked.get(keys[0]):
+        return True
+
+    revoked_before = revoked.get(keys[1])
+    return revoked_before is not None and payload.get("iat", 0) < revoked_before
+
+
+def get_verifying_key(users_service):
+    """
+    Key used to check token signatures. Public keys are fetched once from the users service.
+    """
+    global _verifying_key
+
+    if _verifying_key:
+        return _verifying_key
+
+    key = settings.JWT_VERIFYING_KEY or cache.get(VERIFYING_KEY_CACHE_KEY)
+
+    if not key:
+        try:
+            response = users_service.get("/api/users/keys/")
+            response.raise_for_status()
+            key = response.json()["key"]
+        except (requests.exceptions.RequestException, KeyError, ValueError):
+            raise AuthenticationFailed("Auth service unavailable")
+        cache.set(VERIFYING_KEY_CACHE_KEY, key, HR_1)
+
+    _verifying_key = key
+    return key
+
+
+def verify_token(token, users_service):
+    """
+    Verify signature, expiry and revocation of an access token and return its payload.
+    """
+    try:
+        payload = jwt.decode(
+            token,
+            get_verifying_key(users_service),
+            algorithms=[settings.JWT_ALGORITHM],
+            options={"require": ["exp", "jti", "user_id"]},
+        )
+    except jwt.InvalidTokenError:
+        raise AuthenticationFailed("Invalid token")
+
+    if payload.get("token_type") != "access" or is_token_revoked(payload):
+        raise AuthenticationFailed("Invalid token")
+
+    return payload
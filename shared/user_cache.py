@@ -0,0 +1,99 @@
+import copy
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.core.cache import cache
+
+
+logger = logging.getLogger(__name__)
+
+HR_1 = 60 * 60
+MISSING = "__missing__"
+
+
+class UserCache:
+    """
+    Two tier cache for request users. A small per-process LRU sits in front of the
+    shared Redis cache, unknown ids are cached as well so they don't hit the database.
+    Local entries live for a few seconds, which bounds how stale a worker can be after
+    the consumer invalidates the shared entry.
+    """
+
+    def __init__(self, max_size=10000, local_ttl=5, shared_ttl=HR_1, negative_ttl=30, report_every=10000):
+        self.max_size = max_size
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self.negative_ttl = negative_ttl
+        self.report_every = report_every
+        self.local = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "negative_hits": 0}
+
+    def key(self, user_id):
+        # Services spell ids with or without hyphens, every spelling maps to the same entry.
+        try:
+            user_id = uuid.UUID(str(user_id))
+        except ValueError:
+            pass
+        return f"auth_user_{user_id}"
+
+    def get(self, user_id, loader):
+        key = self.key(user_id)
+
+        with self.lock:
+            entry = self.local.get(key)
+            if entry and entry[1] > time.monotonic():
+                self.local.move_to_end(key)
+                self.count("negative_hits" if entry[0] is None else "local_hits")
+                return copy.copy(entry[0])
+
+        value = cache.get(key)
+
+        if value is None:
+            self.count("misses")
+            value = loader(user_id)
+            cache.set(
+                key,
+                MISSING if value is None else value,
+                self.negative_ttl if value is None else self.shared_ttl,
+            )
+        else:
+            value = None if value == MISSING else value
+            self.count("negative_hits" if value is None else "shared_hits")
+
+        self.set_local(key, value)
+        return copy.copy(value)
+
+    def set_local(self, key, value):
+        ttl = self.local_ttl if value is not None else min(self.local_ttl, self.negative_ttl)
+        with self.lock:
+            self.local[key] = (value, time.monotonic() + ttl)
+            self.local.move_to_end(key)
+            while len(self.local) > self.max_size:
+                self.local.popitem(last=False)
+
+    def invalidate(self, user_id):
+        key = self.key(user_id)
+        cache.delete(key)
+        with self.lock:
+            self.local.pop(key, None)
+
+    def count(self, counter):
+        self.counters[counter] += 1
+
+        if sum(self.counters.values()) % self.report_every == 0:
+            logger.info(f"User cache: {self.stats()}")
+
+    def stats(self):
+        total = sum(self.counters.values())
+        hits = total - self.counters["misses"]
+        return {
+            **self.counters,
+            "size": len(self.local),
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+
+user_cache = UserCache()
@@ -56,7 +56,10 @@ dtypes = {
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATASET_DIR = os.path.join(BASE_DIR, "dataset")
-MODEL_DIR = os.path.join(BASE_DIR, "postwrite", "models")
+# The posts service serves the model and id maps from its own postwrite/models,
+# settings.BASE_DIR of the posts service is the posts folder next to this script.
+POSTS_BASE_DIR = os.path.join(BASE_DIR, "posts")
+MODEL_DIR = os.path.join(POSTS_BASE_DIR, "postwrite", "models")
 
 dataset_path_list = [os.path.join(DATASET_DIR, file) for file in os.listdir(DATASET_DIR) if file.endswith(".csv")]
 dataset_path_list.sort()
@@ -175,34 +178,34 @@ for current_dataset, DATASET in enumerate(DATASET_PATH_LIST):
 
 # save the maps
 start = datetime.datetime.now()
-with open("user_id_map.json", "w") as f:
+with open(os.path.join(MODEL_DIR, "user_id_map.json"), "w") as f:
     json.dump(user_id_map, f)
 end = datetime.datetime.now()
 print(f"Saved user_id_map in {end - start}")
 
 
 start = datetime.datetime.now()
-with open("post_id_map.json", "w") as f:
+with open(os.path.join(MODEL_DIR, "post_id_map.json"), "w") as f:
     json.dump(post_id_map, f)
 end = datetime.datetime.now()
 print(f"Saved post_id_map in {end - start}")
 
 
 start = datetime.datetime.now()
-with open("comment_id_map.json", "w") as f:
+with open(os.path.join(MODEL_DIR, "comment_id_map.json"), "w") as f:
     json.dump(comment_id_map, f)
 end = datetime.datetime.now()
 print(f"Saved comment_id_map in {end - start}")
 
 # save the vectorizers
 start = datetime.datetime.now()
-with open("post_vectorizer.pkl", "wb") as f:
+with open(os.path.join(MODEL_DIR, "post_vectorizer.pkl"), "wb") as f:
     pickle.dump(post_vectorizer, f)
 end = datetime.datetime.now()
 print(f"Saved post_vectorizer in {end - start}")
 
 start = datetime.datetime.now()
-with open("comment_vectorizer.pkl", "wb") as f:
+with open(os.path.join(MODEL_DIR, "comment_vectorizer.pkl"), "wb") as f:
     pickle.dump(comment_vectorizer, f)
 end = datetime.datetime.now()
 print(f"Saved comment_vectorizer in {end - start}")
@@ -3,6 +3,9 @@
 echo "Waiting for RabbitMQ to start..."
 ./wait-for-it.sh rabbitmq:5672 --strict -t 30
 
+echo "Waiting for Redis Server to start..."
+./wait-for-it.sh redis:6379 --strict -t 30
+
 echo "Waiting for MySQL Users Database to start..."
 ./wait-for-it.sh users-db:3306 --strict -t 30
 
@@ -13,6 +16,9 @@ echo "Migrating the Database..."
 python manage.py migrate
 
 echo "Starting the server..."
-python manage.py runserver 0.0.0.0:8000
+python manage.py runserver 0.0.0.0:8000 &
+
+echo "Starting Outbox Relay..."
+python relay.py
 
 exec "$@"
\ No newline at end of file
@@ -0,0 +1,184 @@
+import os
+import pika
+import json
+from dotenv import load_dotenv
+from time import sleep
+from django.utils import timezone
+import django
+import logging
+
+
+"""
+Delivers outbox events to RabbitMQ. Events are read in batches, published with
+publisher confirms and removed only after the broker acknowledged them.
+"""
+
+
+load_dotenv()
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "users.settings")
+django.setup()
+
+from django.db import DatabaseError, close_old_connections, transaction
+from userauth.models import OutboxEvent
+
+logger = logging.getLogger(__name__)
+
+
+def info(msg):
+    timestamp = timezone.now()
+    details = f"[{timestamp.day:02d}/{timestamp.month:02d}/{timestamp.year} {timestamp.hour:02d}:{timestamp.minute:02d}:{timestamp.second:02d}] {msg}"
+    logger.info(details)
+    print(details)
+
+
+def warning(msg):
+    timestamp = timezone.now()
+    details = f"[{timestamp.day:02d}/{timestamp.month:02d}/{timestamp.year} {timestamp.hour:02d}:{timestamp.minute:02d}:{timestamp.second:02d}] {msg}"
+    logger.warning(details)
+
+
+def error(msg):
+    timestamp = timezone.now()
+    details = f"[{timestamp.day:02d}/{timestamp.month:02d}/{timestamp.year} {timestamp.hour:02d}:{timestamp.minute:02d}:{timestamp.second:02d}] {msg}"
+    logger.error(details)
+
+
+BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", 100))
+POLL_INTERVAL = float(os.getenv("OUTBOX_POLL_INTERVAL", 0.5))
+# Seconds to wait after a database error, doubled on every consecutive one up to the maximum.
+DB_RETRY_INTERVAL = 1
+DB_RETRY_MAX_INTERVAL = 30
+QUEUE_LIST = os.getenv("QUEUE_LIST").split(",")
+CURRENT_QUEUE = os.getenv("CURRENT_QUEUE")
+
+# Consecutive events of these types for the same key collapse into the newest one.
+COALESCED_ACTIONS = ("user.created", "user.updated")
+
+rabbitmq_user = os.getenv("RABBITMQ_DEFAULT_USER")
+rabbitmq_pass = os.getenv("RABBITMQ_DEFAULT_PASS")
+rabbitmq_host = os.getenv("RABBITMQ_HOST")
+
+
+if not rabbitmq_user or not rabbitmq_pass:
+    raise ValueError(
+        "RabbitMQ credentials are not set properly in the environment variables."
+    )
+
+
+credentials = pika.PlainCredentials(rabbitmq_user, rabbitmq_pass)
+
+
+def connect_to_rabbitmq():
+    connection = None
+    while True:
+        try:
+            connection = pika.BlockingConnection(
+                pika.ConnectionParameters(
+                    rabbitmq_host, credentials=credentials, heartbeat=60
+                )
+            )
+            break
+        except Exception as e:
+            print(f"Failed to connect to RabbitMQ: {e}")
+        sleep(1)
+
+    return connection
+
+
+def open_channel():
+    connection = connect_to_rabbitmq()
+    channel = connection.channel()
+    channel.confirm_delivery()
+    for queue in QUEUE_LIST:
+        if queue != CURRENT_QUEUE:
+            channel.queue_declare(queue=queue)
+    return connection, channel
+
+
+def coalesce(events):
+    """
+    Keep only the newest state of a user when a batch holds several created/updated
+    events for it. A created event stays a created event.
+    """
+    batch = []
+    positions = {}
+
+    for event in events:
+        action_type = event.action_type
+        position = positions.pop(event.key, None) if event.key else None
+
+        if action_type in COALESCED_ACTIONS and position is not None:
+            if batch[position]["action_type"] == "user.created":
+                action_type = "user.created"
+            batch[position] = None
+
+        if event.key and action_type in COALESCED_ACTIONS:
+            positions[event.key] = len(batch)
+
+        batch.append({"action_type": action_type, "body": event.body, "to": event.to})
+
+    return [entry for entry in batch if entry]
+
+
+def relay_batch(channel):
+    """
+    Publish one batch. Rows stay locked until every message is confirmed, a failure
+    rolls the transaction back and the batch is retried, so delivery is at least once.
+    """
+    with transaction.atomic():
+        events = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True).order_by("id")[:BATCH_SIZE]
+        )
+        if not events:
+            return 0
+
+        for entry in coalesce(events):
+            properties = pika.BasicProperties(entry["action_type"])
+            body = json.dumps(entry["body"])
+            for publish_to in entry["to"]:
+                channel.basic_publish(
+                    exchange="",
+                    routing_key=publish_to,
+                    body=body,
+                    properties=properties,
+                )
+                info(f'"PUBLISHED - QUEUE: {publish_to} | ACTION: {entry["action_type"]}"')
+
+        OutboxEvent.objects.filter(id__in=[event.id for event in events]).delete()
+
+    return len(events)
+
+
+def run():
+    connection, channel = open_channel()
+
+    db_retry_interval = DB_RETRY_INTERVAL
+
+    print("[OUTBOX] Started relaying...")
+    while True:
+        try:
+            relayed = relay_batch(channel)
+        except DatabaseError as e:
+            # The batch rolled back, drop the broken connection and retry with a fresh one.
+            error(f"Failed to read outbox batch, retrying in {db_retry_interval}s: {e}")
+            close_old_connections()
+            connection.sleep(db_retry_interval)
+            db_retry_interval = min(db_retry_interval * 2, DB_RETRY_MAX_INTERVAL)
+            continue
+        except pika.exceptions.AMQPError as e:
+            error(f"Failed to relay outbox batch: {e}")
+            try:
+                connection.close()
+            except Exception:
+                pass
+            connection, channel = open_channel()
+            continue
+
+        db_retry_interval = DB_RETRY_INTERVAL
+        if relayed < BATCH_SIZE:
+            connection.sleep(POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,95 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from users.producers import publish
+from shared.tokens import is_token_revoked, revoked_token_key, tokens_revoked_before_key
+
+
+def revoke_access_token(token):
+    """
+    Revoke a single access token here and in every service that verifies tokens locally.
+    """
+    data = {
+        "id": str(token["user_id"]),
+        "jti": token["jti"],
+        "exp": token["exp"],
+    }
+    timeout = int(data["exp"] - time.time())
+    if timeout > 0:
+        cache.set(revoked_token_key(data["jti"]), True, timeout)
+    publish("token.revoked", data, "broadcast")
+
+
+def blacklist_refresh_token(token):
+    """
+    Blacklist a refresh token in Redis. The key expires together with the token, so the
+    blacklist only ever holds tokens that could still be replayed.
+    Returns False when the token was already blacklisted.
+    """
+    timeout = int(token["exp"] - time.time())
+    if timeout <= 0:
+        return False
+    return cache.add(revoked_token_key(token["jti"]), True, timeout)
+
+
+def revoke_user_tokens(user):
+    """
+    Revoke every access and refresh token issued to the user until now.
+    """
+    lifetime = max(
+        settings.SIMPLE_JWT["ACCESS_TOKEN_LIFETIME"],
+        settings.SIMPLE_JWT["REFRESH_TOKEN_LIFETIME"],
+    )
+    revoked_before = int(time.time())
+    data = {
+        "id": str(user.id),
+        "revoked_before": revoked_before,
+        "expires_at": revoked_before + int(lifetime.total_seconds()),
+    }
+    cache.set(
+        tokens_revoked_before_key(data["id"]),
+        revoked_before,
+        int(lifetime.total_seconds()),
+    )
+    publish("user.tokens.revoked", data, "broadcast")
+
+
+class UserJWTAuthentication(JWTAuthentication):
+    def get_validated_token(self, raw_token):
+        validated_token = super().get_validated_token(raw_token)
+        if is_token_revoked(validated_token):
+            raise InvalidToken("Token is revoked")
+        return validated_token
+
+
+class UserTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    TokenRefreshSerializer with the rotated token blacklisted in Redis instead of the
+    token_blacklist tables. Two concurrent refreshes with the same token can't both win.
+    """
+
+    token_class = RefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        if is_token_revoked(refresh):
+            raise InvalidToken("Token is revoked")
+
+        if api_settings.ROTATE_REFRESH_TOKENS and api_settings.BLACKLIST_AFTER_ROTATION:
+            if not blacklist_refresh_token(refresh):
+                raise InvalidToken("Token is blacklisted")
+
+        data = {"access": str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            data["refresh"] = str(refresh)
+
+        return data
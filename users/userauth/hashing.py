@@ -0,0 +1,92 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework.exceptions import Throttled
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_pool_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(settings.PASSWORD_HASHING_MAX_PENDING)
+
+
+class HashingBusy(Throttled):
+    default_detail = "Too many login attempts in progress, try again shortly."
+
+
+def init_worker():
+    import django
+
+    django.setup()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.PASSWORD_HASHING_WORKERS, initializer=init_worker
+            )
+        return _pool
+
+
+def reset_pool(broken):
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def run(function, *args):
+    """
+    Run a hashing function in the pool. Raises HashingBusy (429) instead of queueing
+    when PASSWORD_HASHING_MAX_PENDING calls are already waiting.
+    """
+    if not _pending.acquire(blocking=False):
+        raise HashingBusy(wait=1)
+
+    try:
+        pool = get_pool()
+        try:
+            return pool.submit(function, *args).result()
+        except BrokenProcessPool:
+            logger.error("Password hashing pool broke, restarting it")
+            reset_pool(pool)
+            return get_pool().submit(function, *args).result()
+    finally:
+        _pending.release()
+
+
+def hash_password(password):
+    return hashers.make_password(password)
+
+
+def verify_password(password, encoded):
+    """
+    Returns (is_correct, new_hash). new_hash is set when the stored hash was made with
+    an older hasher or fewer iterations than the current PASSWORD_HASHERS setting.
+    """
+    upgraded = []
+    is_correct = hashers.check_password(password, encoded, setter=upgraded.append)
+    return is_correct, hashers.make_password(password) if upgraded else None
+
+
+def make_password(password):
+    return run(hash_password, password)
+
+
+def check_password(user, password):
+    """
+    check_password off the request thread. Outdated hashes are replaced in place, without
+    save() so no user events are published for it.
+    """
+    is_correct, new_hash = run(verify_password, password, user.password)
+    if new_hash:
+        type(user).objects.filter(pk=user.pk, password=user.password).update(password=new_hash)
+        user.password = new_hash
+    return is_correct
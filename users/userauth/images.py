@@ -0,0 +1,82 @@
+import hashlib
+from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections
+import logging
+
+
+logger = logging.getLogger(__name__)
+
+# Square sizes generated for every profile picture, in pixels.
+PROFILE_PIC_SIZES = {
+    "small": 48,
+    "medium": 128,
+    "large": 320,
+}
+PROFILE_PIC_DIR = "avatars"
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="profile-pic")
+
+
+def schedule_profile_pic(user_id):
+    """
+    Resize in the background so the upload request returns immediately.
+    """
+    executor.submit(run_profile_pic_job, user_id)
+
+
+def run_profile_pic_job(user_id):
+    close_old_connections()
+    try:
+        process_profile_pic(user_id)
+    except Exception as e:
+        logger.error(f"Failed to process profile picture of [{user_id}]: {e}")
+    finally:
+        close_old_connections()
+
+
+def process_profile_pic(user_id):
+    """
+    Write fixed size WEBP copies named after the hash of the original, so a URL never
+    points at different content and can be cached forever.
+    """
+    from .models import BaseUser
+
+    user = BaseUser.objects.filter(id=user_id).first()
+    if not user:
+        return
+
+    if not user.profile_pic:
+        BaseUser.objects.filter(id=user_id).update(profile_pic_sizes={})
+        return
+
+    with user.profile_pic.open("rb") as original:
+        data = original.read()
+
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data))).convert("RGB")
+
+    sizes = {}
+    for name, pixels in PROFILE_PIC_SIZES.items():
+        path = f"{PROFILE_PIC_DIR}/{digest}_{pixels}.webp"
+        if not default_storage.exists(path):
+            resized = ImageOps.fit(image, (pixels, pixels), Image.LANCZOS)
+            buffer = BytesIO()
+            resized.save(buffer, "WEBP", quality=85, method=6)
+            default_storage.save(path, ContentFile(buffer.getvalue()))
+        sizes[name] = path
+
+    BaseUser.objects.filter(id=user_id, profile_pic=user.profile_pic.name).update(
+        profile_pic_sizes=sizes
+    )
+
+
+def profile_pic_urls(user, request=None):
+    urls = {}
+    for name, path in (user.profile_pic_sizes or {}).items():
+        url = default_storage.url(path)
+        urls[name] = request.build_absolute_uri(url) if request else url
+    return urls
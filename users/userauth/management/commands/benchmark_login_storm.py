@@ -0,0 +1,73 @@
+import threading
+import time
+import requests
+from django.core.management.base import BaseCommand
+
+from userauth.hashing import make_password
+from userauth.models import BaseUser
+from .benchmark_user_directory import BENCH_EMAIL_DOMAIN
+
+
+BENCH_PASSWORD = "benchmark-password"
+
+
+class Command(BaseCommand):
+    help = "Measure /api/users/me/ latency of a running users service while it is flooded with logins."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the users service.")
+        parser.add_argument("--threads", type=int, default=32, help="Concurrent login clients.")
+        parser.add_argument("--duration", type=float, default=10, help="Seconds per phase.")
+
+    def handle(self, *args, **options):
+        base_url = options["url"].rstrip("/")
+        email = f"storm@{BENCH_EMAIL_DOMAIN}"
+        user, _ = BaseUser.objects.get_or_create(
+            email=email, defaults={"full_name": "Login Storm", "password": "!"}
+        )
+        BaseUser.objects.filter(pk=user.pk).update(password=make_password(BENCH_PASSWORD))
+
+        credentials = {"email": email, "password": BENCH_PASSWORD}
+        tokens = requests.post(f"{base_url}/api/users/login/", json=credentials, timeout=30).json()
+        headers = {"Authorization": f"JWT {tokens['access']}"}
+
+        baseline = self.probe(base_url, headers, options["duration"])
+        self.report("idle", baseline)
+
+        stop = threading.Event()
+        statuses = {}
+        lock = threading.Lock()
+
+        def storm():
+            session = requests.Session()
+            while not stop.is_set():
+                response = session.post(f"{base_url}/api/users/login/", json=credentials, timeout=30)
+                with lock:
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+        workers = [threading.Thread(target=storm, daemon=True) for _ in range(options["threads"])]
+        for worker in workers:
+            worker.start()
+        loaded = self.probe(base_url, headers, options["duration"])
+        stop.set()
+        for worker in workers:
+            worker.join()
+
+        self.report(f"{options['threads']} login clients", loaded)
+        self.stdout.write(f"login responses: {dict(sorted(statuses.items()))}")
+
+    def probe(self, base_url, headers, duration):
+        session = requests.Session()
+        timings = []
+        deadline = time.perf_counter() + duration
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            session.get(f"{base_url}/api/users/me/", headers=headers, timeout=30)
+            timings.append((time.perf_counter() - started) * 1000)
+        return sorted(timings)
+
+    def report(self, phase, timings):
+        self.stdout.write(
+            f"/api/users/me/ while {phase}: {len(timings)} requests | "
+            f"p50 {timings[len(timings) // 2]:.1f} ms | p99 {timings[int(len(timings) * 0.99)]:.1f} ms"
+        )
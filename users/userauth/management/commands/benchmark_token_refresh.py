@@ -0,0 +1,48 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from userauth.authentication import UserTokenRefreshSerializer
+from userauth.models import BaseUser
+from .benchmark_user_directory import BENCH_EMAIL_DOMAIN
+
+
+class Command(BaseCommand):
+    help = "Measure refresh token rotation throughput against the Redis blacklist."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=2000, help="Refreshes to perform.")
+        parser.add_argument("--threads", type=int, default=8)
+
+    def handle(self, *args, **options):
+        user, _ = BaseUser.objects.get_or_create(
+            email=f"refresh@{BENCH_EMAIL_DOMAIN}",
+            defaults={"full_name": "Refresh Benchmark", "password": "!"},
+        )
+        tokens = [str(RefreshToken.for_user(user)) for _ in range(options["count"])]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["threads"]) as executor:
+            timings = list(executor.map(self.refresh, tokens))
+        elapsed = time.perf_counter() - started
+
+        timings.sort()
+        self.stdout.write(
+            f"{len(tokens)} refreshes in {elapsed:.2f}s ({len(tokens) / elapsed:.0f}/s) | "
+            f"p50 {timings[len(timings) // 2]:.2f} ms | p99 {timings[int(len(timings) * 0.99)]:.2f} ms"
+        )
+
+        try:
+            self.refresh(tokens[0])
+            accepted = True
+        except InvalidToken:
+            accepted = False
+        self.stdout.write(f"Replaying a rotated token: {'accepted' if accepted else 'rejected'}")
+
+    def refresh(self, token):
+        started = time.perf_counter()
+        serializer = UserTokenRefreshSerializer(data={"refresh": token})
+        serializer.is_valid(raise_exception=True)
+        return (time.perf_counter() - started) * 1000
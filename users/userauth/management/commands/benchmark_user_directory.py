@@ -0,0 +1,97 @@
+import random
+import string
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from userauth.models import BaseUser
+from userauth.pagination import UserDirectoryPagination
+
+
+BENCH_EMAIL_DOMAIN = "bench.local"
+FIRST_NAMES = ["Amal", "Kavindu", "Nimal", "Sahan", "Dilan", "Ishara", "Tharindu", "Chathura", "Nadeesha", "Ruwan"]
+LAST_NAMES = ["Perera", "Silva", "Fernando", "Jayasinghe", "Bandara", "Wickramasinghe", "Dissanayake", "Gunawardena"]
+
+
+class Command(BaseCommand):
+    help = "Seed users and compare offset vs keyset directory pages and prefix search latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Number of users to insert first.")
+        parser.add_argument("--batch-size", type=int, default=10000)
+        parser.add_argument("--page-size", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--cleanup", action="store_true", help="Delete seeded users and exit.")
+
+    def handle(self, *args, **options):
+        if options["cleanup"]:
+            deleted, _ = BaseUser.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+            self.stdout.write(f"Deleted {deleted} rows")
+            return
+
+        if options["seed"]:
+            self.seed(options["seed"], options["batch_size"])
+
+        total = BaseUser.objects.count()
+        page_size = options["page_size"]
+        repeat = options["repeat"]
+        self.stdout.write(f"Users: {total}")
+
+        for depth in [0.01, 0.5, 0.99]:
+            offset = int(total * depth)
+            offset_ms = self.measure(repeat, lambda: list(
+                BaseUser.objects.order_by("full_name", "id")[offset: offset + page_size]
+            ))
+
+            anchor = BaseUser.objects.order_by("full_name", "id")[offset: offset + 1].first()
+            pagination = UserDirectoryPagination()
+            position = pagination.get_position(anchor)
+            keyset_ms = self.measure(repeat, lambda: list(
+                BaseUser.objects.filter(pagination.after(position)).order_by("full_name", "id")[:page_size]
+            ))
+            self.stdout.write(
+                f"page at {int(depth * 100)}%: offset {offset_ms:.2f} ms | keyset {keyset_ms:.2f} ms"
+            )
+
+        for query in ["ka", "kav", "perera", "nimal.s"]:
+            search_ms = self.measure(repeat, lambda: list(
+                BaseUser.objects.filter(Q(full_name__istartswith=query) | Q(email__istartswith=query))
+                .only("id", "email", "full_name", "profile_pic", "profile_pic_sizes")
+                .order_by("full_name", "id")[:10]
+            ))
+            self.stdout.write(f"search '{query}': {search_ms:.2f} ms")
+
+    def seed(self, count, batch_size):
+        started = time.perf_counter()
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            BaseUser.objects.bulk_create([self.fake_user() for _ in range(size)])
+            created += size
+            self.stdout.write(f"Seeded {created}/{count}", ending="\r")
+        self.stdout.write(f"Seeded {count} users in {time.perf_counter() - started:.1f}s")
+
+    def fake_user(self):
+        first = random.choice(FIRST_NAMES)
+        last = random.choice(LAST_NAMES)
+        suffix = "".join(random.choices(string.ascii_lowercase + string.digits, k=8))
+        user_id = uuid.uuid4()
+        return BaseUser(
+            id=user_id,
+            full_name=f"{first} {last} {suffix}",
+            email=f"{first.lower()}.{last.lower()}.{user_id.hex[:12]}@{BENCH_EMAIL_DOMAIN}",
+            password="!",
+        )
+
+    def measure(self, repeat, query):
+        """
+        Median latency in milliseconds.
+        """
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return timings[len(timings) // 2]
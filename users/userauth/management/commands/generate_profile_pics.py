@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from userauth.images import process_profile_pic
+from userauth.models import BaseUser
+
+
+class Command(BaseCommand):
+    help = "Generate resized profile pictures for users uploaded before the pipeline existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--all", action="store_true", help="Regenerate users that already have sizes.")
+
+    def handle(self, *args, **options):
+        users = BaseUser.objects.exclude(profile_pic="").exclude(profile_pic__isnull=True)
+        if not options["all"]:
+            users = users.filter(profile_pic_sizes={})
+
+        done = 0
+        for user_id in users.values_list("id", flat=True).iterator():
+            try:
+                process_profile_pic(user_id)
+                done += 1
+            except Exception as e:
+                self.stderr.write(f"Failed for {user_id}: {e}")
+        self.stdout.write(f"Processed {done} profile pictures")
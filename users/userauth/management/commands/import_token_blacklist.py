@@ -0,0 +1,61 @@
+import time
+from datetime import timezone as dt_timezone
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from userauth.authentication import revoked_token_key
+
+
+OUTSTANDING_TABLE = "token_blacklist_outstandingtoken"
+BLACKLISTED_TABLE = "token_blacklist_blacklistedtoken"
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy unexpired entries of the simplejwt token_blacklist tables into the Redis blacklist. "
+        "Run once before removing rest_framework_simplejwt.token_blacklist from INSTALLED_APPS."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop the token_blacklist tables and their migration records after importing.",
+        )
+
+    def handle(self, *args, **options):
+        tables = connection.introspection.table_names()
+        if BLACKLISTED_TABLE not in tables or OUTSTANDING_TABLE not in tables:
+            self.stdout.write("No token_blacklist tables found, nothing to import")
+            return
+
+        imported = 0
+        now = time.time()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT o.jti, o.expires_at FROM {OUTSTANDING_TABLE} o "
+                f"JOIN {BLACKLISTED_TABLE} b ON b.token_id = o.id "
+                f"WHERE o.expires_at > %s",
+                [timezone.now()],
+            )
+            while rows := cursor.fetchmany(options["batch_size"]):
+                for jti, expires_at in rows:
+                    if timezone.is_naive(expires_at):
+                        expires_at = timezone.make_aware(expires_at, dt_timezone.utc)
+                    timeout = int(expires_at.timestamp() - now)
+                    if timeout > 0:
+                        cache.set(revoked_token_key(jti), True, timeout)
+                        imported += 1
+                self.stdout.write(f"Imported {imported}", ending="\r")
+
+        self.stdout.write(f"Imported {imported} blacklisted refresh tokens")
+
+        if options["drop"]:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"DROP TABLE {BLACKLISTED_TABLE}")
+                cursor.execute(f"DROP TABLE {OUTSTANDING_TABLE}")
+                cursor.execute("DELETE FROM django_migrations WHERE app = %s", ["token_blacklist"])
+            self.stdout.write("Dropped token_blacklist tables")
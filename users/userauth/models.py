@@ -1,10 +1,17 @@
 import uuid
-from django.db import models
+from django.db import models, transaction
 from django.db.models import signals
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import OpClass
 from django.contrib.auth.models import AbstractUser
 from django.dispatch import receiver
 from django.utils import timezone
 from users.producers import publish
+from .images import schedule_profile_pic
+
+
+# Fields copied into the other services. Saves that don't change them are not published.
+REPLICATED_FIELDS = ("full_name", "email", "profile_pic")
 
 
 def new_file_name(instance, filename):
@@ -27,6 +34,41 @@ class BaseUser(AbstractUser):
     email = models.EmailField(unique=True, db_index=True)
 
     profile_pic = models.ImageField(null=True, blank=True, upload_to=new_file_name)
+    # Resized copies of profile_pic by size name, filled in by images.process_profile_pic.
+    profile_pic_sizes = models.JSONField(default=dict, blank=True)
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Keyset pagination of the user directory.
+            models.Index(fields=["full_name", "id"], name="user_directory_idx"),
+            # Case insensitive prefix search (istartswith) for typeahead.
+            models.Index(
+                OpClass(Upper("full_name"), name="text_pattern_ops"),
+                name="user_full_name_prefix_idx",
+            ),
+            models.Index(
+                OpClass(Upper("email"), name="text_pattern_ops"),
+                name="user_email_prefix_idx",
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._replicated_state = instance.get_replicated_state()
+        return instance
+
+    def get_replicated_state(self):
+        state = {}
+        for field in REPLICATED_FIELDS:
+            value = self.__dict__.get(field)
+            state[field] = getattr(value, "name", value) or None
+        return state
+
+    def save(self, *args, **kwargs):
+        # Keep the row and its outbox event in one transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def update_lastlogin(self):
         self.last_login = timezone.now()
@@ -36,8 +78,36 @@ class BaseUser(AbstractUser):
         return self.email
 
 
+class OutboxEvent(models.Model):
+    """
+    Event waiting to be delivered by relay.py, written in the same transaction as the change.
+    """
+
+    action_type = models.CharField(max_length=100)
+    key = models.CharField(max_length=100, null=True, blank=True)
+    body = models.JSONField()
+    to = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"{self.action_type} - {self.key}"
+
+
 @receiver(signals.post_save, sender=BaseUser)
-def handle_on_user_create_or_update(sender, instance: BaseUser, created, **kwargs):
+def handle_on_user_create_or_update(sender, instance: BaseUser, created, update_fields=None, **kwargs):
+    if update_fields is not None and not set(update_fields) & set(REPLICATED_FIELDS):
+        return
+
+    state = instance.get_replicated_state()
+    previous = getattr(instance, "_replicated_state", None)
+    if not created and state == previous:
+        return
+    instance._replicated_state = state
+
+    if state["profile_pic"] != (previous or {}).get("profile_pic"):
+        user_id = instance.id
+        transaction.on_commit(lambda: schedule_profile_pic(user_id))
+
     action_type = "user.created" if created else "user.updated"
     publish(
         action_type,
@@ -45,12 +115,14 @@ def handle_on_user_create_or_update(sender, instance: BaseUser, created, **kwarg
             "id": str(instance.id),
             "email": instance.email,
             "full_name": instance.full_name,
+            "profile_pic": state["profile_pic"],
         },
         "broadcast",
+        key=str(instance.id),
     )
 
 
 @receiver(signals.post_delete, sender=BaseUser)
 def handle_on_user_delete(sender, instance, **kwargs):
     action_type = "user.deleted"
-    publish(action_type, {"id": str(instance.id)}, "broadcast")
+    publish(action_type, {"id": str(instance.id)}, "broadcast", key=str(instance.id))
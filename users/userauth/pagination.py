@@ -0,0 +1,5 @@
+from shared.pagination import KeysetPagination
+
+
+class UserDirectoryPagination(KeysetPagination):
+    ordering = ("full_name", "id")
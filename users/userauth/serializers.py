@@ -1,7 +1,10 @@
+from django.db import transaction
 from rest_framework import serializers
-from django.contrib.auth.hashers import make_password
 
 from .models import BaseUser
+from .authentication import revoke_user_tokens
+from .images import profile_pic_urls
+from .hashing import make_password
 
 
 class UserLoginSerializer(serializers.Serializer):
@@ -19,10 +22,14 @@ class UserSerializer(serializers.ModelSerializer):
     id = serializers.CharField(read_only=True)
     email = serializers.EmailField(validators=[validate_unique_email])
     password = serializers.CharField(write_only=True)
+    profile_pic_urls = serializers.SerializerMethodField()
 
     class Meta:
         model = BaseUser
-        fields = ["id", "email", "full_name", "profile_pic", "password"]
+        fields = ["id", "email", "full_name", "profile_pic", "profile_pic_urls", "password"]
+
+    def get_profile_pic_urls(self, obj):
+        return profile_pic_urls(obj, self.context.get("request"))
 
     def create(self, validated_data):
         validated_data["password"] = make_password(validated_data["password"])
@@ -30,9 +37,11 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class UserUpdateSerializer(serializers.ModelSerializer):
+    profile_pic_urls = serializers.SerializerMethodField()
+
     class Meta:
         model = BaseUser
-        fields = ["id", "email", "full_name", "profile_pic", "password"]
+        fields = ["id", "email", "full_name", "profile_pic", "profile_pic_urls", "password"]
         extra_kwargs = {
             "id": {"read_only": True},
             "email": {"required": False},
@@ -42,6 +51,15 @@ class UserUpdateSerializer(serializers.ModelSerializer):
         }
 
     def update(self, instance, validated_data):
-        if "password" in validated_data:
+        password_changed = "password" in validated_data
+        if password_changed:
             validated_data["password"] = make_password(validated_data["password"])
-        return super().update(instance, validated_data)
+        # Hashed above, the transaction only covers the row and its outbox events.
+        with transaction.atomic():
+            instance = super().update(instance, validated_data)
+            if password_changed:
+                revoke_user_tokens(instance)
+        return instance
+
+    def get_profile_pic_urls(self, obj):
+        return profile_pic_urls(obj, self.context.get("request"))
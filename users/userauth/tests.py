@@ -1,3 +1,231 @@
-from django.test import TestCase
+import base64
+import json
+import threading
+import time
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, check_password as django_check_password
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
 
-# Create your tests here.
+import relay
+
+from . import hashing
+from .authentication import UserTokenRefreshSerializer, blacklist_refresh_token, revoke_user_tokens
+from .models import BaseUser, OutboxEvent
+from .pagination import UserDirectoryPagination
+
+
+# Tests get a cache database of their own and clear it, the service's data is left alone.
+TEST_CACHES = {
+    "default": {
+        **settings.CACHES["default"],
+        "LOCATION": settings.CACHES["default"]["LOCATION"].rsplit("/", 1)[0] + "/14",
+    }
+}
+
+
+def cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+class UserDirectoryPaginationTests(TestCase):
+    def setUp(self):
+        self.factory = APIRequestFactory()
+        for index, full_name in enumerate(["Ann", "Bob", "Bob", "Bob", "Cid"]):
+            BaseUser.objects.create(email=f"user{index}@example.com", full_name=full_name)
+
+    def paginate(self, cursor=None):
+        paginator = UserDirectoryPagination()
+        paginator.page_size = 2
+        params = {"cursor": cursor} if cursor else {}
+        request = Request(self.factory.get("/users/", params))
+        return paginator.paginate_queryset(BaseUser.objects.all(), request), paginator
+
+    def test_pages_follow_the_ordering_without_gaps(self):
+        seen = []
+        next_cursor = None
+        while True:
+            page, paginator = self.paginate(next_cursor)
+            seen.extend(user.id for user in page)
+            link = paginator.get_next_link()
+            if link is None:
+                break
+            next_cursor = parse_qs(urlparse(link).query)["cursor"][0]
+
+        expected = list(BaseUser.objects.order_by("full_name", "id").values_list("id", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_cursor_holds_the_last_row(self):
+        page, paginator = self.paginate()
+        self.assertEqual(paginator.next_position, [page[-1].full_name, str(page[-1].id)])
+
+    def test_after_bounds_the_leading_column(self):
+        # Turns the OR of the keyset predicate into an index range scan.
+        condition = UserDirectoryPagination().after(["Bob", "id"])
+        self.assertIn(("full_name__gte", "Bob"), condition.children)
+
+    def test_malformed_cursors_are_not_found(self):
+        user = BaseUser.objects.first()
+        for value in [
+            "not base64!",
+            cursor({"full_name": "Bob"}),
+            cursor(["Bob"]),
+            cursor(["Bob", str(user.id), "extra"]),
+            cursor(["Bob", 7]),
+            cursor([None, str(user.id)]),
+            cursor(["Bob", "not-a-uuid"]),
+        ]:
+            with self.subTest(cursor=value), self.assertRaises(NotFound):
+                self.paginate(value)
+
+
+class ReplicatedEventTests(TestCase):
+    def setUp(self):
+        self.user = BaseUser.objects.create(email="user@example.com", full_name="User")
+        self.user = BaseUser.objects.get(id=self.user.id)
+
+    def events(self):
+        return list(OutboxEvent.objects.order_by("id").values_list("action_type", flat=True))
+
+    def test_create_publishes_user_created(self):
+        self.assertEqual(self.events(), ["user.created"])
+
+    def test_saves_without_replicated_changes_publish_nothing(self):
+        self.user.update_lastlogin()
+        self.user.save()
+        self.assertEqual(self.events(), ["user.created"])
+
+    def test_replicated_change_publishes_the_new_state(self):
+        self.user.full_name = "Renamed"
+        self.user.save()
+        self.assertEqual(self.events(), ["user.created", "user.updated"])
+        self.assertEqual(OutboxEvent.objects.last().body["full_name"], "Renamed")
+
+
+class OutboxRelayTests(TestCase):
+    def event(self, action_type, key=None, **body):
+        return OutboxEvent.objects.create(action_type=action_type, key=key, body=body, to=["posts"])
+
+    def relayed(self, channel):
+        return [
+            (call.kwargs["properties"].content_type, json.loads(call.kwargs["body"]))
+            for call in channel.basic_publish.call_args_list
+        ]
+
+    def test_coalesce_keeps_the_newest_state_per_key(self):
+        events = [
+            self.event("user.created", "a", name="a1"),
+            self.event("user.updated", "b", name="b1"),
+            self.event("user.updated", "a", name="a2"),
+            self.event("token.revoked", None, jti="x"),
+            self.event("user.updated", "b", name="b2"),
+        ]
+        self.assertEqual(
+            [(entry["action_type"], entry["body"]) for entry in relay.coalesce(events)],
+            [
+                ("user.created", {"name": "a2"}),
+                ("token.revoked", {"jti": "x"}),
+                ("user.updated", {"name": "b2"}),
+            ],
+        )
+
+    def test_delete_ends_a_coalesced_run(self):
+        events = [
+            self.event("user.updated", "a", name="a1"),
+            self.event("user.deleted", "a"),
+            self.event("user.created", "a", name="a2"),
+        ]
+        self.assertEqual(
+            [entry["action_type"] for entry in relay.coalesce(events)],
+            ["user.updated", "user.deleted", "user.created"],
+        )
+
+    def test_relayed_events_are_removed(self):
+        self.event("user.updated", "a", name="a1")
+        self.event("user.updated", "a", name="a2")
+        channel = mock.Mock()
+
+        self.assertEqual(relay.relay_batch(channel), 2)
+        self.assertEqual(self.relayed(channel), [("user.updated", {"name": "a2"})])
+        self.assertFalse(OutboxEvent.objects.exists())
+        self.assertEqual(relay.relay_batch(channel), 0)
+
+    def test_unconfirmed_batch_stays_in_the_outbox(self):
+        self.event("user.updated", "a", name="a1")
+        channel = mock.Mock()
+        channel.basic_publish.side_effect = relay.pika.exceptions.NackError([])
+
+        with self.assertRaises(relay.pika.exceptions.NackError):
+            relay.relay_batch(channel)
+        self.assertEqual(OutboxEvent.objects.count(), 1)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class RefreshTokenBlacklistTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.user = BaseUser.objects.create(email="user@example.com", full_name="User")
+
+    def refresh(self, token):
+        serializer = UserTokenRefreshSerializer(data={"refresh": str(token)})
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def test_rotated_token_cant_be_replayed(self):
+        token = RefreshToken.for_user(self.user)
+        rotated = self.refresh(token)
+        self.assertNotEqual(rotated["refresh"], str(token))
+
+        with self.assertRaises(InvalidToken):
+            self.refresh(token)
+        self.assertIn("access", self.refresh(rotated["refresh"]))
+
+    def test_blacklist_entry_expires_with_the_token(self):
+        token = RefreshToken.for_user(self.user)
+        self.assertTrue(blacklist_refresh_token(token))
+        self.assertFalse(blacklist_refresh_token(token))
+        self.assertLessEqual(cache.ttl(f"revoked_token_{token['jti']}"), token["exp"] - time.time() + 1)
+
+    def test_revoking_a_user_rejects_older_tokens(self):
+        token = RefreshToken.for_user(self.user)
+        token["iat"] -= 10
+        revoke_user_tokens(self.user)
+        with self.assertRaises(InvalidToken):
+            self.refresh(token)
+
+
+class PasswordHashingTests(TestCase):
+    def test_hashes_are_made_and_checked_in_the_pool(self):
+        encoded = hashing.make_password("correct horse")
+        self.assertTrue(django_check_password("correct horse", encoded))
+
+        user = BaseUser.objects.create(email="user@example.com", full_name="User", password=encoded)
+        self.assertTrue(hashing.check_password(user, "correct horse"))
+        self.assertFalse(hashing.check_password(user, "wrong horse"))
+
+    def test_outdated_hash_is_upgraded_without_events(self):
+        outdated = PBKDF2PasswordHasher().encode("correct horse", "salt", iterations=1000)
+        user = BaseUser.objects.create(email="user@example.com", full_name="User", password=outdated)
+        events = OutboxEvent.objects.count()
+
+        self.assertTrue(hashing.check_password(user, "correct horse"))
+        user.refresh_from_db()
+        self.assertNotEqual(user.password, outdated)
+        self.assertTrue(django_check_password("correct horse", user.password))
+        self.assertEqual(OutboxEvent.objects.count(), events)
+
+    def test_full_queue_is_rejected_instead_of_waiting(self):
+        pending = threading.BoundedSemaphore(1)
+        pending.acquire()
+        with mock.patch.object(hashing, "_pending", pending):
+            with self.assertRaises(hashing.HashingBusy) as raised:
+                hashing.make_password("correct horse")
+        self.assertEqual(raised.exception.status_code, 429)
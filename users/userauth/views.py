@@ -1,12 +1,19 @@
 from rest_framework.viewsets import ModelViewSet
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.contrib.auth.hashers import check_password
 from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework import serializers
+from rest_framework.exceptions import NotFound
+from django.conf import settings
+from django.db.models import Q
+from rest_framework_simplejwt.exceptions import TokenError, InvalidToken
+from .authentication import blacklist_refresh_token, revoke_access_token, UserJWTAuthentication
 from .serializers import UserLoginSerializer, UserSerializer, UserUpdateSerializer
+from .pagination import UserDirectoryPagination
+from .hashing import check_password
 from .models import BaseUser
 
 
@@ -23,7 +30,8 @@ class UserLoginView(ModelViewSet):
         request_body=UserLoginSerializer,
         responses={
             200: UserSerializer, 
-            400: UserLoginSerializer
+            400: UserLoginSerializer,
+            429: "Too Many Requests",
         },
     )
     def create(self, request):
@@ -44,7 +52,7 @@ class UserLoginView(ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-        if not check_password(password, user.password):
+        if not check_password(user, password):
             return Response(
                 {
                     "email": "Invalid User Credentials.",
@@ -71,13 +79,15 @@ class TokenSerializer(serializers.Serializer):
 
 
 class UserView(ModelViewSet):
+    pagination_class = UserDirectoryPagination
+
     def get_serializer_class(self):
         if self.action in ["update"]:
             return UserUpdateSerializer
         return UserSerializer
 
     def get_permissions(self):
-        if self.action in ["update", "partial_update"]:
+        if self.action in ["update", "partial_update", "list"]:
             permission_classes = [IsAuthenticated]
         else:
             permission_classes = []
@@ -88,6 +98,16 @@ class UserView(ModelViewSet):
             return BaseUser.objects.filter(email=self.request.user.email)
         return BaseUser.objects.all().order_by("full_name")
 
+    @swagger_auto_schema(
+        operation_description="List users ordered by name, paginated with a cursor",
+        responses={
+            200: UserSerializer(many=True),
+            401: "Unauthorized",
+        },
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @swagger_auto_schema(
         operation_description="Create User",
         request_body=UserSerializer,
@@ -131,6 +151,39 @@ class UserView(ModelViewSet):
         )
 
 
+class UserSearchView(APIView):
+    """
+    Typeahead search. Matches name or email prefixes using the prefix indexes on BaseUser.
+    """
+
+    permission_classes = [IsAuthenticated]
+    min_query_length = 2
+    max_results = 10
+
+    @swagger_auto_schema(
+        operation_description="Search users by name or email prefix",
+        responses={
+            200: UserSerializer(many=True),
+            401: "Unauthorized",
+        },
+    )
+    def get(self, request):
+        query = request.query_params.get("q", "").strip()
+
+        if len(query) < self.min_query_length:
+            return Response([])
+
+        users = (
+            BaseUser.objects.filter(
+                Q(full_name__istartswith=query) | Q(email__istartswith=query)
+            )
+            .only("id", "email", "full_name", "profile_pic", "profile_pic_sizes")
+            .order_by("full_name", "id")[: self.max_results]
+        )
+
+        return Response(UserSerializer(users, many=True, context={"request": request}).data)
+
+
 class UserMeView(ModelViewSet):
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -151,3 +204,90 @@ class UserMeView(ModelViewSet):
             ).data
             
         return Response(data)
+
+
+class UserLogoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_description="Logout User",
+        responses={
+            204: "No Content",
+            401: "Unauthorized",
+        },
+    )
+    def post(self, request):
+        revoke_access_token(request.auth)
+
+        if "refresh" in request.data:
+            try:
+                blacklist_refresh_token(RefreshToken(request.data["refresh"]))
+            except TokenError:
+                pass
+
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class JWTKeySerializer(serializers.Serializer):
+    algorithm = serializers.CharField()
+    key = serializers.CharField()
+
+
+class JWTKeyView(APIView):
+    authentication_classes = []
+    permission_classes = []
+
+    @swagger_auto_schema(
+        operation_description="Public key used to verify access tokens",
+        responses={
+            200: JWTKeySerializer,
+            404: "Not Found",
+        },
+    )
+    def get(self, request):
+        if not settings.JWT_PUBLIC_KEY:
+            raise NotFound("Tokens are not signed with a public key")
+
+        return Response(
+            {
+                "algorithm": settings.JWT_ALGORITHM,
+                "key": settings.JWT_PUBLIC_KEY,
+            }
+        )
+
+
+class TokenIntrospectView(APIView):
+    """
+    Used by the gateway auth_request. Only checks the token, the user row is never loaded.
+    Requests without a token pass through as anonymous.
+    """
+
+    authentication_classes = []
+    permission_classes = []
+
+    @swagger_auto_schema(
+        operation_description="Validate an access token and return its user id in the X-User-Id header",
+        responses={
+            200: "OK",
+            401: "Unauthorized",
+        },
+    )
+    def get(self, request):
+        response = Response(status=status.HTTP_200_OK)
+        authentication = UserJWTAuthentication()
+        header = authentication.get_header(request)
+
+        if header is None:
+            return response
+
+        raw_token = authentication.get_raw_token(header)
+        if raw_token is None:
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        try:
+            validated_token = authentication.get_validated_token(raw_token)
+        except (TokenError, InvalidToken):
+            return Response(status=status.HTTP_401_UNAUTHORIZED)
+
+        response["X-User-Id"] = str(validated_token["user_id"])
+        return response
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
@@ -8,6 +9,11 @@ load_dotenv()
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Code shared by the services lives in shared/ next to the service folders when running
+# from a checkout, images copy it to /app/shared.
+if (BASE_DIR.parent / "shared").is_dir():
+    sys.path.append(str(BASE_DIR.parent))
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.2/howto/deployment/checklist/
@@ -43,6 +49,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "shared.replicas.ReplicaPinningMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -93,6 +100,21 @@ DATABASES = {
     }
 }
 
+# Reads of safe requests go to the replica when one is configured, see shared/replicas.py.
+replica_host = os.getenv("POSTGRES_REPLICA_HOST")
+if replica_host:
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "HOST": replica_host,
+        "PORT": os.getenv("POSTGRES_REPLICA_PORT", db_port),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["shared.replicas.PrimaryReplicaRouter"]
+
+# Clients read from the primary for this long after they wrote, so they see their own writes.
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -143,15 +165,39 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "COERCE_DECIMAL_TO_STRING": False,
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "userauth.authentication.UserJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "shared.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "shared.renderers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 10,
 }
 
 
+# Password hashing runs in a process pool. Requests beyond PASSWORD_HASHING_MAX_PENDING
+# queued hashes get 429 instead of piling up behind a login burst.
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", 2))
+PASSWORD_HASHING_MAX_PENDING = int(os.getenv("PASSWORD_HASHING_MAX_PENDING", 16))
+
+# HS* signs tokens with SECRET_KEY. RS* signs with JWT_PRIVATE_KEY and publishes
+# JWT_PUBLIC_KEY on /api/users/keys/ so other services can verify tokens locally.
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+JWT_PRIVATE_KEY = os.getenv("JWT_PRIVATE_KEY", "").replace("\\n", "\n") or None
+JWT_PUBLIC_KEY = os.getenv("JWT_PUBLIC_KEY", "").replace("\\n", "\n") or None
+
 SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("JWT",),
+    "ALGORITHM": JWT_ALGORITHM,
+    "SIGNING_KEY": JWT_PRIVATE_KEY or SECRET_KEY,
+    "VERIFYING_KEY": JWT_PUBLIC_KEY,
+    "TOKEN_REFRESH_SERIALIZER": "userauth.authentication.UserTokenRefreshSerializer",
     "ACCESS_TOKEN_LIFETIME": timedelta(days=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=60),
     "ROTATE_REFRESH_TOKENS": True,
@@ -159,6 +205,16 @@ SIMPLE_JWT = {
     "UPDATE_LAST_LOGIN": True,
 }
 
+CACHES = {
+    "default": {
+        "BACKEND": "django_redis.cache.RedisCache",
+        "LOCATION": "redis://redis:6379/3",
+        "OPTIONS": {
+            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+        },
+    }
+}
+
 SWAGGER_SETTINGS = {
     "DEFAULT_INFO": "users.urls.api_info",
 }
\ No newline at end of file
@@ -31,6 +31,8 @@ urlpatterns = [
         r"api/users/register/?$",
         views.UserView.as_view({"post": "create"}),
     ),
+    path("api/users/", views.UserView.as_view({"get": "list"})),
+    re_path(r"api/users/search/?$", views.UserSearchView.as_view()),
     path(
         "api/users/<uuid:pk>/",
         views.UserView.as_view({"delete": "destroy", "get": "retrieve"}),
@@ -41,6 +43,9 @@ urlpatterns = [
     ),
     re_path(r"api/users/me/?$", views.UserMeView.as_view({"get": "retrieve"})),
     re_path(r"api/users/refresh/?$", jwt_views.TokenRefreshView.as_view()),
+    re_path(r"api/users/logout/?$", views.UserLogoutView.as_view()),
+    re_path(r"api/users/keys/?$", views.JWTKeyView.as_view()),
+    re_path(r"api/users/introspect/?$", views.TokenIntrospectView.as_view()),
 ]
 
 if settings.DEBUG: